@@ -0,0 +1,35 @@
+'''
+Compares float64 and float32 storage on a wide synthetic TEMA file (see temagenerator.py): the memory taken by the cleaned data, the tracemalloc high-water mark of cleanImportTemaData and of calculateVelocities, and the largest difference float32 makes to the cleaned data and the velocities.
+
+Run with: python benchmarks/bench_dtype.py [rows] [points]
+The defaults are 100,000 rows and 100 points (650 columns).
+'''
+import os
+import sys
+import tempfile
+import timeit
+import numpy as np
+from temaanalyzer import temafunctions
+from bench_stages import measurePeakMemory
+from temagenerator import makeTemaFile
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    points = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    with tempfile.TemporaryDirectory() as tempDir:
+        filename = os.path.join(tempDir,'TEMAWide.txt')
+        columns = makeTemaFile(filename,rows,points)
+        print('{} rows x {} columns, {:.1f} MB'.format(rows,columns,os.path.getsize(filename)/1e6))
+        print('{:8s} {:>10s} {:>12s} {:>12s} {:>14s}'.format('dtype','data (MB)','import (s)','import peak','velocity peak'))
+        results = {}
+        for dtype in ['float64','float32']:
+            dataframe = temafunctions.cleanImportTemaData(filename,dtype=dtype)
+            importTime = min(timeit.repeat(lambda: temafunctions.cleanImportTemaData(filename,dtype=dtype),number=1,repeat=3))
+            importPeak = measurePeakMemory(lambda: temafunctions.cleanImportTemaData(filename,dtype=dtype))
+            velocityPeak = measurePeakMemory(lambda: temafunctions.calculateVelocities(dataframe))
+            results[dtype] = (dataframe,temafunctions.calculateVelocities(dataframe))
+            print('{:8s} {:10.1f} {:12.3f} {:12.1f} {:14.1f}'.format(dtype,dataframe.memory_usage().sum()/1e6,importTime,importPeak/1e6,velocityPeak/1e6))
+        for name,position in [('cleaned data',0),('velocities',1)]:
+            exact = results['float64'][position].to_numpy()
+            rounded = results['float32'][position].to_numpy(dtype='float64')
+            print('largest float32 error in the {}: {:.3g} (largest value {:.3g})'.format(name,np.nanmax(np.abs(exact-rounded)),np.nanmax(np.abs(exact))))
@@ -0,0 +1,49 @@
+'''
+Compares the single-pass importTemaData reader against the original two-pass reader (csv.reader for the header, then a second pd.read_csv over the whole file).
+
+Run with: python benchmarks/bench_import.py [rows]
+The TEMA example file shipped in temaanalyzer/interactive is scaled up to the requested number of rows (1,000,000 by default).
+'''
+import csv
+import os
+import sys
+import tempfile
+import timeit
+import pandas as pd
+from temaanalyzer import temafunctions
+
+exampleFile = os.path.join(os.path.dirname(temafunctions.__file__),'interactive','TEMAExampleFile.txt')
+
+def twoPassImportTemaData(filename):
+    #the reader importTemaData used before the single-pass rewrite
+    with open(filename, newline='', encoding='latin-1', errors='ignore') as csvfile:
+        rows = csv.reader(csvfile, delimiter='\t')
+        firstRow = next(rows)
+        secondRow = next(rows)
+        thirdRow = next(rows)
+        headers = [firstRow[0] + ' ' + thirdRow[0]] + list(map(lambda x,y: x + ' ' + y,firstRow[1:],secondRow[1:]))
+    return pd.read_csv(filename,sep='\t',header=0,names=headers,skiprows=range(2),encoding_errors='ignore',dtype='float64',na_values=['X']).drop(columns=' ',errors='ignore')
+
+def scaleExampleFile(filename,rows):
+    #repeat the body of the example file until it has the requested number of rows, keeping time increasing
+    with open(exampleFile,'rb') as source:
+        header = [source.readline() for i in range(3)]
+        body = [line.rstrip(b'\r\n').split(b'\t',1) for line in source if line.strip()]
+    period = float(body[-1][0]) + float(body[1][0]) - float(body[0][0])
+    with open(filename,'wb') as target:
+        target.writelines(header)
+        for i in range(rows):
+            time, values = body[i % len(body)]
+            target.write(b'%.4f\t%s\n' % (float(time) + period*(i // len(body)), values))
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    with tempfile.TemporaryDirectory() as tempDir:
+        filename = os.path.join(tempDir,'TEMAScaled.txt')
+        scaleExampleFile(filename,rows)
+        print('{} rows, {:.1f} MB'.format(rows,os.path.getsize(filename)/1e6))
+        assert twoPassImportTemaData(filename).equals(temafunctions.importTemaData(filename))
+        twoPass = min(timeit.repeat(lambda: twoPassImportTemaData(filename),number=1,repeat=3))
+        singlePass = min(timeit.repeat(lambda: temafunctions.importTemaData(filename),number=1,repeat=3))
+        print('two-pass reader:    {:.3f} s'.format(twoPass))
+        print('single-pass reader: {:.3f} s ({:.2f}x)'.format(singlePass,twoPass/singlePass))
@@ -0,0 +1,30 @@
+'''
+Times the import of each temaanalyzer module in a fresh interpreter, the cost every worker process and command line call pays before doing any work. temaunits and temaschema should not load pandas or numpy, see tests/test_temaschema.py.
+
+Run with: python benchmarks/bench_package_import.py [repeats]
+The default is 5 imports of each module, of which the fastest is reported.
+'''
+import subprocess
+import sys
+
+modules = ['temaanalyzer','temaanalyzer.temaunits','temaanalyzer.temaschema','temaanalyzer.temafunctions','temaanalyzer.temadataset']
+
+def measureImport(module):
+    '''
+    Imports a module in a fresh interpreter.
+
+    :param module: The name of the module to import.
+    :type module: str
+    :returns: The import time in seconds, and whether pandas was loaded by it.
+    :rtype: (float,bool)
+    '''
+    script = 'import sys, time; start = time.perf_counter(); import '+module+'; print(time.perf_counter()-start, "pandas" in sys.modules)'
+    seconds, pandasLoaded = subprocess.run([sys.executable,'-c',script],capture_output=True,text=True,check=True).stdout.split()
+    return float(seconds), pandasLoaded == 'True'
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print('{:28s} {:>10s} {:>8s}'.format('module','time (ms)','pandas'))
+    for module in modules:
+        runs = [measureImport(module) for i in range(repeats)]
+        print('{:28s} {:10.1f} {:>8s}'.format(module,min(seconds for seconds,pandasLoaded in runs)*1000,'yes' if runs[0][1] else 'no'))
@@ -0,0 +1,33 @@
+'''
+Times calculateSmoothedDerivatives against plain calculateDerivatives on a synthetic frame of noisy tracking data with tracker dropouts.
+
+Run with: python benchmarks/bench_smoothing.py [rows] [columns]
+The defaults are 1,000,000 rows and 100 position columns (about 0.8 GB per copy of the data).
+'''
+import sys
+import timeit
+import numpy as np
+import pandas as pd
+from temaanalyzer import temafunctions
+
+def makeNoisyFrame(rows,columns,seed=0):
+    #sinusoidal tracks quantized to whole pixels, with a dropout every 50000 samples
+    generator = np.random.default_rng(seed)
+    time = np.arange(rows)*1e-5
+    phase = generator.uniform(0,2*np.pi,columns)
+    values = np.round(200*np.sin(2*np.pi*50*time[:,np.newaxis]+phase))
+    for start in range(25000,rows,50000):
+        values[start:start+10,generator.integers(columns)] = np.nan
+    names = ['Time[s]']+['{}Position{}[px]'.format('xy'[i%2],i//2+1) for i in range(columns)]
+    return pd.DataFrame(np.column_stack((time,values)),columns=names)
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    columns = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    dataframe = makeNoisyFrame(rows,columns)
+    print('{} rows x {} columns'.format(rows,columns))
+    runs = [('central differences',lambda: temafunctions.calculateDerivatives(dataframe,order=2)),
+            ('savgol',lambda: temafunctions.calculateSmoothedDerivatives(dataframe,method='savgol',window=21,polyorder=3)),
+            ('lowpass',lambda: temafunctions.calculateSmoothedDerivatives(dataframe,method='lowpass',cutoff=2000))]
+    for name,run in runs:
+        print('{:20s} {:.3f} s'.format(name,min(timeit.repeat(run,number=1,repeat=3))))
@@ -0,0 +1,65 @@
+'''
+Times every stage of the temafunctions pipeline separately on a synthetic TEMA file (see temagenerator.py), and reports the memory high-water mark of each stage as measured by tracemalloc.
+
+Run with: python benchmarks/bench_stages.py [rows] [points]
+The defaults are 200,000 rows and 20 points (128 columns). The same stages are also run by test_stages.py under pytest-benchmark.
+'''
+import os
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from temaanalyzer import temafunctions
+from temagenerator import makeTemaFile
+
+def getStageRuns(filename,exportFilename):
+    '''
+    Returns the stages of the pipeline, each as a callable that runs only that stage on the output of the stages before it.
+
+    :param filename: The name of the TEMA file to import.
+    :param exportFilename: The name of the file exportTemaData writes to.
+    :type filename: str
+    :type exportFilename: str
+    :returns: A list of (stage name, callable) tuples, in pipeline order.
+    :rtype: list
+    '''
+    rawDataframe = temafunctions.importTemaData(filename)
+    unitDataframe = temafunctions.standardizeUnits(rawDataframe)
+    formattedDataframe = temafunctions.standardizeColFormat(unitDataframe)
+    orderedDataframe = temafunctions.standardizeColOrder(formattedDataframe)
+    pxColumns = [column for column in orderedDataframe.columns if '[px]' in column]
+    return [('importTemaData',lambda: temafunctions.importTemaData(filename)),
+            ('standardizeUnits',lambda: temafunctions.standardizeUnits(rawDataframe)),
+            ('standardizeColFormat',lambda: temafunctions.standardizeColFormat(unitDataframe)),
+            ('standardizeColOrder',lambda: temafunctions.standardizeColOrder(formattedDataframe)),
+            ('calculateVelocity',lambda: temafunctions.calculateVelocity(orderedDataframe,orderedDataframe.columns[1])),
+            ('scalePxToDist',lambda: temafunctions.scalePxToDist(orderedDataframe,1000,pxColumns)),
+            ('exportTemaData',lambda: temafunctions.exportTemaData(exportFilename,orderedDataframe))]
+
+def measurePeakMemory(run):
+    '''
+    Returns the memory high-water mark of a single call, above what was allocated before it.
+
+    :param run: The callable to measure.
+    :type run: callable
+    :returns: The peak memory allocated during the call, in bytes.
+    :rtype: int
+    '''
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    points = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    with tempfile.TemporaryDirectory() as tempDir:
+        filename = os.path.join(tempDir,'TEMASynthetic.txt')
+        columns = makeTemaFile(filename,rows,points)
+        print('{} rows x {} columns, {:.1f} MB'.format(rows,columns,os.path.getsize(filename)/1e6))
+        print('{:22s} {:>10s} {:>12s}'.format('stage','time (s)','peak (MB)'))
+        for name,run in getStageRuns(filename,os.path.join(tempDir,'export.csv')):
+            seconds = min(timeit.repeat(run,number=1,repeat=3))
+            print('{:22s} {:10.3f} {:12.1f}'.format(name,seconds,measurePeakMemory(run)/1e6))
@@ -0,0 +1,58 @@
+'''
+Writes synthetic TEMA files for benchmarking, in the same tab delimited format TEMA exports: a three row header (point names, components with units, then the time unit and the tracker ids), 'X' for tracker dropouts and a mix of units.
+
+Each point gets x, y and abs position columns and the velocities TEMA computes for it. Points alternate between millimetres and pixels, and every fourth point also tracks an angle in degrees with its angular speed in degrees per second. Time is in milliseconds.
+'''
+import numpy as np
+import pandas as pd
+
+trackerId = '210602172914'
+
+def getTemaColumns(points):
+    #(point name, component and unit) for every column of a file with the given number of points
+    columns = []
+    for point in range(1,points+1):
+        unit = 'mm' if point % 2 else 'px'
+        columns += [('Default/Point#'+str(point),component+'['+unit+']') for component in ['x','y','abs']]
+        columns += [('Velocity (Default/Point#'+str(point)+')',component+'[m/s]') for component in ['abs','x','y']]
+        if point % 4 == 0:
+            columns += [('/Angle#'+str(point),'angle[degrees]'),('Velocity (/Angle#'+str(point)+')','angular speed['+chr(176)+'/s]')]
+    return columns
+
+def makeTemaFile(filename,rows=100000,points=10,dropoutRate=0.001,dropoutLength=20,seed=0):
+    '''
+    Writes a synthetic TEMA file.
+
+    :param filename: The name of the file to write.
+    :param rows: The number of samples. Default is 100000.
+    :param points: The number of tracked points. Default is 10.
+    :param dropoutRate: The chance of a dropout starting at any sample of a column. Default is 0.001.
+    :param dropoutLength: The number of samples each dropout lasts. Default is 20.
+    :param seed: The seed of the random number generator. Default is 0.
+    :type filename: str
+    :type rows: int
+    :type points: int
+    :type dropoutRate: float
+    :type dropoutLength: int
+    :type seed: int
+    :returns: The number of columns written, not counting time.
+    :rtype: int
+    '''
+    generator = np.random.default_rng(seed)
+    columns = getTemaColumns(points)
+    #smooth tracks with a little measurement noise
+    time = np.arange(rows)*0.125
+    phase = generator.uniform(0,2*np.pi,len(columns))
+    values = 100*np.sin(2*np.pi*time[:,np.newaxis]/1000+phase)+generator.normal(0,0.01,(rows,len(columns)))
+    #tracker dropouts, as well as the first sample of every velocity which TEMA cannot compute
+    for column in range(len(columns)):
+        for start in np.flatnonzero(generator.random(rows) < dropoutRate):
+            values[start:start+dropoutLength,column] = np.nan
+        if columns[column][0].startswith('Velocity'):
+            values[0,column] = np.nan
+    with open(filename,'w',newline='',encoding='latin-1') as temaFile:
+        temaFile.write('\t'.join(['Time']+[name for name,component in columns])+'\t\n')
+        temaFile.write('\t'.join(['']+[component for name,component in columns])+'\t\n')
+        temaFile.write('\t'.join(['[ms]']+[trackerId]*len(columns))+'\t\n')
+        pd.DataFrame(np.column_stack((time,values))).to_csv(temaFile,sep='\t',header=False,index=False,na_rep='X',float_format='%.6f',lineterminator='\n')
+    return len(columns)
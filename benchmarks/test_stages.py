@@ -0,0 +1,28 @@
+'''
+pytest-benchmark version of bench_stages.py, so stage timings can be saved and compared between runs:
+
+    pytest benchmarks --benchmark-autosave
+    pytest benchmarks --benchmark-compare
+
+The size of the synthetic file is set with the TEMA_BENCH_ROWS and TEMA_BENCH_POINTS environment variables (200,000 rows and 20 points by default). The memory high-water mark of each stage is saved in the extra_info of its result.
+'''
+import os
+import pytest
+from bench_stages import getStageRuns, measurePeakMemory
+from temagenerator import makeTemaFile
+
+pytest.importorskip('pytest_benchmark')
+
+stageNames = ['importTemaData','standardizeUnits','standardizeColFormat','standardizeColOrder','calculateVelocity','scalePxToDist','exportTemaData']
+
+@pytest.fixture(scope='module')
+def stageRuns(tmp_path_factory):
+    tempDir = tmp_path_factory.mktemp('bench')
+    filename = str(tempDir / 'TEMASynthetic.txt')
+    makeTemaFile(filename,int(os.environ.get('TEMA_BENCH_ROWS',200000)),int(os.environ.get('TEMA_BENCH_POINTS',20)))
+    return dict(getStageRuns(filename,str(tempDir / 'export.csv')))
+
+@pytest.mark.parametrize('stage',stageNames)
+def test_stage(benchmark,stageRuns,stage):
+    benchmark.extra_info['peakMemory'] = measurePeakMemory(stageRuns[stage])
+    benchmark.pedantic(stageRuns[stage],rounds=3,iterations=1)
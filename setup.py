@@ -13,7 +13,13 @@ setup(
     install_requires=['pandas>=1.3'],
     setup_requires=['pytest-runner'],
     tests_require=['pytest'],
+    entry_points={
+        'console_scripts': ['tema-analyzer=temaanalyzer.cli:main']
+    },
     extras_require={
-        'interactive': ['jupyterlab','altair']
+        'interactive': ['jupyterlab','altair'],
+        'parquet': ['pyarrow'],
+        'zstd': ['zstandard'],
+        'benchmark': ['pytest-benchmark']
     }
 )
\ No newline at end of file
@@ -0,0 +1,19 @@
+__version__ = '1.3.0'
+
+import importlib
+
+#the modules that need pandas are only imported when first used, so temaunits and temaschema can be imported on their own without loading pandas
+_lazyAttributes = {'temafunctions':('temaanalyzer.temafunctions',None), 'TemaDataset':('temaanalyzer.temadataset','TemaDataset'), 'TemaFollower':('temaanalyzer.temafollow','TemaFollower'), 'TemaIndex':('temaanalyzer.temaindex','TemaIndex'), 'PxCalibration':('temaanalyzer.temacalibration','PxCalibration')}
+
+def __getattr__(name):
+    if not name in _lazyAttributes:
+        raise AttributeError("module 'temaanalyzer' has no attribute '"+name+"'")
+    moduleName, attribute = _lazyAttributes[name]
+    value = importlib.import_module(moduleName)
+    if attribute:
+        value = getattr(value,attribute)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals())+list(_lazyAttributes))
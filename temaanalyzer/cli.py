@@ -0,0 +1,188 @@
+'''
+The tema-analyzer command: cleans TEMA files, optionally scales pixels and takes derivatives, and exports the results, spreading the files across a pool of worker processes, i.e.
+
+    tema-analyzer 'campaign/shot*.txt' --scale 1200 --derivatives 2 --format parquet --output-dir cleaned
+
+Progress is written to stderr as each file finishes. Every file is attempted even if others fail; the command then prints a per-file report of the failures and exits with status 1. Inputs that would be exported to the same file, such as files of the same name in different directories with --output-dir, are refused before any file is processed, as are inputs that would be overwritten by an export. pandas is only imported by the workers, so tema-analyzer --help is quick.
+'''
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+#the file extension of each output format
+formatExtensions = {'csv':'.csv', 'parquet':'.parquet', 'feather':'.feather'}
+compressionSuffixes = {'gzip':'.gz', 'zstd':'.zst'}
+
+def getParser():
+    '''
+    Returns the argument parser of the tema-analyzer command.
+
+    :Returns: The parser.
+    :rtype: argparse.ArgumentParser
+    '''
+    parser = argparse.ArgumentParser(prog='tema-analyzer',description='Clean, differentiate and export TEMA files in parallel.')
+    parser.add_argument('inputs',nargs='+',help='TEMA .txt files, directories of them or glob patterns matching them')
+    parser.add_argument('-o','--output-dir',help='the directory the exported files are written to (default: next to each input file)')
+    parser.add_argument('-f','--format',choices=list(formatExtensions),default='csv',help='the output file format (default: csv)')
+    parser.add_argument('--compression',choices=list(compressionSuffixes),help='compress csv output')
+    parser.add_argument('--float-format',help="a format string for csv values, i.e. '%%.6g'")
+    parser.add_argument('--scale',type=float,help='convert pixel columns to meters with scalePxToDist, in pixels per meter')
+    parser.add_argument('--meters-per-pixel',action='store_true',help='read --scale as meters per pixel instead')
+    parser.add_argument('-d','--derivatives',type=int,default=0,choices=range(4),help='the highest derivative to add: 1 for velocities, up to 3 for jerks (default: 0)')
+    parser.add_argument('--scheme',choices=['central','nonuniform','fivepoint'],default='central',help='the finite difference scheme of the derivatives (default: central)')
+    parser.add_argument('-c','--columns',nargs='+',help='export only these columns (time is always exported)')
+    parser.add_argument('--include-nan',action='store_true',help='keep rows with NaNs in them')
+    parser.add_argument('--nan-rows',choices=['any','all'],default='any',help="without --include-nan, strip rows with 'any' NaN or where 'all' data is NaN (default: any)")
+    parser.add_argument('--dtype',choices=['float64','float32'],default='float64',help='the float type the data is processed as (default: float64)')
+    parser.add_argument('-j','--workers',type=int,help='the number of worker processes (default: one per CPU)')
+    parser.add_argument('--report',help='also write the per-file report to this JSON file')
+    return parser
+
+def getInputFiles(inputs):
+    '''
+    Expands the input arguments of the command into a list of files. Directories are expanded to the .txt files in them, and glob patterns to the files they match.
+
+    :param inputs: File names, directories and glob patterns.
+    :type inputs: list
+    :Returns: The file names, in order and without duplicates.
+    :rtype: list
+    '''
+    filenames = []
+    for path in inputs:
+        if os.path.isdir(path):
+            filenames += sorted(glob.glob(os.path.join(path,'*.txt')))
+        elif glob.has_magic(path):
+            filenames += sorted(glob.glob(path))
+        else:
+            filenames.append(path)
+    return list(dict.fromkeys(filenames))
+
+def getOutputFile(filename,outputDir=None,fileFormat='csv',compression=None):
+    '''
+    Returns the name of the file an input file is exported to: the input's name with the extension of the output format, in outputDir or next to the input.
+
+    :param filename: The name of the input file.
+    :param outputDir: The directory the output is written to. Default is None, which uses the directory of the input file.
+    :param fileFormat: The output format, one of 'csv', 'parquet' or 'feather'. Default is 'csv'.
+    :param compression: The compression of a csv file, None, 'gzip' or 'zstd'. Default is None.
+    :type filename: str
+    :type outputDir: str
+    :type fileFormat: str
+    :type compression: str
+    :Returns: The output file name.
+    :rtype: str
+    '''
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    extension = formatExtensions[fileFormat]+(compressionSuffixes.get(compression,'') if fileFormat == 'csv' else '')
+    return os.path.join(outputDir if outputDir is not None else os.path.dirname(filename),stem+extension)
+
+def processTemaFile(filename,outputFilename,options):
+    '''
+    Runs the pipeline of the command on a single file: cleanImportTemaData, then scalePxToDist and calculateVelocities or calculateDerivatives if asked for, then exportTemaData.
+
+    :param filename: The name of the TEMA .txt file.
+    :param outputFilename: The name of the file to export to.
+    :param options: The parsed arguments of the command, as a dictionary.
+    :type filename: str
+    :type outputFilename: str
+    :type options: dict
+    :Returns: The number of rows processed (before any with NaNs are stripped) and columns exported.
+    :rtype: (int,int)
+    '''
+    #imported here rather than at the top, so only the workers pay for pandas
+    from temaanalyzer import temafunctions
+    dataframe = temafunctions.cleanImportTemaData(filename,options['dtype'])
+    if options['scale'] is not None:
+        dataframe = temafunctions.scalePxToDist(dataframe,options['scale'],metersPerPixel=options['meters_per_pixel'])
+    if options['derivatives'] == 1:
+        dataframe = temafunctions.calculateVelocities(dataframe,scheme=options['scheme'])
+    elif options['derivatives'] > 1:
+        dataframe = temafunctions.calculateDerivatives(dataframe,order=options['derivatives'],scheme=options['scheme'])
+    columns = options['columns']
+    if columns is not None:
+        missing = [column for column in columns if not column in dataframe.columns]
+        if missing:
+            raise KeyError('Columns not found: '+', '.join(missing))
+        columns = [dataframe.columns[0]]+[column for column in columns if column != dataframe.columns[0]]
+    temafunctions.exportTemaData(outputFilename,dataframe,columns,options['include_nan'],options['format'],options['nan_rows'],options['compression'] or 'infer',options['float_format'])
+    return (len(dataframe),len(columns) if columns is not None else len(dataframe.columns))
+
+def _runTemaFile(filename,outputFilename,options):
+    #worker for main - report failures instead of raising so one bad file doesn't stop the batch
+    start = time.perf_counter()
+    try:
+        rows, columns = processTemaFile(filename,outputFilename,options)
+        return {'file':filename,'output':outputFilename,'ok':True,'rows':rows,'columns':columns,'seconds':time.perf_counter()-start}
+    except Exception as error:
+        return {'file':filename,'output':outputFilename,'ok':False,'error':type(error).__name__+': '+str(error),'seconds':time.perf_counter()-start}
+
+def main(argv=None):
+    '''
+    Runs the tema-analyzer command.
+
+    :param argv: The command line arguments. Default is None, which uses sys.argv.
+    :type argv: list
+    :Returns: The exit status: 0 if every file was exported, 1 if any failed.
+    :rtype: int
+    '''
+    parser = getParser()
+    arguments = parser.parse_args(argv)
+    if arguments.meters_per_pixel and arguments.scale is None:
+        parser.error('--meters-per-pixel needs --scale')
+    filenames = getInputFiles(arguments.inputs)
+    if not filenames:
+        parser.error('no input files found')
+    jobs = [(filename,getOutputFile(filename,arguments.output_dir,arguments.format,arguments.compression)) for filename in filenames]
+    #files with the same name in different directories would overwrite each other's output, and an input already in the output format would overwrite itself, so refuse before any work starts
+    outputs = {}
+    for filename,outputFilename in jobs:
+        outputs.setdefault(os.path.normcase(os.path.abspath(outputFilename)),[]).append(filename)
+    collisions = [sources for sources in outputs.values() if len(sources) > 1]
+    if collisions:
+        parser.error('these files would be exported to the same file: '+'; '.join(', '.join(sources) for sources in collisions))
+    inputs = {os.path.normcase(os.path.abspath(filename)) for filename in filenames}
+    overwrites = [sources[0] for output,sources in outputs.items() if output in inputs]
+    if overwrites:
+        parser.error('these files would be overwritten by their own export: '+', '.join(overwrites))
+    if arguments.output_dir is not None:
+        os.makedirs(arguments.output_dir,exist_ok=True)
+    options = vars(arguments)
+
+    def progress(result):
+        #one line per file as soon as it finishes
+        count = '['+str(len(results))+'/'+str(len(jobs))+']'
+        if result['ok']:
+            print(count,'ok',result['file'],'->',result['output'],'({} rows, {:.2f} s)'.format(result['rows'],result['seconds']),file=sys.stderr,flush=True)
+        else:
+            print(count,'FAILED',result['file'],'-',result['error'],file=sys.stderr,flush=True)
+
+    results = []
+    if arguments.workers == 1 or len(jobs) < 2:
+        for filename,outputFilename in jobs:
+            results.append(_runTemaFile(filename,outputFilename,options))
+            progress(results[-1])
+    else:
+        with ProcessPoolExecutor(max_workers=arguments.workers) as executor:
+            futures = [executor.submit(_runTemaFile,filename,outputFilename,options) for filename,outputFilename in jobs]
+            for future in as_completed(futures):
+                results.append(future.result())
+                progress(results[-1])
+    #the report is in input order, whatever order the files finished in
+    order = {filename:position for position,(filename,outputFilename) in enumerate(jobs)}
+    results.sort(key=lambda result: order[result['file']])
+
+    failures = [result for result in results if not result['ok']]
+    print('{} of {} files exported'.format(len(results)-len(failures),len(results)))
+    for result in failures:
+        print('  FAILED',result['file'],'-',result['error'])
+    if arguments.report is not None:
+        with open(arguments.report,'w') as reportFile:
+            json.dump(results,reportFile,indent=2)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,240 @@
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+import temaanalyzer
+from temaanalyzer import temafunctions
+
+
+#where cached files are stored if no cacheDir is given
+defaultCacheDir = os.environ.get('TEMAANALYZER_CACHE_DIR',os.path.join(os.path.expanduser('~'),'.cache','temaanalyzer'))
+#the file extension used for the data of each cache format
+cacheExtensions = {'npy':'.npy', 'parquet':'.parquet', 'feather':'.feather'}
+
+def getCacheKey(filename,cacheFormat='npy',hashContents=False,dtype='float64'):
+    '''
+    Returns the key a TEMA file is cached under. The key changes whenever the file, its modification time or size, the library version, the registered units, the cache format or the data type changes, so stale entries are never read back.
+
+    :param filename: The name of the TEMA .txt file.
+    :param cacheFormat: The format the cleaned data is cached in, one of 'npy', 'parquet' or 'feather'. Default is 'npy'.
+    :param hashContents: Determines whether the key is built from a hash of the file contents instead of its modification time and size. Slower, but robust to files being copied or touched. Default is False.
+    :param dtype: The float type the cleaned data is stored as, 'float64' or 'float32'. Default is 'float64'.
+    :type filename: str
+    :type cacheFormat: str
+    :type hashContents: bool
+    :type dtype: str
+    :Returns: The cache key, a hexadecimal string.
+    :rtype: str
+    '''
+    #registered units change the cleaned data too
+    units = sorted([unit,standardUnit,scaleFactor] for unit,(standardUnit,scaleFactor) in temafunctions.unitRegistry.items())
+    return hashlib.sha256(json.dumps(_getSourceFingerprint(filename,hashContents)+[temaanalyzer.__version__,cacheFormat,np.dtype(dtype).name,units]).encode()).hexdigest()
+
+def _getSourceFingerprint(filename,hashContents=False):
+    #what identifies a version of the source file: a hash of its contents, or its path, modification time and size
+    source = os.path.abspath(filename)
+    if hashContents:
+        contentHash = hashlib.sha256()
+        with open(source,'rb') as sourceFile:
+            for block in iter(lambda: sourceFile.read(1<<20),b''):
+                contentHash.update(block)
+        return [contentHash.hexdigest()]
+    stat = os.stat(source)
+    return [source,stat.st_mtime_ns,stat.st_size]
+
+def _writeTemporaryFile(cacheDir,key,write):
+    #a unique temporary name per writer, so processes caching the same file never write to each other's files
+    handle, temporaryPath = tempfile.mkstemp(prefix=key+'.',suffix='.tmp',dir=cacheDir)
+    os.close(handle)
+    try:
+        write(temporaryPath)
+    except BaseException:
+        os.remove(temporaryPath)
+        raise
+    return temporaryPath
+
+def _writeCacheEntry(dataPath,dataframe,cacheFormat):
+    if cacheFormat == 'npy':
+        #stored one column per row, so each column maps back as a contiguous slice
+        with open(dataPath,'wb') as dataFile:
+            np.save(dataFile,np.ascontiguousarray(dataframe.to_numpy().T))
+    else:
+        temafunctions.exportTemaData(dataPath,dataframe,includeNaN=True,fileFormat=cacheFormat)
+
+def _readCacheEntry(dataPath,columns,cacheFormat):
+    if cacheFormat == 'npy':
+        #copy-on-write, so the frame can be modified like any other without changing the cache entry
+        values = np.load(dataPath,mmap_mode='c')
+        return pd.DataFrame(values.T,columns=columns,copy=False)
+    elif cacheFormat == 'parquet':
+        return pd.read_parquet(dataPath)
+    else:
+        return pd.read_feather(dataPath)
+
+def _removeCacheEntry(cacheDir,key):
+    for extension in list(cacheExtensions.values())+['.json']:
+        try:
+            os.remove(os.path.join(cacheDir,key+extension))
+        except FileNotFoundError:
+            pass
+
+def getCacheSize(cacheDir=None):
+    '''
+    Returns the total size of the files in the cache directory.
+
+    :param cacheDir: The cache directory. Default is None, which uses the TEMAANALYZER_CACHE_DIR environment variable or ~/.cache/temaanalyzer.
+    :type cacheDir: str
+    :Returns: The size of the cache in bytes.
+    :rtype: int
+    '''
+    cacheDir = cacheDir or defaultCacheDir
+    if not os.path.isdir(cacheDir):
+        return 0
+    return sum(entry.stat().st_size for entry in os.scandir(cacheDir) if entry.is_file())
+
+def evictTemaCache(maxCacheSize,cacheDir=None):
+    '''
+    Removes the least recently used cache entries until the cache is no larger than maxCacheSize.
+
+    :param maxCacheSize: The maximum size of the cache in bytes.
+    :param cacheDir: The cache directory. Default is None, which uses the TEMAANALYZER_CACHE_DIR environment variable or ~/.cache/temaanalyzer.
+    :type maxCacheSize: int
+    :type cacheDir: str
+    :returns: None.
+    '''
+    cacheDir = cacheDir or defaultCacheDir
+    if not os.path.isdir(cacheDir):
+        return
+    #group the files of each entry together - an entry is last used when its metadata was last touched
+    entries = {}
+    for entry in os.scandir(cacheDir):
+        if entry.is_file():
+            key, extension = os.path.splitext(entry.name)
+            size, lastUsed = entries.get(key,(0,0))
+            if extension == '.json':
+                lastUsed = entry.stat().st_mtime
+            entries[key] = (size+entry.stat().st_size,lastUsed)
+    cacheSize = sum(size for size,lastUsed in entries.values())
+    for key in sorted(entries,key=lambda key: entries[key][1]):
+        if cacheSize <= maxCacheSize:
+            break
+        _removeCacheEntry(cacheDir,key)
+        cacheSize -= entries[key][0]
+
+def clearTemaCache(cacheDir=None):
+    '''
+    Removes every entry from the cache.
+
+    :param cacheDir: The cache directory. Default is None, which uses the TEMAANALYZER_CACHE_DIR environment variable or ~/.cache/temaanalyzer.
+    :type cacheDir: str
+    :returns: None.
+    '''
+    evictTemaCache(0,cacheDir)
+
+def cleanImportTemaDataCached(filename,useCache=True,cacheDir=None,cacheFormat='npy',maxCacheSize=2**31,hashContents=False,dtype='float64'):
+    '''
+    Returns the cleaned TEMA data file as a Pandas dataframe, like cleanImportTemaData, but keeps a binary copy of the cleaned data on disk so later loads of the same file skip parsing the text entirely. With the default 'npy' format, cached data is memory-mapped rather than read into memory.
+
+    Entries are keyed by the absolute path, modification time and size of the source file (or a hash of its contents) and the library version. When a file changes, the entries built from older versions of it are removed, while entries of the current version in other formats or types are kept; when the cache grows beyond maxCacheSize, the least recently used entries are removed.
+
+    :param filename: The name of the TEMA .txt file you wish to import. Note that the imported file should be a tab delineated text file.
+    :param useCache: Determines whether the cache is used. If false, the file is imported with cleanImportTemaData and the cache is neither read nor written. Default is True.
+    :param cacheDir: The cache directory. Default is None, which uses the TEMAANALYZER_CACHE_DIR environment variable or ~/.cache/temaanalyzer.
+    :param cacheFormat: The format the cleaned data is cached in, one of 'npy', 'parquet' or 'feather'. 'parquet' and 'feather' require pyarrow. Default is 'npy'.
+    :param maxCacheSize: The maximum size of the cache in bytes. Default is 2 GiB.
+    :param hashContents: Determines whether entries are keyed by a hash of the file contents instead of its modification time and size. Default is False.
+    :param dtype: The float type the data is stored as, 'float64' or 'float32' (see cleanImportTemaData). float32 data cached as 'npy' is read into memory rather than memory-mapped. Default is 'float64'.
+    :type filename: str
+    :type useCache: bool
+    :type cacheDir: str
+    :type cacheFormat: str
+    :type maxCacheSize: int
+    :type hashContents: bool
+    :type dtype: str
+    :Returns: newDataFrame, a pandas Data Frame that contains the cleaned content of the input. Data read from an 'npy' cache entry is mapped copy-on-write: it can be modified, and only the pages that are modified are copied into memory, while the cache entry itself is never changed.
+    :rtype: DataFrame
+    '''
+    if not useCache:
+        return temafunctions.cleanImportTemaData(filename,dtype)
+    if not cacheFormat in cacheExtensions:
+        raise ValueError('Unknown cache format: '+str(cacheFormat))
+    cacheDir = cacheDir or defaultCacheDir
+    key = getCacheKey(filename,cacheFormat,hashContents,dtype)
+    dataPath = os.path.join(cacheDir,key+cacheExtensions[cacheFormat])
+    metadataPath = os.path.join(cacheDir,key+'.json')
+
+    if os.path.exists(metadataPath) and os.path.exists(dataPath):
+        with open(metadataPath) as metadataFile:
+            metadata = json.load(metadataFile)
+        #mark the entry as recently used
+        os.utime(metadataPath)
+        dataframe = _readCacheEntry(dataPath,metadata['columns'],cacheFormat)
+        #npy entries hold a single type, so float32 data (with its float64 time column) is cast back on load
+        if cacheFormat == 'npy' and np.dtype(dtype) != np.float64 and len(dataframe.columns) > 1:
+            dataframe = dataframe.astype(dict(zip(dataframe.columns[1:],[dtype]*(len(dataframe.columns)-1))))
+        #restore the segment index so it is not rebuilt from the data
+        if 'segments' in metadata and 'fingerprints' in metadata:
+            dataframe.attrs['temaSegments'] = (metadata['length'],{column:tuple(map(tuple,columnSegments)) for column,columnSegments in zip(metadata['columns'],metadata['segments'])},dict(zip(metadata['columns'],metadata['fingerprints'])))
+        return dataframe
+
+    dataframe = temafunctions.cleanImportTemaData(filename,dtype)
+    os.makedirs(cacheDir,exist_ok=True)
+    #the source file has changed (or is new) - drop any entries built from an older version of it, in any format or type
+    source = os.path.abspath(filename)
+    fingerprints = {hashContents:_getSourceFingerprint(filename,hashContents)}
+    for entry in os.scandir(cacheDir):
+        if entry.name.endswith('.json'):
+            try:
+                with open(entry.path) as metadataFile:
+                    metadata = json.load(metadataFile)
+                if metadata.get('source') == source:
+                    #entries keyed by a content hash have a fingerprint of just the hash
+                    entryHashContents = len(metadata.get('fingerprint',[])) == 1
+                    if not entryHashContents in fingerprints:
+                        fingerprints[entryHashContents] = _getSourceFingerprint(filename,entryHashContents)
+                    if metadata.get('fingerprint') != fingerprints[entryHashContents]:
+                        _removeCacheEntry(cacheDir,entry.name[:-len('.json')])
+            except (OSError,ValueError):
+                pass
+    #write to temporary names first so a crash never leaves a half-written entry behind
+    os.replace(_writeTemporaryFile(cacheDir,key,lambda path: _writeCacheEntry(path,dataframe,cacheFormat)),dataPath)
+    length, segments, segmentFingerprints = dataframe.attrs['temaSegments']
+    metadata = {'source':source,'fingerprint':fingerprints[hashContents],'columns':list(dataframe.columns),'length':length,'segments':[segments[column] for column in dataframe.columns],'fingerprints':[segmentFingerprints[column] for column in dataframe.columns],'version':temaanalyzer.__version__}
+    def writeMetadata(path):
+        with open(path,'w') as metadataFile:
+            json.dump(metadata,metadataFile)
+    os.replace(_writeTemporaryFile(cacheDir,key,writeMetadata),metadataPath)
+    evictTemaCache(maxCacheSize,cacheDir)
+    return dataframe
+
+def cleanImportTemaWindowCached(filename,start,stop,cacheDir=None,maxCacheSize=2**31,hashContents=False,dtype='float64'):
+    '''
+    Returns the cleaned rows of a TEMA file whose time is in a window, like TemaIndex.query, but from the 'npy' cache of cleanImportTemaDataCached. The cached data is memory-mapped and the window is found by a binary search of the time column, so only the pages holding the window are read from disk. The first call for a file still imports and caches all of it.
+
+    :param filename: The name of the TEMA .txt file you wish to import. Note that the imported file should be a tab delineated text file.
+    :param start: The start of the window, in the units of the cleaned time column (seconds).
+    :param stop: The end of the window, included, in the same units.
+    :param cacheDir: The cache directory (see cleanImportTemaDataCached). Default is None.
+    :param maxCacheSize: The maximum size of the cache in bytes. Default is 2 GiB.
+    :param hashContents: Determines whether entries are keyed by a hash of the file contents. Default is False.
+    :param dtype: The float type the data is stored as, 'float64' or 'float32'. float32 entries are read into memory in full. Default is 'float64'.
+    :type filename: str
+    :type start: float
+    :type stop: float
+    :type cacheDir: str
+    :type maxCacheSize: int
+    :type hashContents: bool
+    :type dtype: str
+    :Returns: newDataFrame, a pandas DataFrame of the cleaned rows in the window, numbered by their row in the file.
+    :rtype: DataFrame
+    '''
+    dataframe = cleanImportTemaDataCached(filename,cacheDir=cacheDir,cacheFormat='npy',maxCacheSize=maxCacheSize,hashContents=hashContents,dtype=dtype)
+    time = dataframe.iloc[:,0].to_numpy()
+    first, last = np.searchsorted(time,start,side='left'), np.searchsorted(time,stop,side='right')
+    #copied out of the memory map, so the window does not hold the whole cache entry open
+    newDataframe = dataframe.iloc[first:last].copy()
+    newDataframe.attrs = {}
+    temafunctions.buildSegmentIndex(newDataframe)
+    return newDataframe
@@ -0,0 +1,240 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from temaanalyzer import temafunctions
+
+
+#the models a PxCalibration can use
+calibrationModels = ['homography','polynomial']
+
+def _getPolynomialPowers(degree):
+    #the (x power, y power) of every term of a 2-D polynomial of the given degree
+    return [(xPower,total-xPower) for total in range(degree+1) for xPower in range(total,-1,-1)]
+
+def _normalizePoints(points):
+    #the similarity transform that centres points on the origin at an average distance of sqrt(2), which keeps the homography fit well conditioned
+    centre = points.mean(axis=0)
+    spread = np.sqrt(((points-centre)**2).sum(axis=1)).mean()
+    scale = np.sqrt(2)/spread if spread > 0 else 1.0
+    return np.array([[scale,0,-scale*centre[0]],[0,scale,-scale*centre[1]],[0,0,1]])
+
+class PxCalibration:
+    '''
+    A camera calibration that maps pixel coordinates to world coordinates, for cameras whose lens distortion or perspective a single pixels per meter factor (see scalePxToDist) cannot correct. The 'homography' model is a 3x3 projective transform, which corrects the perspective of a camera viewing a plane at an angle. The 'polynomial' model maps x and y through 2-D polynomials, which also corrects smooth lens distortion. Calibrations are usually fitted to reference points with fromPoints and saved to a file, so every run from the same camera can reuse them with loadCalibration, i.e.
+
+        calibration = PxCalibration.fromPoints(pixelPoints,worldPoints,model='polynomial',degree=3)
+        calibration.save('camera1.json')
+        dataframe = calibratePxToDist(dataframe,loadCalibration('camera1.json'))
+
+    :param model: The model, 'homography' or 'polynomial'.
+    :param coefficients: For 'homography', the 3x3 matrix. For 'polynomial', a 2xN array of the coefficients of the x and y polynomials, one per term of the polynomial in the order 1, x, y, x^2, xy, y^2 and so on.
+    :param unit: The unit of the world coordinates. Default is 'm'.
+    :type model: str
+    :type coefficients: array
+    :type unit: str
+    '''
+    def __init__(self,model,coefficients,unit='m'):
+        if not model in calibrationModels:
+            raise ValueError('Unknown calibration model: '+str(model))
+        self.model = model
+        self.coefficients = np.array(coefficients,dtype='float64')
+        self.unit = unit
+        if model == 'homography' and self.coefficients.shape != (3,3):
+            raise ValueError('A homography needs a 3x3 matrix')
+        if model == 'polynomial':
+            self.degree = next((degree for degree in range(10) if len(_getPolynomialPowers(degree)) == self.coefficients.shape[-1]),None)
+            if self.coefficients.ndim != 2 or len(self.coefficients) != 2 or self.degree is None:
+                raise ValueError('A polynomial needs a 2xN array of coefficients, with one per term of a polynomial')
+            self._powers = np.array(_getPolynomialPowers(self.degree))
+
+    @classmethod
+    def fromPoints(cls,pixelPoints,worldPoints,model='homography',degree=2,unit='m'):
+        '''
+        Fits a calibration to reference points whose pixel and world coordinates are both known, such as the corners of a calibration grid, by least squares.
+
+        :param pixelPoints: An Nx2 array of the (x, y) pixel coordinates of the points.
+        :param worldPoints: An Nx2 array of the (x, y) world coordinates of the same points.
+        :param model: The model, 'homography' or 'polynomial'. A homography needs at least 4 points, and a polynomial at least as many as it has terms (6 for degree 2, 10 for degree 3). Default is 'homography'.
+        :param degree: The degree of a polynomial model. Default is 2.
+        :param unit: The unit of the world coordinates. Default is 'm'.
+        :type pixelPoints: array
+        :type worldPoints: array
+        :type model: str
+        :type degree: int
+        :type unit: str
+        :Returns: The fitted calibration.
+        :rtype: PxCalibration
+        '''
+        pixelPoints = np.asarray(pixelPoints,dtype='float64')
+        worldPoints = np.asarray(worldPoints,dtype='float64')
+        if model == 'homography':
+            if len(pixelPoints) < 4:
+                raise ValueError('A homography needs at least 4 points')
+            #the direct linear transform, on normalized points
+            pixelNorm, worldNorm = _normalizePoints(pixelPoints), _normalizePoints(worldPoints)
+            x, y = (pixelNorm @ np.column_stack((pixelPoints,np.ones(len(pixelPoints)))).T)[:2]
+            u, v = (worldNorm @ np.column_stack((worldPoints,np.ones(len(worldPoints)))).T)[:2]
+            zeros, ones = np.zeros(len(x)), np.ones(len(x))
+            system = np.concatenate((np.column_stack((-x,-y,-ones,zeros,zeros,zeros,u*x,u*y,u)),np.column_stack((zeros,zeros,zeros,-x,-y,-ones,v*x,v*y,v))))
+            matrix = np.linalg.svd(system)[2][-1].reshape(3,3)
+            matrix = np.linalg.inv(worldNorm) @ matrix @ pixelNorm
+            return cls('homography',matrix/matrix[2,2],unit)
+        elif model == 'polynomial':
+            powers = np.array(_getPolynomialPowers(degree))
+            if len(pixelPoints) < len(powers):
+                raise ValueError('A degree '+str(degree)+' polynomial needs at least '+str(len(powers))+' points')
+            terms = pixelPoints[:,0:1]**powers[:,0]*pixelPoints[:,1:2]**powers[:,1]
+            return cls('polynomial',np.linalg.lstsq(terms,worldPoints,rcond=None)[0].T,unit)
+        raise ValueError('Unknown calibration model: '+str(model))
+
+    def transform(self,x,y):
+        '''
+        Maps pixel coordinates to world coordinates. Arrays of any shape are mapped at once, i.e. every sample of every point of a camera.
+
+        :param x: The x pixel coordinates.
+        :param y: The y pixel coordinates, with the same shape as x.
+        :type x: array
+        :type y: array
+        :Returns: The x and y world coordinates, with the same shape as x.
+        :rtype: (array,array)
+        '''
+        x, y = np.asarray(x,dtype='float64'), np.asarray(y,dtype='float64')
+        if self.model == 'homography':
+            matrix = self.coefficients
+            w = matrix[2,0]*x+matrix[2,1]*y+matrix[2,2]
+            return ((matrix[0,0]*x+matrix[0,1]*y+matrix[0,2])/w,(matrix[1,0]*x+matrix[1,1]*y+matrix[1,2])/w)
+        terms = self._getTerms(x,y)
+        return (terms @ self.coefficients[0],terms @ self.coefficients[1])
+
+    def jacobian(self,x,y):
+        '''
+        Returns the derivatives of the world coordinates with respect to the pixel coordinates, which map pixel velocities at those coordinates to world velocities.
+
+        :param x: The x pixel coordinates.
+        :param y: The y pixel coordinates, with the same shape as x.
+        :type x: array
+        :type y: array
+        :Returns: The derivatives dX/dx, dX/dy, dY/dx and dY/dy of the world coordinates X and Y, each with the same shape as x.
+        :rtype: (array,array,array,array)
+        '''
+        x, y = np.asarray(x,dtype='float64'), np.asarray(y,dtype='float64')
+        if self.model == 'homography':
+            matrix = self.coefficients
+            w = matrix[2,0]*x+matrix[2,1]*y+matrix[2,2]
+            worldX, worldY = self.transform(x,y)
+            return ((matrix[0,0]-worldX*matrix[2,0])/w,(matrix[0,1]-worldX*matrix[2,1])/w,(matrix[1,0]-worldY*matrix[2,0])/w,(matrix[1,1]-worldY*matrix[2,1])/w)
+        #the derivative of each term x^i y^j is i x^(i-1) y^j along x and j x^i y^(j-1) along y
+        xTerms = self._getTerms(x,y,self._powers-[1,0])*self._powers[:,0]
+        yTerms = self._getTerms(x,y,self._powers-[0,1])*self._powers[:,1]
+        return (xTerms @ self.coefficients[0],yTerms @ self.coefficients[0],xTerms @ self.coefficients[1],yTerms @ self.coefficients[1])
+
+    def _getTerms(self,x,y,powers=None):
+        #every term of the polynomial at every coordinate, as a (..., terms) array
+        powers = self._powers if powers is None else np.maximum(powers,0)
+        return x[...,np.newaxis]**powers[:,0]*y[...,np.newaxis]**powers[:,1]
+
+    def save(self,filename):
+        '''
+        Saves the calibration to a JSON file, to be loaded with loadCalibration.
+
+        :param filename: The name of the file.
+        :type filename: str
+        :returns: None.
+        '''
+        with open(filename,'w') as calibrationFile:
+            json.dump({'model':self.model,'coefficients':self.coefficients.tolist(),'unit':self.unit},calibrationFile)
+
+def loadCalibration(filename):
+    '''
+    Loads a calibration saved with PxCalibration.save. Calibrations are cached by file, so every run from the same camera in a process shares one calibration object, and a calibration file that changes is read again.
+
+    :param filename: The name of the file.
+    :type filename: str
+    :Returns: The calibration.
+    :rtype: PxCalibration
+    '''
+    return _loadCalibration(os.path.abspath(filename),os.stat(filename).st_mtime_ns)
+
+@lru_cache(maxsize=64)
+def _loadCalibration(filename,modified):
+    with open(filename) as calibrationFile:
+        calibration = json.load(calibrationFile)
+    return PxCalibration(calibration['model'],calibration['coefficients'],calibration.get('unit','m'))
+
+def calibratePxToDist(dataframe,calibration,points=None):
+    '''
+    Returns a Pandas DataFrame of the TEMA data where the pixel positions and velocities of tracked points have been mapped to world coordinates through a camera calibration. All of the points that share a calibration are mapped at once, as a single transform of every x and y position column. Each xPosition and yPosition pair in px is replaced by its world coordinates, and absPosition by their magnitude. Velocities in px/s are mapped through the derivatives of the calibration at the point's position. Other pixel columns, such as accelerations, are left as they are; take the derivatives of the calibrated positions with calculateDerivatives instead.
+
+    :param dataframe: Pandas DataFrame that contains the cleaned and reordered data.
+    :param calibration: The PxCalibration of the camera, or a dictionary mapping point numbers to the PxCalibration of the camera that tracked them.
+    :param points: The numbers of the points to calibrate. Default is None, which calibrates every point with both x and y positions in px (and, if calibration is a dictionary, a calibration).
+    :type dataframe: DataFrame
+    :type calibration: PxCalibration
+    :type points: list
+    :Returns: newDataFrame, a Pandas DataFrame containing the original data, with the pixel positions and velocities of the calibrated points in world units.
+    :rtype: DataFrame
+    '''
+    #the px position and velocity columns of every point
+    pointColumns = {}
+    for info in temafunctions.getColumnSchema(dataframe.columns):
+        if info.isStandard and info.index and info.component and info.numeratorUnit == 'px' and info.expression in ['Position','Velocity']:
+            pointColumns.setdefault(info.index,{})[info.component+info.expression] = info
+    if points is None:
+        points = [index for index,columns in pointColumns.items() if 'xPosition' in columns and 'yPosition' in columns and (not isinstance(calibration,dict) or int(index) in calibration)]
+    points = [str(point) for point in points]
+    for point in points:
+        if not ('xPosition' in pointColumns.get(point,{}) and 'yPosition' in pointColumns.get(point,{})):
+            raise ValueError('Point '+point+' does not have both an xPosition and a yPosition column in px')
+    #the points that share each calibration object
+    groups = {}
+    for point in points:
+        pointCalibration = calibration[int(point)] if isinstance(calibration,dict) else calibration
+        groups.setdefault(id(pointCalibration),(pointCalibration,[]))[1].append(point)
+
+    #the new values and names of every column that is calibrated
+    newColumns = {}
+    def gather(groupPoints,measurement):
+        return dataframe[[pointColumns[point][measurement].name for point in groupPoints]].to_numpy(dtype='float64')
+    def scatter(groupPoints,measurement,values,unit):
+        for point,column in zip(groupPoints,values.T):
+            info = pointColumns[point].get(measurement)
+            if info is not None:
+                #velocities keep the time unit of their own column
+                columnUnit = unit+'/'+info.denominatorUnit if info.denominatorUnit else unit
+                newColumns[info.name] = (info.name.replace(info.unitString,'['+columnUnit+']'),column)
+    for pointCalibration,groupPoints in groups.values():
+        x, y = gather(groupPoints,'xPosition'), gather(groupPoints,'yPosition')
+        worldX, worldY = pointCalibration.transform(x,y)
+        scatter(groupPoints,'xPosition',worldX,pointCalibration.unit)
+        scatter(groupPoints,'yPosition',worldY,pointCalibration.unit)
+        scatter(groupPoints,'absPosition',np.hypot(worldX,worldY),pointCalibration.unit)
+        #velocities are mapped where both of their components are in px
+        velocityPoints = [point for point in groupPoints if 'xVelocity' in pointColumns[point] and 'yVelocity' in pointColumns[point]]
+        if velocityPoints:
+            velocityX, velocityY = gather(velocityPoints,'xVelocity'), gather(velocityPoints,'yVelocity')
+            velocityPositions = [groupPoints.index(point) for point in velocityPoints]
+            dXdx, dXdy, dYdx, dYdy = pointCalibration.jacobian(x[:,velocityPositions],y[:,velocityPositions])
+            worldVelocityX, worldVelocityY = dXdx*velocityX+dXdy*velocityY, dYdx*velocityX+dYdy*velocityY
+            scatter(velocityPoints,'xVelocity',worldVelocityX,pointCalibration.unit)
+            scatter(velocityPoints,'yVelocity',worldVelocityY,pointCalibration.unit)
+            scatter(velocityPoints,'absVelocity',np.hypot(worldVelocityX,worldVelocityY),pointCalibration.unit)
+    if not newColumns:
+        return dataframe.copy()
+
+    #write every calibrated column back in one go and rename them
+    positions = np.array([dataframe.columns.get_loc(column) for column in newColumns])
+    values = np.column_stack([columnValues for newCol,columnValues in newColumns.values()])
+    #each column keeps the type of its source column, so float32 columns stay float32
+    storageTypes = np.array([temafunctions.getStorageType(dataframe,[column]) for column in newColumns])
+    newDataframe = dataframe.copy()
+    for storageType in set(storageTypes):
+        group = np.flatnonzero(storageTypes == storageType)
+        newDataframe.iloc[:,positions[group]] = values[:,group].astype(storageType,copy=False)
+    renamed = list(dataframe.columns)
+    for position,(newCol,columnValues) in zip(positions,newColumns.values()):
+        renamed[position] = newCol
+    newDataframe = newDataframe.set_axis(renamed,axis='columns')
+    newDataframe.attrs = dataframe.attrs
+    return newDataframe
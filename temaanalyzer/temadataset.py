@@ -0,0 +1,305 @@
+import copy
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+from temaanalyzer import temafunctions
+
+
+#how a single column of a TemaDataset is computed: kind is 'source' (a column of the file or DataFrame, named by its position or name in source) or 'rate' (the time derivative of the plan in source, against the plan in time, using scheme), multiplied by scale
+ColumnPlan = namedtuple('ColumnPlan', ['kind','source','scale','scheme','time'])
+
+class TemaDataset:
+    '''
+    A lazy view of TEMA data. The methods mirror the temafunctions stages (standardizeUnits, scalePxToDist, changeColUnit, calculateVelocity, stripColUnit and so on), but instead of copying the data at every step they only record how each column is computed: renames are merged into the column names and successive scale factors into one factor per column. Nothing is read or computed until collect or exportTemaData is called, and then only the file columns that the requested columns depend on are parsed, i.e.
+
+        dataset = TemaDataset('run.txt').scalePxToDist(1200).calculateVelocities()
+        velocities = dataset.collect(['xVelocity3[m/s]','yVelocity3[m/s]'])
+
+    Every method returns a new TemaDataset, so a dataset can be branched without affecting the original.
+
+    :param source: The name of a TEMA .txt file, or a Pandas DataFrame of TEMA data.
+    :param clean: Determines whether a file is cleaned on import, as by cleanImportTemaData. If false, the columns are the raw TEMA columns, as by importTemaData. Ignored for DataFrames. Default is True.
+    :param dtype: The float type the collected data is stored as, 'float64' or 'float32'. The time column is always float64, and everything is computed in float64. Default is 'float64'.
+    :type source: str
+    :type clean: bool
+    :type dtype: str
+    '''
+    def __init__(self,source,clean=True,dtype='float64'):
+        self.source = source
+        self.dtype = np.dtype(dtype)
+        if isinstance(source,pd.DataFrame):
+            self.headers = None
+            self._plans = [(col,ColumnPlan('source',col,1.0,None,None)) for col in source.columns]
+            return
+        with open(source,'rb') as csvfile:
+            self.headers = temafunctions.readTemaHeader(csvfile)
+        if clean:
+            plan = temafunctions.getCleanImportPlan(self.headers)
+            self._plans = [(col,ColumnPlan('source',position,float(scale),None,None)) for col,position,scale in zip(plan.columns,plan.positions,plan.scale)]
+        else:
+            self._plans = [(col,ColumnPlan('source',position,1.0,None,None)) for position,col in enumerate(self.headers) if col != ' ']
+
+    def __repr__(self):
+        source = 'DataFrame' if self.headers is None else repr(self.source)
+        return 'TemaDataset({}, {} columns)'.format(source,len(self._plans))
+
+    @property
+    def columns(self):
+        '''
+        The names of the columns the dataset will have once collected.
+        '''
+        return [col for col,plan in self._plans]
+
+    def _withPlans(self,plans):
+        newDataset = copy.copy(self)
+        newDataset._plans = plans
+        return newDataset
+
+    def _getPlans(self):
+        #the first plan of each column name, as DataFrame lookups by name would find it
+        plans = {}
+        for col,plan in self._plans:
+            plans.setdefault(col,plan)
+        return plans
+
+    def _renamed(self,renameDict,scaleDict={}):
+        return self._withPlans([(renameDict.get(col,col),plan._replace(scale=plan.scale*scaleDict.get(col,1))) for col,plan in self._plans])
+
+    def _added(self,newPlans):
+        #new columns are appended, or replace an existing column of the same name in place
+        plans = list(self._plans)
+        columns = self.columns
+        for col,plan in newPlans:
+            if col in columns:
+                plans[columns.index(col)] = (col,plan)
+            else:
+                plans.append((col,plan))
+                columns.append(col)
+        return self._withPlans(plans)
+
+    def select(self,columns):
+        '''
+        Returns the dataset with only some of its columns. The first (time) column is always kept, in front of the selected columns.
+
+        :param columns: List of column names.
+        :type columns: list
+        :Returns: A TemaDataset with the selected columns.
+        :rtype: TemaDataset
+        '''
+        plans = self._getPlans()
+        missingColumns = [col for col in columns if not col in plans]
+        if missingColumns:
+            raise KeyError('Columns not in dataset: '+', '.join(missingColumns))
+        timeColumn = self._plans[0][0]
+        return self._withPlans([self._plans[0]]+[(col,plans[col]) for col in columns if col != timeColumn])
+
+    def standardizeUnits(self):
+        '''
+        Records the conversion to standard units of s, m and radians, as standardizeUnits does.
+
+        :Returns: A TemaDataset with standard units.
+        :rtype: TemaDataset
+        '''
+        conversions = {col:temafunctions.getColumnUnitConversion(col) for col in self.columns}
+        return self._renamed({col:newCol for col,(newCol,unitConversion) in conversions.items()},{col:unitConversion for col,(newCol,unitConversion) in conversions.items()})
+
+    def standardizeColFormat(self):
+        '''
+        Records the relabeling of the columns to the standardized format, as standardizeColFormat does.
+
+        :Returns: A TemaDataset with standardized column names.
+        :rtype: TemaDataset
+        '''
+        return self._renamed({info.name:info.formattedName for info in temafunctions.getColumnSchema(self.columns)})
+
+    def standardizeColOrder(self,renumber=False):
+        '''
+        Records the reordering (and optional renumbering) of the columns, as standardizeColOrder does.
+
+        :param renumber: Whether to renumber the particle numbers to be in numerical order from 1. False as default.
+        :type renumber: bool
+        :Returns: A TemaDataset with reordered columns.
+        :rtype: TemaDataset
+        '''
+        orderedPositions, renameDict = temafunctions.getColumnOrder(self.columns,renumber,positions=True)
+        return self._withPlans([(renameDict.get(self._plans[position][0],self._plans[position][0]),self._plans[position][1]) for position in orderedPositions])
+
+    def stripColUnit(self,columns=None):
+        '''
+        Records the removal of the units from the column names, as stripColUnit does.
+
+        :param columns: List of column names. Including this will result in a subset of the columns having their units stripped. Default is None.
+        :type columns: list
+        :Returns: A TemaDataset without units in the column names.
+        :rtype: TemaDataset
+        '''
+        return self._renamed({info.name:info.name.replace(info.unitString,'') for info in temafunctions.getColumnSchema(self.columns) if (not columns or info.name in columns) and info.unitString})
+
+    def changeColUnit(self,newUnit,columns,scaleFactor=1,inPlace=True):
+        '''
+        Records a change of units, as changeColUnit does.
+
+        :param newUnit: The new unit as a string that goes in the square brakets of the column label (i.e. [us]), or a list with one unit per column.
+        :param columns: List of column names. You must include the columns.
+        :param scaleFactor: The number you multiply the current column values by to get the new, converted values, or a list with one per column.
+        :param inPlace: Determines whether the column values are updated or if you make a new column. Default value is True so the values are updated in place.
+        :type newUnit: str
+        :type columns: list
+        :type scaleFactor: float
+        :type inPlace: bool
+        :Returns: A TemaDataset with the new units.
+        :rtype: TemaDataset
+        '''
+        dataset = self
+        for info in temafunctions.getColumnSchema(self.columns):
+            col = info.name
+            if col in columns:
+                colNewUnit = newUnit[columns.index(col)] if isinstance(newUnit,list) else newUnit
+                colScaleFactor = scaleFactor[columns.index(col)] if isinstance(scaleFactor,list) else scaleFactor
+                newCol = col.replace(info.unitString,'['+colNewUnit+']') if info.unitString else col+colNewUnit
+                dataset = dataset._changedColumn(col,newCol,colScaleFactor,inPlace)
+        return dataset
+
+    def scalePxToDist(self,scaleFactor,columns=None,metersPerPixel=False,inPlace=True):
+        '''
+        Records the conversion of pixel columns to meters, as scalePxToDist does.
+
+        :param scaleFactor: The pixel to meter conversion in pixels per meter, or a list with one per column.
+        :param columns: List of column names. Including this will result in a subset of the columns being scaled. Default is None.
+        :param metersPerPixel: Determines whether scaleFactor is in meters per pixel instead. Default value is false.
+        :param inPlace: Determines whether the column values are updated or if you make a new column. Default value is True so the values are updated in place.
+        :type scaleFactor: float
+        :type columns: list
+        :type metersPerPixel: bool
+        :type inPlace: bool
+        :Returns: A TemaDataset with the pixel columns in meters.
+        :rtype: TemaDataset
+        '''
+        dataset = self
+        for info in temafunctions.getColumnSchema(self.columns):
+            col = info.name
+            if (not columns or col in columns) and 'px' in info.unitString:
+                colScaleFactor = scaleFactor[columns.index(col)] if isinstance(scaleFactor,list) else scaleFactor
+                newCol, multiplier = temafunctions.getPxConversion(info,colScaleFactor,metersPerPixel)
+                dataset = dataset._changedColumn(col,newCol,multiplier,inPlace)
+        return dataset
+
+    def _changedColumn(self,col,newCol,multiplier,inPlace):
+        #the column renamed (or copied to a new column) and rescaled, as the eager functions do it
+        plans = self._getPlans()
+        if inPlace:
+            return self._renamed({col:newCol})._scaled(newCol,multiplier)
+        return self._added([(newCol,plans[col])])._scaled(newCol,multiplier)
+
+    def _scaled(self,col,multiplier):
+        index = self.columns.index(col)
+        plans = list(self._plans)
+        plans[index] = (col,plans[index][1]._replace(scale=plans[index][1].scale*multiplier))
+        return self._withPlans(plans)
+
+    def calculateVelocities(self,columns=None,scheme='central'):
+        '''
+        Records the velocity (or rate) of many columns, named and computed as calculateVelocities does.
+
+        :param columns: List of the names of the columns that you wish to take the velocity or rate of. Default is None, which uses every position and angle column.
+        :param scheme: The finite difference scheme, one of 'central', 'nonuniform' or 'fivepoint' (see getDerivativeStencil). Default is 'central'.
+        :type columns: list
+        :type scheme: str
+        :Returns: A TemaDataset with the velocity columns added.
+        :rtype: TemaDataset
+        '''
+        if not scheme in ['central','nonuniform','fivepoint']:
+            raise ValueError('Unknown finite difference scheme: '+str(scheme))
+        if columns is None:
+            columns = [info.name for info in temafunctions.getColumnSchema(self.columns) if info.isStandard and info.component+info.expression in temafunctions.positionStrings+temafunctions.angleStrings]
+        plans = self._getPlans()
+        timePlan = self._plans[0][1]
+        newColumns = temafunctions.getRateColumnNames(self.columns,columns)
+        return self._added([(newCol,ColumnPlan('rate',plans[col],1.0,scheme,timePlan)) for newCol,col in zip(newColumns,columns)])
+
+    def calculateVelocity(self,column):
+        '''
+        Records the velocity or rate of a single column, as calculateVelocity does.
+
+        :param column: The name of the column that you wish to take the velocity or rate of.
+        :type column: str
+        :Returns: A TemaDataset with the velocity column added.
+        :rtype: TemaDataset
+        '''
+        return self.calculateVelocities([column])
+
+    def _readSources(self,keys):
+        #the source columns the plans depend on, and nothing else
+        if self.headers is None:
+            return {key:self.source[key].to_numpy(dtype='float64') for key in keys}, self.source.index
+        with open(self.source,'rb') as csvfile:
+            temafunctions.readTemaHeader(csvfile)
+            rawDataframe = temafunctions.readTemaBody(csvfile,self.headers,usecols=list(keys),dtype=self.dtype)
+        return {key:rawDataframe.iloc[:,position].to_numpy() for position,key in enumerate(sorted(keys))}, rawDataframe.index
+
+    def collect(self,columns=None):
+        '''
+        Computes the dataset. Only the source columns the requested columns depend on are read, and each column is computed once, straight into the final DataFrame.
+
+        :param columns: List of column names. Including this will result in only these columns (and time) being computed. Default is None.
+        :type columns: list
+        :Returns: newDataFrame, a pandas Data Frame of the computed columns.
+        :rtype: DataFrame
+        '''
+        dataset = self if columns is None else self.select(columns)
+        #walk the plans to find the source columns they need
+        sourceKeys = set()
+        pending = [plan for col,plan in dataset._plans]
+        while pending:
+            plan = pending.pop()
+            if plan.kind == 'source':
+                sourceKeys.add(plan.source)
+            else:
+                pending += [plan.source,plan.time]
+        sources, index = self._readSources(sourceKeys)
+
+        values = {}
+        stencils = {}
+        def evaluate(plan):
+            if not plan in values:
+                if plan.kind == 'source':
+                    values[plan] = sources[plan.source].astype('float64')*plan.scale
+                else:
+                    if not (plan.time,plan.scheme) in stencils:
+                        stencils[(plan.time,plan.scheme)] = temafunctions.getDerivativeStencil(evaluate(plan.time),plan.scheme)
+                    values[plan] = temafunctions.applyDerivativeStencil(evaluate(plan.source)[:,np.newaxis],stencils[(plan.time,plan.scheme)])[:,0]*plan.scale
+            return values[plan]
+
+        newValues = np.empty((len(dataset._plans),len(index)),dtype=self.dtype)
+        for newValue,(col,plan) in zip(newValues,dataset._plans):
+            newValue[:] = evaluate(plan)
+        newDataframe = pd.DataFrame(newValues.T,index=index,columns=dataset.columns,copy=False)
+        if self.dtype != np.float64:
+            #the time column keeps its full precision
+            newDataframe[dataset.columns[0]] = evaluate(dataset._plans[0][1])
+        temafunctions.buildSegmentIndex(newDataframe)
+        return newDataframe
+
+    def exportTemaData(self,filename,columns=None,includeNaN=False,fileFormat=None,nanRows='any',compression='infer',floatFormat=None,workers=None):
+        '''
+        Computes the dataset and exports it, as exportTemaData does. Only the exported columns are computed.
+
+        :param filename: The name you would like the exported output file to have.
+        :param columns: List of column names. Including this will result in only these columns (and time) being computed and exported. Default is None.
+        :param includeNaN: Determines whether NaN values are included in the exported file. Default is False.
+        :param fileFormat: The format of the exported file, one of 'csv', 'parquet' or 'feather'. Default is None, which picks the format from the file extension.
+        :param nanRows: Which rows are stripped when includeNaN is false, 'any' or 'all'. Default is 'any'.
+        :param compression: The compression of a csv file, None, 'gzip' or 'zstd'. Default is 'infer', which picks it from the file extension.
+        :param floatFormat: A format string for the values in a csv file. Default is None, which writes every value at full precision.
+        :param workers: The number of processes that format a csv file. Default is None, which formats it in this process.
+        :type filename: str
+        :type columns: list
+        :type includeNaN: bool
+        :type fileFormat: str
+        :type nanRows: str
+        :type compression: str
+        :type floatFormat: str
+        :type workers: int
+        :returns: None. Saves the dataset as a csv, parquet or feather file.
+        '''
+        temafunctions.exportTemaData(filename,self.collect(columns),includeNaN=includeNaN,fileFormat=fileFormat,nanRows=nanRows,compression=compression,floatFormat=floatFormat,workers=workers)
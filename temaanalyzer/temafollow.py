@@ -0,0 +1,183 @@
+import asyncio
+import io
+import os
+import time
+import numpy as np
+import pandas as pd
+from temaanalyzer import temafunctions
+
+
+class TemaFollower:
+    '''
+    Follows a TEMA file while it is being written, i.e. to plot a long test live. The header is parsed once, and after that every poll only parses the rows appended since the last one, starting from the byte offset where the last poll stopped. A row is only parsed once its line is complete, so a row that is still being written is left for the next poll.
+
+    If velocities are calculated, they are calculated incrementally with calculateVelocities: each poll only differentiates the new rows along with the few rows either side that the stencil reaches (one for the central difference). The last of those rows is held back until the row after it arrives, so every row is yielded once, with the same velocities calculateVelocities gives for the whole file, i.e.
+
+        for rows in TemaFollower('run.txt',velocities=True).follow(timeout=60):
+            plot(rows)
+
+    :param filename: The name of the TEMA .txt file to follow.
+    :param clean: Determines whether the rows are cleaned, as by cleanImportTemaData. If false, the columns are the raw TEMA columns, as by importTemaData. Default is True.
+    :param velocities: Determines whether velocity (or rate) columns are added with calculateVelocities. Default is False.
+    :param columns: The columns to take the velocity of. Default is None, which uses every position and angle column (see calculateVelocities).
+    :param scheme: The finite difference scheme of the velocities (see getDerivativeStencil). Default is 'central'.
+    :param dtype: The float type the data is stored as, 'float64' or 'float32'. The time column is always float64. Default is 'float64'.
+    :type filename: str
+    :type clean: bool
+    :type velocities: bool
+    :type columns: list
+    :type scheme: str
+    :type dtype: str
+    '''
+    def __init__(self,filename,clean=True,velocities=False,columns=None,scheme='central',dtype='float64'):
+        self.filename = filename
+        self.clean = clean
+        self.velocities = velocities
+        self.velocityColumns = columns
+        self.scheme = scheme
+        self.dtype = dtype
+        self.headers = None
+        self.offset = 0
+        self.rows = 0
+        #how many rows the stencil reaches on either side of a sample
+        self._width = temafunctions.getDerivativeStencil(np.arange(8.0),scheme).width
+        #the rows already yielded that the next rows' velocities need, followed by the rows held back
+        self._previous = None
+        self._held = None
+
+    def _readHeader(self,temaFile):
+        #the header is only parsed once all three of its rows are complete
+        header = temaFile.read()
+        if header.count(b'\n') < 3:
+            return False
+        headerFile = io.BytesIO(header)
+        self.headers = temafunctions.readTemaHeader(headerFile)
+        self.offset = headerFile.tell()
+        if self.clean:
+            self._plan = temafunctions.getCleanImportPlan(self.headers)
+        return True
+
+    def _parseRows(self,data):
+        dataframe = temafunctions.readTemaBody(io.BytesIO(data),self.headers,dtype=self.dtype)
+        if self.clean:
+            dataframe = temafunctions.applyCleanImportPlan(dataframe,self._plan)
+        else:
+            dataframe = dataframe.drop(columns=' ',errors='ignore')
+        dataframe.index = pd.RangeIndex(self.rows,self.rows+len(dataframe))
+        self.rows += len(dataframe)
+        return dataframe
+
+    def _addVelocities(self,dataframe,final=False):
+        #differentiate the new rows together with the rows either side of them the stencil needs
+        window = pd.concat([frame for frame in [self._previous,self._held,dataframe] if frame is not None])
+        window = temafunctions.calculateVelocities(window,self.velocityColumns,self.scheme)
+        start = 0 if self._previous is None else len(self._previous)
+        stop = len(window) if final else max(len(window)-self._width,start)
+        self._previous = window.iloc[max(stop-self._width,0):stop,:len(dataframe.columns)]
+        self._held = window.iloc[stop:,:len(dataframe.columns)]
+        return window.iloc[start:stop]
+
+    def _readRows(self,final=False):
+        with open(self.filename,'rb') as temaFile:
+            if self.headers is None and not self._readHeader(temaFile):
+                return None
+            temaFile.seek(self.offset)
+            data = temaFile.read()
+        #only parse up to the end of the last complete row, unless the file is finished
+        if not final:
+            data = data[:data.rfind(b'\n')+1]
+        self.offset += len(data)
+        return self._parseRows(data) if data.strip() else None
+
+    def poll(self):
+        '''
+        Parses the rows appended to the file since the last poll.
+
+        :Returns: newDataFrame, a pandas DataFrame of the new rows, whose index continues from the rows before them. None if there are no new rows, or the header has not been written yet.
+        :rtype: DataFrame
+        '''
+        dataframe = self._readRows()
+        if dataframe is None or not self.velocities:
+            return dataframe
+        return self._addVelocities(dataframe)
+
+    def flush(self):
+        '''
+        Parses the rest of the file once no more rows will be written, including a last row without a line ending, and returns it along with the rows held back for their velocities. Their velocities are calculated as at the end of the file.
+
+        :Returns: newDataFrame, a pandas DataFrame of the remaining rows, or None if there are none.
+        :rtype: DataFrame
+        '''
+        dataframe = self._readRows(final=True)
+        if not self.velocities:
+            return dataframe
+        if dataframe is None:
+            if self._held is None or not len(self._held):
+                return None
+            dataframe = self._held.iloc[:0]
+        return self._addVelocities(dataframe,final=True)
+
+    def _hasGrown(self):
+        try:
+            return os.path.getsize(self.filename) > self.offset
+        except FileNotFoundError:
+            return False
+
+    def follow(self,interval=1.0,timeout=None):
+        '''
+        Yields the new rows of the file as it is written, polling it every interval seconds. Polls that find no new rows yield nothing.
+
+        :param interval: The time between polls, in seconds. Default is 1.0.
+        :param timeout: If given, following stops (and any rows held back are yielded) once the file has not grown for this many seconds. Default is None, which follows the file forever.
+        :type interval: float
+        :type timeout: float
+        :Returns: An iterator of pandas DataFrames of the new rows.
+        :rtype: iterator
+        '''
+        lastGrowth = time.monotonic()
+        while True:
+            if self._hasGrown() or self.headers is None:
+                rows = self.poll()
+                if rows is not None and len(rows):
+                    lastGrowth = time.monotonic()
+                    yield rows
+            if timeout is not None and time.monotonic()-lastGrowth >= timeout:
+                break
+            time.sleep(interval)
+        rows = self.flush()
+        if rows is not None and len(rows):
+            yield rows
+
+    async def followAsync(self,interval=1.0,timeout=None):
+        '''
+        The asyncio version of follow, i.e. to update a live plot from an event loop:
+
+            async for rows in TemaFollower('run.txt').followAsync(interval=0.5):
+                plot(rows)
+
+        :param interval: The time between polls, in seconds. Default is 1.0.
+        :param timeout: If given, following stops (and any rows held back are yielded) once the file has not grown for this many seconds. Default is None, which follows the file forever.
+        :type interval: float
+        :type timeout: float
+        :Returns: An asynchronous iterator of pandas DataFrames of the new rows.
+        :rtype: async iterator
+        '''
+        lastGrowth = time.monotonic()
+        while True:
+            if self._hasGrown() or self.headers is None:
+                rows = self.poll()
+                if rows is not None and len(rows):
+                    lastGrowth = time.monotonic()
+                    yield rows
+            if timeout is not None and time.monotonic()-lastGrowth >= timeout:
+                break
+            await asyncio.sleep(interval)
+        rows = self.flush()
+        if rows is not None and len(rows):
+            yield rows
+
+    def __iter__(self):
+        return self.follow()
+
+    def __aiter__(self):
+        return self.followAsync()
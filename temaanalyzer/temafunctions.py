@@ -1,84 +1,296 @@
-import csv
+import glob
+import gzip
+import hashlib
+import itertools
+import os
+import numpy as np
 import pandas as pd
-import re
 import math
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from collections import namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache, partial, wraps
+#the unit and column name handling lives in modules that do not need pandas, and is re-exported here
+from temaanalyzer.temaunits import unitRegistry, unitTermPattern, unitCaches, getConversion, registerUnit, getUnitConversion
+from temaanalyzer.temaschema import positionStrings, angleStrings, distanceStrings, velocityStrings, angularVelocityStrings, interPointVelocityStrings, accelerationStrings, angularAccelerationStrings, jerkStrings, angularJerkStrings, measurementDict, measurementRanks, variantRanks, derivativeDict, componentPatterns, expressionPatterns, unitPattern, colNumPattern, ratePattern, standardNamePattern, pointExpressions, TemaColumn, TemaFileInfo, parseColumnName, getColumnSchema, getColumnUnitConversion, readTemaHeader, scanTemaFile, selectTemaColumns
 
 
-#the order of keys in these dictionaries determines the order in which columns appear
-positionStrings = ['xPosition','yPosition','absPosition']
-angleStrings = ['Angle']
-velocityStrings = ['xVelocity','yVelocity','absVelocity']
-angularVelocityStrings = ['AngularVelocity']
-measurementDict = {'Position':positionStrings, 'Angle':angleStrings, 'Velocity':velocityStrings, 'AngularVelocity':angularVelocityStrings}
+#the measurements of a single run of a pipeline stage
+StageRecord = namedtuple('StageRecord', ['stage','depth','seconds','rows','columns','bytesRead','peakMemory'])
+#the profiling sessions that are active in the current thread or task
+_profilingSessions = ContextVar('temaProfilingSessions',default=())
+_ProfilingSession = namedtuple('_ProfilingSession', ['record','memory','stack'])
 
-def getConversion(unit):
+@contextmanager
+def profileStages(callback=None,memory=False):
     '''
-    Returns the cleaned, more intuitively labeled TEMA data file as a Pandas dataframe. This file has standardized units.
+    Records a StageRecord for every temafunctions stage run inside the with block, i.e.
 
-    :param unit: The unit prefix for a particular column extracted from the input file.
-    :type unit: str
+        with profileStages() as records:
+            dataframe = cleanImportTemaData(filename)
 
-    :return: A tuple containing a scalar multiplier that will convert the data in the DataFrame from the original unit to the standard unit and the string abbreviation of the standard unit we are converting to.
-    :rtype: (float,unit)
+    Each record holds the name of the stage, how deeply it is nested in other stages (cleanImportTemaData reads the body and applies the import plan as nested stages, for example), its wall time in seconds, the rows and columns it produced, the bytes it read (from the file for the readers, or the size of the input DataFrame otherwise) and its peak memory. Stages run in other processes, such as the workers of cleanImportTemaDirectory, are not recorded.
+
+    :param callback: A function called with each StageRecord as soon as its stage finishes, for feeding metrics or logs. Default is None.
+    :param memory: Determines whether the peak memory of each stage is measured with tracemalloc. This slows the stages down, so it is off by default and peakMemory is None.
+    :type callback: function
+    :type memory: bool
+    :Returns: A list that the StageRecords are appended to, in the order the stages finish.
+    :rtype: list
+    '''
+    records = []
+    def record(stageRecord):
+        records.append(stageRecord)
+        if callback:
+            callback(stageRecord)
+    startTracing = memory and not tracemalloc.is_tracing()
+    if startTracing:
+        tracemalloc.start()
+    token = _profilingSessions.set(_profilingSessions.get()+(_ProfilingSession(record,memory,[]),))
+    try:
+        yield records
+    finally:
+        _profilingSessions.reset(token)
+        if startTracing:
+            tracemalloc.stop()
+
+def _getStageInput(args):
+    #the bytes a stage reads, and the shape of its input in case it does not return a DataFrame
+    for arg in args:
+        if isinstance(arg,pd.DataFrame):
+            return int(arg.memory_usage(index=False).sum()), arg.shape
+        if isinstance(arg,(str,os.PathLike)) and os.path.isfile(arg):
+            return os.path.getsize(arg), None
+    return None, None
+
+def _profiledStage(function):
+    #records the stage in every active profiling session, and costs a single lookup when there are none
+    @wraps(function)
+    def wrapper(*args,**kwargs):
+        sessions = _profilingSessions.get()
+        if not sessions:
+            return function(*args,**kwargs)
+        handle = args[0] if args and hasattr(args[0],'tell') else None
+        bytesRead, shape = _getStageInput(args) if handle is None else (None, None)
+        startPosition = handle.tell() if handle is not None else None
+        memory = any(session.memory for session in sessions) and tracemalloc.is_tracing()
+        startMemory, peakMemory = tracemalloc.get_traced_memory() if memory else (0, 0)
+        #each session keeps a stack of the peak memory of the stages it is inside - reset_peak is global, so the peak so far is handed to the enclosing stage before resetting
+        for session in sessions:
+            if session.stack:
+                session.stack[-1] = max(session.stack[-1],peakMemory)
+            session.stack.append(startMemory)
+        if memory:
+            tracemalloc.reset_peak()
+        startTime = time.perf_counter()
+        try:
+            result = function(*args,**kwargs)
+        finally:
+            seconds = time.perf_counter()-startTime
+            peakMemory = tracemalloc.get_traced_memory()[1] if memory else 0
+            for session in sessions:
+                peakMemory = max(session.stack.pop(),peakMemory)
+                if session.stack:
+                    session.stack[-1] = max(session.stack[-1],peakMemory)
+        if handle is not None:
+            bytesRead = handle.tell()-startPosition
+        if isinstance(result,pd.DataFrame):
+            shape = result.shape
+        rows, columns = shape if shape else (None, None)
+        for session in sessions:
+            session.record(StageRecord(function.__name__,len(session.stack),seconds,rows,columns,bytesRead,peakMemory-startMemory if session.memory and memory else None))
+        return result
+    return wrapper
+
+@_profiledStage
+def readTemaBody(csvfile,headers,engine='c',chunksize=None,usecols=None,dtype='float64'):
     '''
-    if(unit=='s'): return ('s',1)
-    elif(unit=='ms'): return ('s',.001)
-    elif(unit=='us'): return ('s',.000001)
-    elif(unit=='m'): return ('m',1)
-    elif(unit=='mm'): return ('m',.001)
-    elif(unit=='cm'): return ('m',.01)
-    elif(unit=='rad'): return ('rad',1)
-    elif(unit==chr(176)): return ('rad',math.pi/180)
-    elif(unit=='degrees'): return ('rad',math.pi/180)
-    elif(unit=='pixels'): return ('px',1)
-    elif(unit=='px'): return ('px',1)
-    else: return (unit,1)
+    Parses the data rows of a TEMA file from an open binary file handle positioned after the header, turning the X markers for lost tracks into NaNs.
 
-def importTemaData(filename):
+    :param csvfile: A TEMA .txt file opened in binary mode, as left by readTemaHeader.
+    :param headers: The column names returned by readTemaHeader.
+    :param engine: The pandas.read_csv parser engine, either 'c' or 'pyarrow'. Default is 'c'.
+    :param chunksize: If given, the number of rows to parse at a time. Default is None, which parses the whole file at once.
+    :param usecols: If given, the positions in headers of the only columns to parse. The rest are skipped by the parser. Default is None, which parses every column.
+    :param dtype: The float type the data is stored as, 'float64' or 'float32'. The time column is always float64, since time steps need its precision. Default is 'float64'.
+    :type csvfile: file
+    :type headers: list
+    :type engine: str
+    :type chunksize: int
+    :type usecols: list
+    :type dtype: str
+    :Returns: newDataFrame, a pandas Data Frame with one column per header entry (or per position in usecols, in file order), including the empty trailing column. If chunksize is given, an iterator of such DataFrames instead.
+    :rtype: DataFrame
     '''
-    Returns raw TEMA input data as a Pandas dataframe.
+    names = headers
+    missingColumns = []
+    if engine == 'pyarrow' and usecols is None:
+        #unlike the c parser, the pyarrow parser cannot pad rows that leave off the empty trailing column, so only the fields the rows have are parsed and the rest are added after
+        start = csvfile.tell()
+        fields = csvfile.readline().rstrip(b'\r\n').count(b'\t')+1
+        csvfile.seek(start)
+        usecols = list(range(min(fields,len(headers))))
+        missingColumns = headers[len(usecols):]
+    if usecols is not None:
+        usecols = sorted(usecols)
+        names = [headers[position] for position in usecols]
+    if np.dtype(dtype) != np.float64:
+        dtype = {name:('float64' if name == headers[0] else dtype) for name in names}
+    newDataframe = pd.read_csv(csvfile,sep='\t',header=None,names=names,usecols=usecols,engine=engine,chunksize=chunksize,encoding_errors='ignore',dtype=dtype,na_values=['X'])
+    for name in missingColumns:
+        newDataframe[name] = np.nan
+    return newDataframe
 
-    :param filename: The unit prefix for a particular column extracted from the input file.
+@_profiledStage
+def importTemaData(filename,engine='c',dtype='float64',columns=None,points=None):
+    '''
+    Returns raw TEMA input data as a Pandas dataframe. The file is opened once: the header rows are parsed from the open handle and the same handle is passed on to the numeric parser.
+
+    :param filename: The name of the TEMA .txt file you wish to import. Note that the imported file should be a tab delineated text file.
+    :param engine: The pandas.read_csv parser engine used for the body of the file, either 'c' or 'pyarrow'. Default is 'c'.
+    :param dtype: The float type the data is stored as, 'float64' or 'float32'. float32 halves the memory used, and still holds the 6 or so significant figures TEMA exports. The time column is always float64. Default is 'float64'.
+    :param columns: If given, only these columns (and time) are parsed, the rest are skipped by the parser (see selectTemaColumns). Default is None.
+    :param points: If given, only the columns of these tracked point numbers (and time, and any columns) are parsed. Default is None.
     :type filename: str
+    :type engine: str
+    :type dtype: str
+    :type columns: list
+    :type points: list
     :Returns: newDataFrame, a pandas Data Frame that contains the uncleaned content of the input.
     :rtype: DataFrame
     '''
-    #construct the header
-    with open(filename, newline='', encoding='latin-1', errors='ignore') as csvfile:
-            rows = csv.reader(csvfile, delimiter='\t')
-            #grab the first three rows
-            firstRow = next(rows)
-            secondRow = next(rows)
-            thirdRow = next(rows)
-            #and stitch them together in a single string
-            headers = [firstRow[0] + ' ' + thirdRow[0]] + list(map(lambda x,y: x + ' ' + y,firstRow[1:],secondRow[1:]))
-    #now read the whole csv, starting from row 3, adding NaNs and using the header constructed above. Drop the empty last column. Return.
-    return pd.read_csv(filename,sep='\t',header=0,names=headers,skiprows=range(2),encoding_errors='ignore',dtype='float64',na_values=['X']).drop(columns=' ',errors='ignore')
-        
-    newDataframe = dataframe.copy()
-def exportTemaData(filename,dataframe,columns=None,includeNaN=False):
+    with open(filename, 'rb') as csvfile:
+        #construct the header
+        headers = readTemaHeader(csvfile)
+        usecols = selectTemaColumns(headers,columns,points) if columns is not None or points is not None else None
+        #now read the rest of the open file using the header constructed above. Drop the empty last column. Return.
+        return readTemaBody(csvfile,headers,engine,usecols=usecols,dtype=dtype).drop(columns=' ',errors='ignore')
+
+def importTemaDataChunks(filename,chunksize=100000,dtype='float64'):
+    '''
+    Yields raw TEMA input data as a series of Pandas dataframes of at most chunksize rows, so files larger than memory can be processed a piece at a time. The row index continues from one chunk to the next.
+
+    :param filename: The name of the TEMA .txt file you wish to import. Note that the imported file should be a tab delineated text file.
+    :param chunksize: The maximum number of rows in each chunk. Default is 100000.
+    :param dtype: The float type the data is stored as, 'float64' or 'float32'. The time column is always float64. Default is 'float64'.
+    :type filename: str
+    :type chunksize: int
+    :type dtype: str
+    :Returns: An iterator of pandas Data Frames that contain the uncleaned content of the input.
+    :rtype: iterator
+    '''
+    with open(filename, 'rb') as csvfile:
+        headers = readTemaHeader(csvfile)
+        with readTemaBody(csvfile,headers,chunksize=chunksize,dtype=dtype) as chunks:
+            for chunk in chunks:
+                yield chunk.drop(columns=' ',errors='ignore')
+
+#the compression of each compressed csv file extension
+compressionExtensions = {'.gz':'gzip', '.zst':'zstd'}
+
+def _openCsvFile(filename,compression):
+    #a text handle for csv output, compressed or not
+    if compression == 'infer':
+        compression = compressionExtensions.get(os.path.splitext(str(filename))[1].lower())
+    if compression is None:
+        return open(filename,'w',newline='')
+    elif compression == 'gzip':
+        return gzip.open(filename,'wt',newline='')
+    elif compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError('zstd compression requires the zstandard package')
+        return zstandard.open(filename,'wt',newline='')
+    raise ValueError('Unknown compression: '+str(compression))
+
+def _formatCsvChunk(chunk,floatFormat):
+    #a block of csv rows, formatted in a worker process
+    return chunk.to_csv(index=False,header=False,float_format=floatFormat)
+
+@_profiledStage
+def exportTemaData(filename,dataframe,columns=None,includeNaN=False,fileFormat=None,nanRows=None,compression='infer',floatFormat=None,workers=None):
     '''
     Returns a csv of the TEMA data where the columns have been relabeled and reorderd, and the data has been scaled to standard units.
 
+    The data can also be an iterator of DataFrames, such as the one returned by cleanImportTemaDataChunks, in which case the chunks are written out one after another without ever holding the whole file in memory. Since a column can only be known to be entirely NaN once the whole file has been read, NaN-only columns are not stripped from streamed data, and by default only rows where every column but time is NaN are stripped from it (a column that never has data, such as an untracked angular speed, would otherwise strip every row). Use columns to leave such columns out.
+
     :param filename: The name you would like the exported output file to have.  
-    :param dataframe: Pandas DataFrame that contains the cleaned and reorderd data.  
+    :param dataframe: Pandas DataFrame that contains the cleaned and reorderd data, or an iterator of such DataFrames.  
     :param columns: List of column names. Including this will result in a subset of the columns being included in the csv file. Default is None.  
     :param includeNAN: Boolean value that determines whether NAN values are included in the exported file. If true, NAN values are included in the exported csv. If false, the corresponding csv rows and columns will be stripped from the export. Default setting is false.
+    :param fileFormat: The format of the exported file, one of 'csv', 'parquet' or 'feather'. 'parquet' and 'feather' require pyarrow and a single DataFrame. Default is None, which picks the format from the file extension and falls back to csv.
+    :param nanRows: Which rows are stripped when includeNaN is false. 'any' strips every row with a NaN in it; 'all' only strips rows where every column but time is NaN, so a dropout in one point does not remove the other points' data. Default is None, which is 'any' for a DataFrame and 'all' for an iterator of DataFrames.
+    :param compression: The compression of a csv file, None, 'gzip' or 'zstd' (which requires zstandard). Default is 'infer', which compresses files ending in .gz or .zst.
+    :param floatFormat: A format string for the values in a csv file, i.e. '%.6g' to keep six significant figures. Fewer digits make much smaller files. Default is None, which writes every value at full precision.
+    :param workers: The number of processes that format a csv file, in blocks of rows that are written out in order. Only worth it for files of millions of rows on machines with several cores. Default is None, which formats the file in this process.
     :type filename: str
     :type dataframe: DataFrame
     :type columns: list
     :type includeNAN: bool
-    :returns: None. Saves the cleaned TEMA data as a csv file.
+    :type fileFormat: str
+    :type nanRows: str
+    :type compression: str
+    :type floatFormat: str
+    :type workers: int
+    :returns: None. Saves the cleaned TEMA data as a csv, parquet or feather file.
     '''
-    newDataframe = dataframe.copy()
+    if fileFormat is None:
+        fileFormat = {'.parquet':'parquet', '.feather':'feather'}.get(os.path.splitext(str(filename))[1].lower(),'csv')
+    if not fileFormat in ['csv','parquet','feather']:
+        raise ValueError('Unknown file format: '+str(fileFormat))
+    if not nanRows in [None,'any','all']:
+        raise ValueError('Unknown nanRows option: '+str(nanRows))
+    if nanRows is None:
+        nanRows = 'any' if isinstance(dataframe,pd.DataFrame) else 'all'
+    if not isinstance(dataframe,pd.DataFrame):
+        if fileFormat != 'csv':
+            raise ValueError('Only csv files can be exported from an iterator of DataFrames')
+        #streaming export - write the header with the first chunk, then append
+        with _openCsvFile(filename,compression) as csvfile:
+            header = True
+            for chunk in dataframe:
+                if columns:
+                    chunk = chunk[columns]
+                if not includeNaN:
+                    chunk = chunk.dropna(axis='index', how=nanRows, subset=chunk.columns[1:] if nanRows == 'all' else None)
+                chunk.to_csv(path_or_buf=csvfile, index=False, header=header, float_format=floatFormat)
+                header = False
+        return
+    #nothing below modifies the frame, so it is not copied
+    newDataframe = dataframe
     if columns:
         newDataframe = newDataframe[columns]
     #If we don't include NaNs, first strip all NaN-only cols, then strip all rows containing NaNs
-    if not includeNaN:
+    if not includeNaN and nanRows == 'all':
+        #one NaN mask of the data columns gives both the rows and the columns with data, selected by position so columns that share a name stay apart
+        valid = newDataframe.iloc[:,1:].notna().to_numpy()
+        newDataframe = newDataframe.iloc[valid.any(axis=1),np.concatenate(([True],valid.any(axis=0)))]
+    elif not includeNaN:
         newDataframe = newDataframe.dropna(axis='columns', how='all')
         newDataframe = newDataframe.dropna(axis='index', how='any')
-    newDataframe.to_csv(path_or_buf=filename, index=False)
+    if fileFormat == 'parquet':
+        newDataframe.to_parquet(filename, index=False)
+    elif fileFormat == 'feather':
+        newDataframe.reset_index(drop=True).to_feather(filename)
+    elif workers and workers > 1 and len(newDataframe) > workers:
+        #format blocks of rows in parallel and write them out in order
+        rowBlocks = np.array_split(np.arange(len(newDataframe)),4*workers)
+        with _openCsvFile(filename,compression) as csvfile:
+            csvfile.write(newDataframe.iloc[:0].to_csv(index=False))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for block in executor.map(_formatCsvChunk,(newDataframe.iloc[rows[0]:rows[-1]+1] for rows in rowBlocks if len(rows)),[floatFormat]*len(rowBlocks)):
+                    csvfile.write(block)
+    elif compression in ['infer',None,'gzip']:
+        newDataframe.to_csv(path_or_buf=filename, index=False, compression=compression, float_format=floatFormat)
+    else:
+        with _openCsvFile(filename,compression) as csvfile:
+            newDataframe.to_csv(path_or_buf=csvfile, index=False, float_format=floatFormat)
 
+@_profiledStage
 def standardizeUnits(dataframe):
     '''
     Takes datafram with unknown, and variable units and converts data to standard units of m, s, radians.
@@ -87,40 +299,19 @@ def standardizeUnits(dataframe):
     :type dataframe: DataFrame
     :Returns: newDataFrame, a pandas DataFrame where the data has been converted to units of s, radians, and m, and the unit names are converted to SI base units.
     '''
-    newDataframe = dataframe.copy()
-    for col in newDataframe.columns.tolist():
-        #extract the unit strings
-        unitString = re.findall('\[.+\]', col)
-        if(unitString):
-            unitString = unitString[-1]
-            unit = unitString.strip('[]')
-            if '/' in unit:
-                #if the unit is a rate, make a list of both units in the rate
-                unit1 = re.findall('.*/', unit)[-1].strip('/')
-                unit2 = re.findall('/.*', unit)[-1].strip('/')
-                unit = [unit1,unit2]
-            else:
-                #otherwise the unit on its own
-                unit = [unit]
-            newCol = col
-            unitConversion = 1
-            for unitItem in unit:
-                #for each unititem in the unit list
-                unitConversionTuple = getConversion(unitItem)
-                
-                #replace the unititem name with the standardized equivalent
-                newUnitString = unitString.replace(unitItem,unitConversionTuple[0])
-                newCol = newCol.replace(unitString,newUnitString)
-                
-                #If the unititem is the first item in the unit list, assume multiplication
-                if (unit[0] == unitItem): unitConversion *= unitConversionTuple[1]
-                #If it's the second item, assume division
-                else: unitConversion /= unitConversionTuple[1]
-                
-            newDataframe[col] = newDataframe[col].multiply(unitConversion)
-            newDataframe = newDataframe.rename(columns = {col:newCol})
+    #work out every new name and scale factor first, then rescale and rename the whole frame once
+    conversions = [getColumnUnitConversion(col) for col in dataframe.columns]
+    unitConversions = [unitConversion for newCol,unitConversion in conversions]
+    newColumns = [newCol for newCol,unitConversion in conversions]
+    if all(dtype == np.float64 for dtype in dataframe.dtypes):
+        #TEMA data is all floats, so the whole frame is scaled with a single broadcast multiply
+        return pd.DataFrame(dataframe.to_numpy()*np.array(unitConversions),index=dataframe.index,columns=newColumns,copy=False)
+    #otherwise scale column by column, so each column keeps its type (such as float32)
+    newDataframe = pd.concat([dataframe.iloc[:,position]*unitConversion for position,unitConversion in enumerate(unitConversions)],axis='columns')
+    newDataframe.columns = newColumns
     return newDataframe
         
+@_profiledStage
 def stripColUnit(dataframe,columns=None):
     '''
     Returns a Pandas DataFrame of the TEMA data where the units of the columns have been removed. This function needs to be run on the data before it can be plotted using Altair.
@@ -133,16 +324,16 @@ def stripColUnit(dataframe,columns=None):
     :rtype: DataFrame
     '''
     newDataframe = dataframe.copy()
-    for col in newDataframe.columns.tolist():
+    for info in getColumnSchema(newDataframe.columns):
+        col = info.name
         if(not columns or col in columns):
             #get the original unit string
-            unitString = re.findall('\[.+\]', col)
-            if(unitString):
-                unitString = unitString[-1]
-                newCol = col.replace(unitString,'')
+            if(info.unitString):
+                newCol = col.replace(info.unitString,'')
                 newDataframe = newDataframe.rename(columns = {col:newCol})
     return newDataframe
         
+@_profiledStage
 def changeColUnit(dataframe,newUnit,columns,scaleFactor=1,inPlace=True):
     '''
     Changes the units of a Pandas DataFrame to be anything other than the standard s, m, radians. Returns a Pandas DataFrame of the TEMA data where the units of the columns have been changed to a user specified input and the data has been scaled accordingly.
@@ -161,7 +352,8 @@ def changeColUnit(dataframe,newUnit,columns,scaleFactor=1,inPlace=True):
     :rtype: DataFrame
     '''
     newDataframe = dataframe.copy()
-    for col in newDataframe.columns.tolist():
+    for info in getColumnSchema(newDataframe.columns):
+        col = info.name
         if(col in columns):
             #if newUnit is a list, match it to the column
             if isinstance(newUnit,list):
@@ -171,10 +363,8 @@ def changeColUnit(dataframe,newUnit,columns,scaleFactor=1,inPlace=True):
                 colNewUnit = newUnit
             
             #get the original unit string
-            unitString = re.findall('\[.+\]', col)
-            if(unitString):
-                unitString = unitString[-1]
-                newCol = col.replace(unitString,'['+colNewUnit+']')
+            if(info.unitString):
+                newCol = col.replace(info.unitString,'['+colNewUnit+']')
             else:
                 newCol = col + colNewUnit
                 
@@ -195,6 +385,7 @@ def changeColUnit(dataframe,newUnit,columns,scaleFactor=1,inPlace=True):
             newDataframe[newCol] = newDataframe[newCol].multiply(colScaleFactor)
     return newDataframe
         
+@_profiledStage
 def scalePxToDist(dataframe,scaleFactor,columns=None,metersPerPixel=False,inPlace=True):
     '''
     Returns a Pandas DataFrame of the TEMA data where the data has been scaled based on a pixels to meters conversion.
@@ -212,45 +403,552 @@ def scalePxToDist(dataframe,scaleFactor,columns=None,metersPerPixel=False,inPlac
     :Returns: newDataFrame, a Pandas DataFrame containing the original data scaled by the user-inputted pixel to meter conversion.
     :rtype: DataFrame
     '''
-    #default scaleFactor is in pixels per meter
-    newDataframe = dataframe.copy()
-    for col in newDataframe.columns.tolist():
-        if(not columns or col in columns):
-            unitString = re.findall('\[.*px.*\]', col)
-            #verify that the column is in some factor of pixels
-            if (unitString):
-                unitString = unitString[-1]
-                
-                newUnitString = unitString.replace('px','m')
-                newCol = col.replace(unitString,newUnitString)
-                
-                #rename if in-place replacement, else create a new column
-                if inPlace:
-                    newDataframe = newDataframe.rename(columns = {col:newCol})
-                else:
-                    newDataframe[newCol] = newDataframe[col]
-                
-                #if scalefactor is a list, match the scalefactor to the column
-                if isinstance(scaleFactor,list):
-                    colScaleFactor = scaleFactor[columns.index(col)]
-                else:
-                    colScaleFactor = scaleFactor
-                
-                #if our unit is flipped, divide by 1
-                if metersPerPixel:
-                    colScaleFactor = 1/colScaleFactor
-                
-                #if px is a numerator unit, divide by the scale factor
-                if (re.findall('.*px.*/', unitString) or not '/' in unitString):
-                    newDataframe[newCol] = newDataframe[newCol].multiply(1/colScaleFactor)
-                #otherwise multiply by the scale factor
-                else:
-                    newDataframe[newCol] = newDataframe[newCol].multiply(colScaleFactor)
+    #default scaleFactor is in pixels per meter - work out every pixel column's new name and multiplier from the schema in one pass
+    positions = []
+    newColumns = []
+    multipliers = []
+    for position,info in enumerate(getColumnSchema(dataframe.columns)):
+        #verify that the column is in some factor of pixels
+        if (not columns or info.name in columns) and 'px' in info.unitString:
+            #if scalefactor is a list, match the scalefactor to the column
+            colScaleFactor = scaleFactor[columns.index(info.name)] if isinstance(scaleFactor,list) else scaleFactor
+            newCol, multiplier = getPxConversion(info,colScaleFactor,metersPerPixel)
+            positions.append(position)
+            newColumns.append(newCol)
+            multipliers.append(multiplier)
+    if not positions:
+        return dataframe.copy()
+    #then scale all of them with a single multiply
+    scaled = dataframe.iloc[:,positions].to_numpy(dtype='float64')*np.array(multipliers,dtype='float64')
+    #each column keeps the type of its source column, so float32 columns stay float32
+    storageTypes = np.array([getStorageType(dataframe.iloc[:,[position]],[dataframe.columns[position]]) for position in positions])
+
+    #rename if in-place replacement, else create new columns
+    if inPlace:
+        newDataframe = dataframe.copy()
+        for storageType in set(storageTypes):
+            group = np.flatnonzero(storageTypes == storageType)
+            newDataframe.iloc[:,np.array(positions)[group]] = scaled[:,group].astype(storageType,copy=False)
+        renamed = list(dataframe.columns)
+        for position,newCol in zip(positions,newColumns):
+            renamed[position] = newCol
+        newDataframe = newDataframe.set_axis(renamed,axis='columns')
+    else:
+        scaled = pd.DataFrame(scaled,index=dataframe.index,columns=newColumns).astype(dict(zip(newColumns,storageTypes)))
+        replaced = scaled.columns.isin(dataframe.columns)
+        newDataframe = pd.concat([dataframe,scaled.loc[:,~replaced]],axis='columns')
+        for column in scaled.columns[replaced]:
+            newDataframe[column] = scaled[column]
+    newDataframe.attrs = dataframe.attrs
     return newDataframe
+
+def getPxConversion(info,scaleFactor,metersPerPixel=False):
+    '''
+    Returns the name a pixel column gets once scalePxToDist converts it to meters, and the number its data is multiplied by.
+
+    :param info: The parsed column name, as returned by parseColumnName.
+    :param scaleFactor: The pixel to meter conversion of the column, in pixels per meter.
+    :param metersPerPixel: Determines whether scaleFactor is in meters per pixel instead. Default is False.
+    :type info: TemaColumn
+    :type scaleFactor: float
+    :type metersPerPixel: bool
+    :Returns: A tuple of the new column name and the scalar multiplier for the column data.
+    :rtype: (str,float)
+    '''
+    newCol = info.name.replace(info.unitString,info.unitString.replace('px','m'))
+    #if our unit is flipped, divide by 1
+    if metersPerPixel:
+        scaleFactor = 1/scaleFactor
+    #if px is a numerator unit, divide by the scale factor, otherwise multiply by it
+    if ('px' in info.numeratorUnit or not info.denominatorUnit):
+        return (newCol,1/scaleFactor)
+    return (newCol,scaleFactor)
         
+def _getMaxIndexNumbers(columns):
+    #the highest existing number of each measurement type
+    maxIndexNumbers = {}
+    for info in getColumnSchema(columns):
+        if info.isStandard and info.index and info.component+info.expression in measurementDict.get(info.expression,[]):
+            maxIndexNumbers[info.expression] = max(maxIndexNumbers.get(info.expression,0),int(info.index))
+    return maxIndexNumbers
+
+def getValidSegments(valid):
+    '''
+    Returns the contiguous runs of valid samples in a column, i.e. the stretches between tracker dropouts.
+
+    :param valid: A boolean array that is True wherever the column has data.
+    :type valid: array
+    :Returns: A tuple of (start, stop) tuples, one per run, with stop exclusive.
+    :rtype: tuple
+    '''
+    edges = np.diff(np.concatenate(([0],np.asarray(valid,dtype='int8'),[0])))
+    return tuple(zip(np.flatnonzero(edges == 1).tolist(),np.flatnonzero(edges == -1).tolist()))
+
+def _getValidMask(dataframe,columns):
+    #a (columns, rows) boolean array that is True wherever each column has data
+    return dataframe[columns].notna().to_numpy().T
+
+def _getMaskFingerprints(valid,columns):
+    #a digest of each column's NaN mask, so a stored segment index can be checked against the data it is used on
+    packed = np.packbits(valid,axis=1)
+    return {column:hashlib.blake2b(columnBits.tobytes(),digest_size=16).hexdigest() for column,columnBits in zip(columns,packed)}
+
+def _scanSegments(valid,columns):
+    #the valid segments of many columns from one scan of their NaN mask
+    edges = np.diff(np.pad(valid.astype('int8'),((0,0),(1,1))),axis=1)
+    startColumns, starts = np.nonzero(edges == 1)
+    stops = np.nonzero(edges == -1)[1]
+    splits = np.cumsum(np.bincount(startColumns,minlength=len(columns)))[:-1]
+    return {column:tuple(zip(columnStarts.tolist(),columnStops.tolist())) for column,columnStarts,columnStops in zip(columns,np.split(starts,splits),np.split(stops,splits))}
+
+@_profiledStage
+def buildSegmentIndex(dataframe):
+    '''
+    Builds the index of valid contiguous segments (the stretches between tracker dropouts) of every column in a single scan, and stores it on the DataFrame as dataframe.attrs['temaSegments'], along with a fingerprint of each column's NaN mask. Derivatives, smoothing and export then work segment by segment from the stored index instead of rescanning the data for NaNs. cleanImportTemaData builds the index at import.
+
+    :param dataframe: Pandas DataFrame of TEMA data.
+    :type dataframe: DataFrame
+    :Returns: A dictionary mapping each column name to a tuple of (start, stop) row positions, one per segment, with stop exclusive.
+    :rtype: dict
+    '''
+    columns = list(dataframe.columns)
+    valid = _getValidMask(dataframe,columns)
+    segments = _scanSegments(valid,columns)
+    dataframe.attrs['temaSegments'] = (len(dataframe),segments,_getMaskFingerprints(valid,columns))
+    return segments
+
+def getSegmentIndex(dataframe,columns=None):
+    '''
+    Returns the valid contiguous segments of the columns of a DataFrame. pandas carries attrs through operations that change the data, such as interpolate, fillna, shift and sort_values, so segments stored by buildSegmentIndex are only reused for columns whose NaN mask still matches its stored fingerprint. Any other columns (such as ones added or filled in since import) are scanned.
+
+    :param dataframe: Pandas DataFrame of TEMA data.
+    :param columns: List of column names. Default is None, which returns the segments of every column.
+    :type dataframe: DataFrame
+    :type columns: list
+    :Returns: A dictionary mapping each column name to a tuple of (start, stop) row positions, one per segment, with stop exclusive.
+    :rtype: dict
+    '''
+    columns = list(dataframe.columns) if columns is None else list(columns)
+    length, segments, fingerprints = dataframe.attrs.get('temaSegments',(None,{},{}))
+    #the stored index only describes the rows and NaNs it was built from
+    if length != len(dataframe):
+        segments = {}
+    valid = _getValidMask(dataframe,columns)
+    currentFingerprints = _getMaskFingerprints(valid,columns)
+    missingPositions = [position for position,column in enumerate(columns) if not (column in segments and fingerprints.get(column) == currentFingerprints[column])]
+    if missingPositions:
+        segments = dict(segments,**_scanSegments(valid[missingPositions],[columns[position] for position in missingPositions]))
+    return {column:segments[column] for column in columns}
+
+def getStorageType(dataframe,columns):
+    '''
+    Returns the float type that values computed from some columns are stored as. Derivatives and other computed columns are worked out in float64, but stored as float32 when all of their source columns are.
+
+    :param dataframe: Pandas DataFrame of TEMA data.
+    :param columns: The names of the source columns.
+    :type dataframe: DataFrame
+    :type columns: list
+    :Returns: float32 if every source column is float32, otherwise float64.
+    :rtype: numpy.dtype
+    '''
+    return np.dtype('float32') if len(columns) and all(dtype == np.float32 for dtype in dataframe[columns].dtypes) else np.dtype('float64')
+
+def _groupSegments(segments):
+    #columns with the same segments, so each segment can be processed for all of them at once
+    groups = {}
+    for column,(columnName,columnSegments) in enumerate(segments.items()):
+        groups.setdefault(columnSegments,[]).append(column)
+    return groups
+
+def _fillSegmentEnds(rates,values,time,segments,width):
+    #one-sided differences at the first and last sample of each segment, and central differences next to them for wider stencils
+    for columnSegments,groupColumns in _groupSegments(segments).items():
+        bounds = np.array(columnSegments,dtype='int64').reshape(-1,2)
+        bounds = bounds[bounds[:,1]-bounds[:,0] >= 2]
+        starts, ends = bounds[:,0], bounds[:,1]-1
+        rates[np.ix_(starts,groupColumns)] = (values[np.ix_(starts+1,groupColumns)]-values[np.ix_(starts,groupColumns)])/(time[starts+1]-time[starts])[:,np.newaxis]
+        rates[np.ix_(ends,groupColumns)] = (values[np.ix_(ends,groupColumns)]-values[np.ix_(ends-1,groupColumns)])/(time[ends]-time[ends-1])[:,np.newaxis]
+        if width > 1:
+            bounds = bounds[bounds[:,1]-bounds[:,0] >= 3]
+            for inner in [bounds[:,0]+1,bounds[:,1]-2]:
+                rates[np.ix_(inner,groupColumns)] = (values[np.ix_(inner+1,groupColumns)]-values[np.ix_(inner-1,groupColumns)])/(time[inner+1]-time[inner-1])[:,np.newaxis]
+
+def getRateColumnNames(columns,sourceColumns):
+    '''
+    Returns the names of the velocity (or rate) columns that calculateVelocities adds for a list of source columns, worked out in a single pass over the existing column names. Positions become velocities of the same type (i.e. x, y, abs), distances between points become relative velocities of the same type (InterPointVelocity) and angles become angular velocities, numbered one more than the highest existing number of that measurement. Components of the same source measurement share a number, so xPosition3 and yPosition3 become xVelocity and yVelocity with the same number. Names that are not standardized (i.e. raw TEMA names) are recognized as positions or angles if they contain Position or Angle. Anything else becomes a rate of the source column.
+
+    :param columns: The column names of the DataFrame the new columns will be added to. The first column is assumed to be time.
+    :param sourceColumns: The names of the columns that are being differentiated.
+    :type columns: list
+    :type sourceColumns: list
+    :Returns: The new column names, in the same order as sourceColumns.
+    :rtype: list
+    '''
+    maxIndexNumbers = _getMaxIndexNumbers(columns)
+    timeInfo = parseColumnName(columns[0])
+    #the number given to each source measurement, so all of its components share it
+    newIndexNumbers = {}
+    newColumnNames = []
+    for column in sourceColumns:
+        info = parseColumnName(column)
+        if info.isStandard:
+            measurement = info.component+info.expression
+        elif 'Position' in column:
+            #names that aren't standardized are matched by substring, as calculateVelocity always has
+            measurement = next((string for string in positionStrings if string in column),'')
+        else:
+            measurement = 'Angle' if 'Angle' in column else ''
+        if measurement in positionStrings:
+            #if it's a position, the new velocity will be of the same type
+            newColumnName = velocityStrings[positionStrings.index(measurement)]
+            newColumnType = 'Velocity'
+        elif measurement in angleStrings:
+            newColumnName = 'AngularVelocity'
+            newColumnType = 'AngularVelocity'
+        elif measurement in distanceStrings:
+            #the rate of a distance between points is their relative velocity, of the same type
+            newColumnName = derivativeDict[measurement]
+            newColumnType = 'InterPointVelocity'
+        else:
+            #if it's neither an angle nor a position, the new quantity will be a rate of the source column
+            newColumnName = ratePattern.match(column).group(0) + 'Rate'
+            newColumnType = ''
+
+        #get the new measurement's index if not a rate - always 1 more than the existing max index
+        if newColumnType:
+            key = (info.expression,info.index)
+            if not key in newIndexNumbers:
+                maxIndexNumbers[newColumnType] = maxIndexNumbers.get(newColumnType,0)+1
+                newIndexNumbers[key] = maxIndexNumbers[newColumnType]
+            newColumnName += str(newIndexNumbers[key])
+
+        #get the new measurement's units, if both time and the source column have units
+        if timeInfo.unitString and info.unitString:
+            newColumnName += '[' + info.unit + '/' + timeInfo.unit + ']'
+        newColumnNames.append(newColumnName)
+    return newColumnNames
+
+DerivativeStencil = namedtuple('DerivativeStencil', ['scheme','width','weights'])
+
+def getDerivativeStencil(time,scheme='central'):
+    '''
+    Precomputes the time-dependent weights of a finite difference scheme, so any number of columns (and any number of derivative orders) can be differentiated against the same time column without recomputing them.
+
+    The 'central' scheme is the one calculateVelocity has always used: the change over the previous and next samples divided by the time between them. It is exact for uneven time steps only to first order. The 'nonuniform' scheme is the three-point central difference that stays second order accurate when frames are dropped and the time steps are uneven. The 'fivepoint' scheme is the fourth order five-point stencil, which assumes evenly spaced samples.
+
+    :param time: The time of each sample.
+    :param scheme: The finite difference scheme, one of 'central', 'nonuniform' or 'fivepoint'. Default is 'central'.
+    :type time: array
+    :type scheme: str
+    :Returns: A DerivativeStencil named tuple of the scheme, the number of samples the stencil reaches on either side, and the weight arrays.
+    :rtype: DerivativeStencil
+    '''
+    time = np.asarray(time,dtype='float64')
+    deltaT = np.diff(time)
+    if scheme == 'central':
+        return DerivativeStencil(scheme,1,(deltaT[:-1]+deltaT[1:],))
+    elif scheme == 'nonuniform':
+        backwardsDeltaT = deltaT[:-1]
+        forwardsDeltaT = deltaT[1:]
+        totalDeltaT = backwardsDeltaT+forwardsDeltaT
+        return DerivativeStencil(scheme,1,(-forwardsDeltaT/(backwardsDeltaT*totalDeltaT),(forwardsDeltaT-backwardsDeltaT)/(backwardsDeltaT*forwardsDeltaT),backwardsDeltaT/(forwardsDeltaT*totalDeltaT)))
+    elif scheme == 'fivepoint':
+        #12 times the mean step across the stencil
+        return DerivativeStencil(scheme,2,(3*(time[4:]-time[:-4]),))
+    raise ValueError('Unknown finite difference scheme: '+str(scheme))
+
+def applyDerivativeStencil(values,stencil):
+    '''
+    Differentiates every column of a 2-D array at once using weights from getDerivativeStencil. Samples too close to either end for the stencil to fit are NaN, and NaNs in the input spread only to the samples whose stencil includes them.
+
+    :param values: The data to differentiate, one row per sample and one column per quantity.
+    :param stencil: The stencil returned by getDerivativeStencil for the time of each sample.
+    :type values: array
+    :type stencil: DerivativeStencil
+    :Returns: The derivative of each column, the same shape as values.
+    :rtype: array
+    '''
+    values = np.asarray(values,dtype='float64')
+    rates = np.full(values.shape,np.nan)
+    if len(values) <= 2*stencil.width:
+        return rates
+    if stencil.scheme == 'central':
+        delta = np.diff(values,axis=0)
+        rates[1:-1] = (delta[:-1]+delta[1:])/stencil.weights[0][:,np.newaxis]
+    elif stencil.scheme == 'nonuniform':
+        backwardsWeight, centerWeight, forwardsWeight = (weight[:,np.newaxis] for weight in stencil.weights)
+        rates[1:-1] = backwardsWeight*values[:-2]+centerWeight*values[1:-1]+forwardsWeight*values[2:]
+    else:
+        rates[2:-2] = (values[:-4]-8*values[1:-3]+8*values[3:-1]-values[4:])/stencil.weights[0][:,np.newaxis]
+    return rates
+
+@_profiledStage
+def calculateVelocities(dataframe,columns=None,scheme='central',fillEnds=False):
+    '''
+    Calculates the velocity (or rate) of many columns at once. Returns a new Pandas DataFrame with one added column per source column, named as calculateVelocity would name it. All of the columns are differentiated in a single 2-D operation and the frame is only copied once.
+
+    :param dataframe: Pandas DataFrame that contains the position or input data. The first column is assumed to be time.
+    :param columns: List of the names of the columns that you wish to take the velocity or rate of. Default is None, which uses every position and angle column.
+    :param scheme: The finite difference scheme, one of 'central', 'nonuniform' or 'fivepoint' (see getDerivativeStencil). Default is 'central', the scheme used by calculateVelocity.
+    :param fillEnds: Determines whether the samples at the ends of each valid segment, where the stencil would reach into a dropout, get one-sided differences instead of NaN. Default is False.
+    :type dataframe: DataFrame
+    :type columns: list
+    :type scheme: str
+    :type fillEnds: bool
+    :Returns: newDataFrame, a Pandas DataFrame containing the position or input data as well as the calculated velocity or rate data as added columns.
+    :rtype: DataFrame
+    '''
+    if columns is None:
+        columns = [info.name for info in getColumnSchema(dataframe.columns) if info.isStandard and info.component+info.expression in positionStrings+angleStrings]
+    newColumns = getRateColumnNames(dataframe.columns,columns)
+    time = dataframe[dataframe.columns[0]].to_numpy(dtype='float64')
+    stencil = getDerivativeStencil(time,scheme)
+    storageType = getStorageType(dataframe,columns)
+    segments = getSegmentIndex(dataframe,columns) if fillEnds else {}
+    #float32 data is differentiated in float64 a block of columns at a time, so the float64 copy never covers the whole frame
+    blockSize = max(len(columns),1) if storageType == np.float64 else 64
+    rates = np.empty((len(dataframe),len(columns)),dtype=storageType)
+    for start in range(0,len(columns),blockSize):
+        blockColumns = columns[start:start+blockSize]
+        values = dataframe[blockColumns].to_numpy(dtype='float64')
+        blockRates = applyDerivativeStencil(values,stencil)
+        if fillEnds:
+            _fillSegmentEnds(blockRates,values,time,{column:segments[column] for column in blockColumns},stencil.width)
+        if blockSize >= len(columns):
+            rates = blockRates.astype(storageType,copy=False)
+        else:
+            rates[:,start:start+blockSize] = blockRates
+    rates = pd.DataFrame(rates,index=dataframe.index,columns=newColumns)
+
+    #add the new columns in one go - any that already exist are overwritten in place
+    replaced = rates.columns.isin(dataframe.columns)
+    newDataframe = pd.concat([dataframe,rates.loc[:,~replaced]],axis='columns')
+    for column in rates.columns[replaced]:
+        newDataframe[column] = rates[column]
+    newDataframe.attrs = dataframe.attrs
+    return newDataframe
+
+def getDerivativeColumnNames(columns,sourceColumns,order=3):
+    '''
+    Returns the names of the velocity, acceleration and jerk columns that calculateDerivatives adds for a list of position, angle or higher derivative columns. Each derivative is named after the measurement it is the derivative of (i.e. xPosition gives xVelocity, xAcceleration and xJerk, and Angle gives AngularVelocity, AngularAcceleration and AngularJerk) and numbered one more than the highest existing number of that measurement. Components of the same source measurement share a number.
+
+    :param columns: The column names of the DataFrame the new columns will be added to. The first column is assumed to be time.
+    :param sourceColumns: The names of the columns that are being differentiated.
+    :param order: The highest derivative order, counted from the source columns. Default is 3.
+    :type columns: list
+    :type sourceColumns: list
+    :type order: int
+    :Returns: One list of new column names per derivative order, each in the same order as sourceColumns.
+    :rtype: list
+    '''
+    maxIndexNumbers = _getMaxIndexNumbers(columns)
+    timeInfo = parseColumnName(columns[0])
+    #the number given to each source measurement and derivative order, so all of its components share it
+    newIndexNumbers = {}
+    newColumnNames = [[] for derivativeOrder in range(order)]
+    for column in sourceColumns:
+        info = parseColumnName(column)
+        measurement = info.component+info.expression if info.isStandard else ''
+        unit = info.unit
+        for derivativeOrder in range(order):
+            if not measurement in derivativeDict:
+                raise ValueError('Cannot take derivative '+str(derivativeOrder+1)+' of '+column+': only position, angle, velocity and acceleration columns can be differentiated')
+            measurement = derivativeDict[measurement]
+            newColumnType = parseColumnName(measurement).expression
+            key = (newColumnType,info.expression,info.index)
+            if not key in newIndexNumbers:
+                maxIndexNumbers[newColumnType] = maxIndexNumbers.get(newColumnType,0)+1
+                newIndexNumbers[key] = maxIndexNumbers[newColumnType]
+            newColumnName = measurement+str(newIndexNumbers[key])
+            #each order divides the unit by the time unit once more, i.e. [m/s/s]
+            if timeInfo.unitString and info.unitString:
+                unit += '/' + timeInfo.unit
+                newColumnName += '[' + unit + ']'
+            newColumnNames[derivativeOrder].append(newColumnName)
+    return newColumnNames
+
+@_profiledStage
+def calculateDerivatives(dataframe,columns=None,order=3,scheme='central',fillEnds=False):
+    '''
+    Calculates the velocity, acceleration and jerk (or angular velocity, acceleration and jerk) of many columns in one pass. The finite difference weights are worked out once from the time column and reused for every order, and each order is taken from the one below it as a single 2-D operation over all of the columns. The new columns are added velocities first, then accelerations, then jerks, and are named so standardizeColOrder can order them.
+
+    :param dataframe: Pandas DataFrame that contains the position or angle data. The first column is assumed to be time.
+    :param columns: List of the names of the position, angle, velocity or acceleration columns that you wish to differentiate. Default is None, which uses every position and angle column.
+    :param order: The highest derivative order to calculate: 1 for velocity, 2 for acceleration and 3 for jerk. Default is 3.
+    :param scheme: The finite difference scheme, one of 'central', 'nonuniform' or 'fivepoint' (see getDerivativeStencil). Default is 'central'.
+    :param fillEnds: Determines whether the samples at the ends of each valid segment, where the stencil would reach into a dropout, get one-sided differences instead of NaN. This keeps NaNs from spreading further into the data with each derivative order. Default is False.
+    :type dataframe: DataFrame
+    :type columns: list
+    :type order: int
+    :type scheme: str
+    :type fillEnds: bool
+    :Returns: newDataFrame, a Pandas DataFrame containing the input data as well as the calculated derivatives as added columns.
+    :rtype: DataFrame
+    '''
+    if columns is None:
+        columns = [info.name for info in getColumnSchema(dataframe.columns) if info.isStandard and info.component+info.expression in positionStrings+angleStrings]
+    newColumns = getDerivativeColumnNames(dataframe.columns,columns,order)
+    time = dataframe[dataframe.columns[0]].to_numpy(dtype='float64')
+    stencil = getDerivativeStencil(time,scheme)
+    values = dataframe[columns].to_numpy(dtype='float64')
+    #with filled ends, every derivative order has the same valid segments as the source columns
+    segments = getSegmentIndex(dataframe,columns) if fillEnds else None
+    derivatives = []
+    for derivativeOrder in range(order):
+        rates = applyDerivativeStencil(values,stencil)
+        if fillEnds:
+            _fillSegmentEnds(rates,values,time,segments,stencil.width)
+        values = rates
+        derivatives.append(pd.DataFrame(values.astype(getStorageType(dataframe,columns),copy=False),index=dataframe.index,columns=newColumns[derivativeOrder]))
+    newDataframe = pd.concat([dataframe]+derivatives,axis='columns')
+    newDataframe.attrs = dataframe.attrs
+    return newDataframe
+
+def getSavitzkyGolayWeights(window,polyorder,derivative):
+    '''
+    Returns the Savitzky-Golay weights that give a derivative of the least squares polynomial through a window of evenly spaced samples.
+
+    :param window: The number of samples in the window. Must be odd.
+    :param polyorder: The order of the fitted polynomial.
+    :param derivative: The derivative order, 0 for the smoothed values themselves.
+    :type window: int
+    :type polyorder: int
+    :type derivative: int
+    :Returns: A (window, window) array whose row j holds the weights that give the derivative at sample j of the window, for a sample spacing of 1. The middle row is the usual filter.
+    :rtype: array
+    '''
+    offsets = np.arange(window)-window//2
+    #polynomial coefficients from the samples in the window
+    fit = np.linalg.pinv(np.vander(offsets,polyorder+1,increasing=True))
+    #derivative of each polynomial term at each sample in the window
+    evaluation = np.zeros((window,polyorder+1))
+    for power in range(derivative,polyorder+1):
+        evaluation[:,power] = math.perm(power,derivative)*offsets.astype('float64')**(power-derivative)
+    return evaluation @ fit
+
+def _savitzkyGolayDerivative(values,time,derivative,window,polyorder):
+    #derivative of one NaN-free block of samples, spacing taken as the mean time step
+    rates = np.full(values.shape,np.nan)
+    length = len(values)
+    if length < window:
+        return rates
+    half = window//2
+    weights = getSavitzkyGolayWeights(window,polyorder,derivative)
+    #the middle row of weights slides along the block, one shifted slice at a time to keep memory bounded
+    rates[half:length-half] = 0
+    for offset,weight in enumerate(weights[half]):
+        rates[half:length-half] += weight*values[offset:length-window+1+offset]
+    #the ends use the polynomial through the first and last windows
+    rates[:half] = weights[:half] @ values[:window]
+    rates[length-half:] = weights[half+1:] @ values[length-window:]
+    return rates/((time[-1]-time[0])/(length-1))**derivative
+
+def _lowPassDerivatives(values,time,order,cutoff):
+    #gaussian low-pass with a -3 dB point at the cutoff frequency, then finite differences
+    length = len(values)
+    sigma = math.sqrt(math.log(2))/(2*math.pi*cutoff)/((time[-1]-time[0])/max(length-1,1))
+    radius = min(int(math.ceil(4*sigma)),length-1)
+    kernel = np.exp(-0.5*(np.arange(-radius,radius+1)/max(sigma,1e-12))**2)
+    kernel /= kernel.sum()
+    #extend the block by point reflection about its end samples, so straight-line trends pass through undistorted
+    reflection = np.arange(radius)
+    padded = np.concatenate((2*values[:1]-values[radius-reflection],values,2*values[-1:]-values[length-2-reflection]))
+    smoothed = np.zeros(values.shape)
+    for offset,kernelWeight in enumerate(kernel):
+        smoothed += kernelWeight*padded[offset:offset+length]
+    stencil = getDerivativeStencil(time,'nonuniform')
+    derivatives = []
+    for derivativeOrder in range(order):
+        smoothed = applyDerivativeStencil(smoothed,stencil)
+        derivatives.append(smoothed)
+    return derivatives
+
+def _splineDerivatives(values,time,order,smoothing):
+    try:
+        from scipy.interpolate import make_smoothing_spline
+    except ImportError:
+        raise ImportError('The spline method requires scipy 1.10 or later')
+    derivatives = [np.full(values.shape,np.nan) for derivativeOrder in range(order)]
+    if len(values) < 5:
+        return derivatives
+    for column in range(values.shape[1]):
+        spline = make_smoothing_spline(time,values[:,column],lam=smoothing)
+        for derivativeOrder in range(order):
+            derivatives[derivativeOrder][:,column] = spline(time,nu=derivativeOrder+1)
+    return derivatives
+
+@_profiledStage
+def calculateSmoothedDerivatives(dataframe,columns=None,order=2,method='savgol',window=11,polyorder=3,cutoff=None,smoothing=None):
+    '''
+    Calculates smoothed velocity and acceleration (and optionally jerk) of many columns at once, to keep pixel quantization noise from being amplified by plain central differences. The new columns are named and added like calculateDerivatives.
+
+    Each column is split at its NaN gaps (using the segment index from getSegmentIndex) and only the runs of valid data are smoothed, so dropouts neither bleed into their neighbours nor stop the rest of the column from being differentiated. Columns with the same gaps (such as the x, y and abs components of a tracked point) are processed together as one 2-D block.
+
+    Three methods are available. 'savgol' fits a polynomial of order polyorder to a sliding window of window samples (a Savitzky-Golay filter) and assumes evenly spaced samples within each run. 'lowpass' applies a Gaussian low-pass filter with its -3 dB point at cutoff Hz followed by the 'nonuniform' finite difference. 'spline' fits a smoothing spline with smoothing parameter smoothing (chosen automatically if None) and requires scipy 1.10 or later.
+
+    :param dataframe: Pandas DataFrame that contains the position or angle data. The first column is assumed to be time.
+    :param columns: List of the names of the position, angle, velocity or acceleration columns that you wish to differentiate. Default is None, which uses every position and angle column.
+    :param order: The highest derivative order to calculate: 1 for velocity, 2 for acceleration and 3 for jerk. Default is 2.
+    :param method: The smoothing method, one of 'savgol', 'lowpass' or 'spline'. Default is 'savgol'.
+    :param window: The number of samples in each Savitzky-Golay window. Must be odd. Default is 11.
+    :param polyorder: The order of the Savitzky-Golay polynomial. Must be at least order. Default is 3.
+    :param cutoff: The cutoff frequency of the low-pass filter, in the inverse of the time unit. Required for the 'lowpass' method.
+    :param smoothing: The smoothing parameter of the 'spline' method. Default is None, which chooses it by generalized cross-validation.
+    :type dataframe: DataFrame
+    :type columns: list
+    :type order: int
+    :type method: str
+    :type window: int
+    :type polyorder: int
+    :type cutoff: float
+    :type smoothing: float
+    :Returns: newDataFrame, a Pandas DataFrame containing the input data as well as the smoothed derivatives as added columns.
+    :rtype: DataFrame
+    '''
+    if method == 'savgol' and (window % 2 == 0 or polyorder < order or polyorder >= window):
+        raise ValueError('window must be odd and larger than polyorder, and polyorder must be at least order')
+    if method == 'lowpass' and not cutoff:
+        raise ValueError('The lowpass method requires a cutoff frequency')
+    if not method in ['savgol','lowpass','spline']:
+        raise ValueError('Unknown smoothing method: '+str(method))
+    if columns is None:
+        columns = [info.name for info in getColumnSchema(dataframe.columns) if info.isStandard and info.component+info.expression in positionStrings+angleStrings]
+    newColumns = getDerivativeColumnNames(dataframe.columns,columns,order)
+    time = dataframe[dataframe.columns[0]].to_numpy(dtype='float64')
+    values = dataframe[columns].to_numpy(dtype='float64')
+    derivatives = [np.full(values.shape,np.nan) for derivativeOrder in range(order)]
+
+    #group the columns that have the same gaps, so each run of valid data is processed for all of them at once
+    segments = getSegmentIndex(dataframe,columns)
+    timeSegments = getSegmentIndex(dataframe,[dataframe.columns[0]])[dataframe.columns[0]]
+    if timeSegments != ((0,len(dataframe)),):
+        #only keep the parts of each segment where time is valid too
+        timeValid = ~np.isnan(time)
+        segments = {column:tuple(segment for start,stop in columnSegments for segment in ((start+segmentStart,start+segmentStop) for segmentStart,segmentStop in getValidSegments(timeValid[start:stop]))) for column,columnSegments in segments.items()}
+    for columnSegments,groupColumns in _groupSegments(segments).items():
+        for start,stop in columnSegments:
+            #a derivative needs at least three samples
+            if stop-start < 3:
+                continue
+            block = values[start:stop,groupColumns]
+            blockTime = time[start:stop]
+            if method == 'savgol':
+                blockDerivatives = [_savitzkyGolayDerivative(block,blockTime,derivativeOrder+1,window,polyorder) for derivativeOrder in range(order)]
+            elif method == 'lowpass':
+                blockDerivatives = _lowPassDerivatives(block,blockTime,order,cutoff)
+            else:
+                blockDerivatives = _splineDerivatives(block,blockTime,order,smoothing)
+            for derivative,blockDerivative in zip(derivatives,blockDerivatives):
+                derivative[start:stop,groupColumns] = blockDerivative
+
+    newDataframe = pd.concat([dataframe]+[pd.DataFrame(derivative.astype(getStorageType(dataframe,columns),copy=False),index=dataframe.index,columns=names) for derivative,names in zip(derivatives,newColumns)],axis='columns')
+    newDataframe.attrs = dataframe.attrs
+    return newDataframe
+
+@_profiledStage
 def calculateVelocity(dataframe,column):
     '''
-    Calculated the velocity of a particle based on the x, y and absolute positions. Returns a new Pandas DataFrame where the velocity of the same type (i.e. x, y, abs) as the input position is added as a column to the DataFrame. If the column called does not have units or is already a velocity, the function will return the result as a rate. Function uses central difference velocity calculations
+    Calculated the velocity of a particle based on the x, y and absolute positions. Returns a new Pandas DataFrame where the velocity of the same type (i.e. x, y, abs) as the input position is added as a column to the DataFrame. If the column called does not have units or is already a velocity, the function will return the result as a rate. Function uses central difference velocity calculations. To differentiate many columns, use calculateVelocities.
 
     :param dataframe: Pandas DataFrame that contains the position or input data.
     :param column: The name of the column that you wish to take the velocity or rate of.
@@ -259,58 +957,69 @@ def calculateVelocity(dataframe,column):
     :Returns: newDataFrame, a Pandas DataFrame containing the position or input data as well as the calculated velocity or rate data as an added column.
     :rtype: DataFrame
     '''
-    newDataframe = dataframe.copy()
-    newColumnName = ''
-    newColumnType = ''
-    if 'Position' in column:
-        #if it's a position, the new velocity will be of the same type
-        for string in positionStrings:
-            if string in column:
-                newColumnName = velocityStrings[positionStrings.index(string)]
-                newColumnType = 'Velocity'
-    elif 'Angle' in column:
-        newColumnName = 'AngularVelocity'
-        newColumnType = 'AngularVelocity'
-    else:
-        #if it's neither an angle nor a position, the new quantity will be a rate of the source column
-        newColumnName = re.findall('[^(\[.*\])]*',column)[0] + 'Rate'
-    
-    newMeasurementIndex = ''
-    #get the new measurement's index if not a rate - always 1 more than the existing max index
-    if newColumnType:
-        maxIndexNumber = 0
-        for col in newDataframe.columns.tolist():
-            for string in measurementDict[newColumnType]:
-                indexNumber = re.findall(string+'[0-9]+',col)
-                if indexNumber:
-                    indexNumber = int(re.findall('[0-9]+',indexNumber[-1])[-1])
-                    if indexNumber > maxIndexNumber: maxIndexNumber = indexNumber
-        newMeasurementIndex = str(maxIndexNumber+1)
-    
-    #get the new measurement's units, if both time and the source column have units
-    newUnitString = ''
-    timeUnitString = re.findall('\[.+\]', newDataframe.columns[0])
-    unitString = re.findall('\[.+\]', column)
-    if timeUnitString and unitString:
-        newUnitString = '[' + unitString[-1].strip('[]') + '/' + timeUnitString[-1].strip('[]') + ']'
-        
-    #build the new column name
-    newColumnName = newColumnName+newMeasurementIndex+newUnitString
-    
-    #central difference - assume even spacing
-    backwardsDiff = newDataframe[column].diff()
-    forwardsDiff = newDataframe[column].diff(periods=-1).multiply(-1)
-    backwardsDeltaT = newDataframe[newDataframe.columns[0]].diff()
-    forwardsDeltaT = newDataframe[newDataframe.columns[0]].diff(periods=-1).multiply(-1)
-    centralDiff = backwardsDiff + forwardsDiff
-    totalDeltaT = backwardsDeltaT + forwardsDeltaT
-    rate = centralDiff.divide(totalDeltaT)
-    
-    #assign values to the new column
-    newDataframe[newColumnName] = rate
-    
+    return calculateVelocities(dataframe,[column])
+
+@_profiledStage
+def calculatePointGeometry(dataframe,pairs=None,angles=False,velocities=False):
+    '''
+    Calculates the geometry between pairs of tracked points from their x and y positions: the x, y and absolute distance from the first point of each pair to the second, and optionally the angle of the line between them (i.e. the angle of a rigid body the two points are on) and the relative velocities. All of the pairs are calculated at once, as a few array operations over every position column, rather than column by column.
+
+    The new columns follow the names TEMA's own distance and angle columns are standardized to, so standardizeColOrder places them with the rest. The distances of each pair are numbered one more than the highest existing xInterPointDistance, yInterPointDistance or absInterPointDistance number (and the angles one more than the highest Angle number), in the order of pairs. The rates of the distances are named xInterPointVelocity, yInterPointVelocity and absInterPointVelocity, and are ordered after the angular velocities. absInterPointVelocity is the rate at which the points move apart, not the magnitude of their relative velocity.
+
+    :param dataframe: Pandas DataFrame of cleaned TEMA data, with xPosition and yPosition columns for every point of the pairs. Both points of a pair must be in the same units. The first column is assumed to be time.
+    :param pairs: A list of (first point, second point) number pairs, i.e. [(1,2),(1,3)]. Default is None, which uses every pair of points with both x and y positions in the same units.
+    :param angles: Determines whether the angle of the line from the first to the second point of each pair, in radians from the x axis, is added as an Angle column. Default is False.
+    :param velocities: Determines whether the rates of the distances (the relative velocities of the points) and the angular velocities of the angles are added with calculateVelocities. Default is False.
+    :type dataframe: DataFrame
+    :type pairs: list
+    :type angles: bool
+    :type velocities: bool
+    :Returns: newDataFrame, a Pandas DataFrame containing the input data as well as the calculated distance, angle and velocity data as added columns.
+    :rtype: DataFrame
+    '''
+    #the x and y position columns of every point
+    positions = {}
+    for info in getColumnSchema(dataframe.columns):
+        if info.isStandard and info.index and info.component+info.expression in ['xPosition','yPosition']:
+            positions.setdefault(info.index,{}).setdefault(info.component,info)
+    if pairs is None:
+        pairs = [(first,second) for first,second in itertools.combinations(sorted([index for index in positions if len(positions[index]) == 2],key=int),2) if positions[first]['x'].unit == positions[second]['x'].unit]
+    pairs = [(str(first),str(second)) for first,second in pairs]
+    points = list(dict.fromkeys(index for pair in pairs for index in pair))
+    for index in points:
+        if len(positions.get(index,{})) < 2:
+            raise ValueError('Point '+index+' does not have both an xPosition and a yPosition column')
+    for first,second in pairs:
+        if len({positions[index][component].unit for index in (first,second) for component in ['x','y']}) > 1:
+            raise ValueError('The positions of points '+first+' and '+second+' are not all in the same units')
+    sourceColumns = [positions[index][component].name for index in points for component in ['x','y']]
+
+    #gather every position once, then difference every pair in one go
+    firsts = np.array([points.index(first) for first,second in pairs],dtype='intp')
+    seconds = np.array([points.index(second) for first,second in pairs],dtype='intp')
+    values = dataframe[sourceColumns].to_numpy(dtype='float64').reshape(len(dataframe),len(points),2)
+    maxIndexNumbers = _getMaxIndexNumbers(dataframe.columns)
+    distanceIndex = maxIndexNumbers.get('InterPointDistance',0)+1
+    newColumns = [measurement+str(distanceIndex+pair)+positions[pairs[pair][0]]['x'].unitString for pair in range(len(pairs)) for measurement in distanceStrings]
+    if angles:
+        angleIndex = maxIndexNumbers.get('Angle',0)+1
+        newColumns += ['Angle'+str(angleIndex+pair)+'[rad]' for pair in range(len(pairs))]
+    #the x, y and abs distances of each pair side by side, then the angles, written straight into the new block
+    geometry = np.empty((len(dataframe),len(newColumns)))
+    distances = geometry[:,:3*len(pairs)].reshape(len(dataframe),len(pairs),3)
+    np.subtract(values[:,seconds,:],values[:,firsts,:],out=distances[:,:,:2])
+    np.hypot(distances[:,:,0],distances[:,:,1],out=distances[:,:,2])
+    if angles:
+        np.arctan2(distances[:,:,1],distances[:,:,0],out=geometry[:,3*len(pairs):])
+    geometry = pd.DataFrame(geometry.astype(getStorageType(dataframe,sourceColumns),copy=False),index=dataframe.index,columns=newColumns)
+
+    newDataframe = pd.concat([dataframe,geometry],axis='columns')
+    newDataframe.attrs = dataframe.attrs
+    if velocities:
+        newDataframe = calculateVelocities(newDataframe,newColumns)
     return newDataframe
 
+@_profiledStage
 def standardizeColFormat(dataframe):
     '''
     Returns the intuitively labeled TEMA data file as a Pandas dataframe
@@ -320,40 +1029,51 @@ def standardizeColFormat(dataframe):
     :Returns: newDataFrame, a pandas DataFrame where the column names have been restructured so that they are more intuitive. They should show the expression being shown (position, velocity, etc), component of that expression (x,y), particle number, and unit.
     :rtype: DataFrame
     '''
-    newDataframe = dataframe.copy()
-    #construct dictionaries to match substrings in the original name to substrings in the new name
-    componentPatterns = {' y':'y', ' x':'x', ' abs':'abs'}
-    expressionPatterns = {'angular speed':'AngularVelocity', 'Angle':'Angle', 'Velocity':'Velocity', 'Point':'Position', 'Time':'Time', 'Distance':'InterPointDistance'}
-
-    for col in newDataframe.columns.tolist():
-        unitString = re.findall('\[.+\]', col)
-        if (unitString):
-            unitString = unitString[-1]
-        else:
-            unitString = ''
-        
-        colNum = re.findall('#[0-9]+', col)
-        if colNum:
-            colNum = colNum[-1].strip('#')
-        else:
-            colNum = ''
-        
-        component = ''
-        for componentString in componentPatterns.keys():
-            if componentString in col:
-                component = componentPatterns[componentString]
-                break
-        
-        expression = 'Unknown'
-        for expressionString in expressionPatterns.keys():
-            if expressionString in col:
-                expression = expressionPatterns[expressionString]
-                break
-
-        newColName = component+expression+colNum+unitString
-        newDataframe = newDataframe.rename(columns = {col:newColName})
-    return newDataframe
+    #the component, expression, point number and unit of each column are matched by parseColumnName using componentPatterns and expressionPatterns
+    return dataframe.set_axis([info.formattedName for info in getColumnSchema(dataframe.columns)],axis='columns')
+    
+@_profiledStage
+def getColumnOrder(columns,renumber=False,positions=False):
+    '''
+    Works out the standardized column order (position first, followed by velocities, and etc) and, optionally, the renumbering of a list of standardized column names without touching any data.
+
+    :param columns: The standardized column names, i.e. the columns of a DataFrame returned by standardizeColFormat.
+    :param renumber: Whether to also build the renaming that renumbers the particle numbers to be in numerical order from 1. False as default.
+    :param positions: Whether to return the order as positions in columns rather than names, so columns that share a name (such as two Unknown columns) each keep their own place. False as default.
+    :type columns: list
+    :type renumber: bool
+    :type positions: bool
+    :Returns: A tuple of the reordered column names (or their positions in columns) and a dictionary mapping the reordered column names to their renumbered names (empty if renumber is False).
+    :rtype: (list,dict)
+    '''
+    columns = list(columns)
+    #parse every column once into its place in the order - measurement, then index, then variant - and sort on that
+    orderKeys = {}
+    for position,info in enumerate(getColumnSchema(columns[1:]),1):
+        if info.isStandard and info.unitString and info.index[:1] in list('123456789') and info.component+info.expression in measurementDict.get(info.expression,[]):
+            orderKey = (measurementRanks[info.expression],int(info.index),variantRanks[info.component+info.expression])
+            #only the first column with a given key is ordered, any others stay with the remaining columns
+            orderKeys.setdefault(orderKey,position)
+    orderedPositions = [0]+[orderKeys[orderKey] for orderKey in sorted(orderKeys)]
+    #add the remaining columns in their original order
+    ordered = set(orderedPositions)
+    orderedPositions += [position for position in range(len(columns)) if not position in ordered]
     
+    #if renumbering, number the indices of each measurement in order from 1 and rename every column of that measurement and index
+    renameDict = {}
+    if renumber:
+        newIndices = {}
+        for measurementRank,index,variantRank in sorted(orderKeys):
+            measurementIndices = newIndices.setdefault(list(measurementDict)[measurementRank],{})
+            measurementIndices.setdefault(str(index),str(len(measurementIndices)+1))
+        for info in getColumnSchema(columns):
+            if info.isStandard and info.index in newIndices.get(info.expression,{}):
+                renameDict[info.name] = info.component+info.expression+newIndices[info.expression][info.index]+info.unitString
+    if positions:
+        return (orderedPositions,renameDict)
+    return ([columns[position] for position in orderedPositions],renameDict)
+
+@_profiledStage
 def standardizeColOrder(dataframe,renumber=False):
     '''
     Returns the cleaned, more intuitively labeled TEMA data file as a Pandas dataframe where the columns are reordered to put position first, followed by velocities, and etc.
@@ -365,84 +1085,274 @@ def standardizeColOrder(dataframe,renumber=False):
     :Returns: newDataFrame, a Pandas DataFrame that contains the TEMA data that is rescaled with the columns re-labeled and re-ordered.
     :rtype: DataFrame
     '''
-    newDataframe = dataframe.copy()
-    orderedColumns = []
-    renumberDict = {}
-    orderedColumns.append(newDataframe.columns.tolist()[0])
-    
-    trackerNumber = 0
-    maxIndexNumber = 0
-    #the order of keys in these dictionaries determines the order in which columns appear
-    positionStrings = ['xPosition','yPosition','absPosition']
-    angleStrings = ['Angle']
-    velocityStrings = ['xVelocity','yVelocity','absVelocity']
-    angularVelocityStrings = ['AngularVelocity']
-    distanceStrings = ['xInterPointDistance', 'yInterPointDistance', 'absInterPointDistance']
-    measurementDict = {'Position':positionStrings, 'Angle':angleStrings, 'InterPointDistance': distanceStrings,'Velocity':velocityStrings, 'AngularVelocity':angularVelocityStrings}
-    
-    #First loop over the columns to determine the max index number (we don't care what kind of measurement that number indexes, it's just an upper bound on iteration)
-    for col in newDataframe.columns.tolist():
-        for measurement in measurementDict.keys():
-            indexNumber = re.findall(measurement+'[0-9]+',col)
-            if indexNumber:
-                indexNumber = int(re.findall('[0-9]+',indexNumber[-1])[-1])
-                if indexNumber > maxIndexNumber: maxIndexNumber = indexNumber
-    
-    #for each type of measurement (position, angle, etc - IN ORDER)
-    for measurement in measurementDict.keys():
-        #reset the tracker for renumbering
-        trackerNumber = 0
-        #count up to the max index
-        for i in range(1,maxIndexNumber+1):
-            #check for each variety of each measurement
-            for string in measurementDict[measurement]:
-                res = [col for col in newDataframe.columns.tolist() if string+str(i) in col]
-                #if it appears, extract it and add that column to the ordered column list
-                if res:
-                    res = res[0]
-                    #double check for an exact match
-                    if re.findall(string+str(i)+'\[.+\]',res):
-                        orderedColumns.append(res)
-                        #if we're also renumbering things, track the number of the measurement of this type and add it to a renumber dictionary
-                        if renumber:
-                            key = measurement+str(i)
-                            if not key in renumberDict:
-                                trackerNumber += 1
-                                renumberDict[key] = measurement+str(trackerNumber)
-    #reindex using new column order
-    extraCols = [col for col in newDataframe.columns.tolist() if not col in orderedColumns]
-    orderedColumns += extraCols
-    newDataframe = newDataframe.reindex(columns=orderedColumns)
-    
-    #if renumbering, build a rename dictionary
-    if renumber:
-        renameDict = {}
-        keys = renumberDict.keys()
-        #for each column, see if there's a key in the renumber dictionary that's in the column name
-        for col in newDataframe.columns.tolist():
-            for key in keys:
-                if key in col:
-                    #if there is, add the column name as a key to the rename dictionary and the column name with the replacement applied as that key's entry
-                    renameDict[col] = col.replace(key,renumberDict[key])
-        #then use the rename dictionary to rename the columns
+    orderedPositions, renameDict = getColumnOrder(dataframe.columns,renumber,positions=True)
+    #select the columns in the new order by position, then rename once
+    newDataframe = dataframe.iloc[:,orderedPositions]
+    if renameDict:
         newDataframe = newDataframe.rename(columns = renameDict)
     return newDataframe
-    
-def cleanImportTemaData(filename):
+
+CleanImportPlan = namedtuple('CleanImportPlan', ['positions','columns','scale'])
+
+@lru_cache(maxsize=256)
+def _getCleanImportPlan(columns):
+    #the standardized name and scale factor of every column except the empty trailing column
+    positions = [i for i,col in enumerate(columns) if col != ' ']
+    conversions = [getColumnUnitConversion(columns[i]) for i in positions]
+    formattedColumns = [parseColumnName(newCol).formattedName for newCol,unitConversion in conversions]
+    #then the order of the standardized names, as positions in the raw header
+    orderedPositions, renameDict = getColumnOrder(formattedColumns,positions=True)
+    return CleanImportPlan([positions[position] for position in orderedPositions],[formattedColumns[position] for position in orderedPositions],np.array([conversions[position][1] for position in orderedPositions],dtype='float64'))
+
+unitCaches.append(_getCleanImportPlan)
+
+@_profiledStage
+def getCleanImportPlan(columns):
+    '''
+    Returns everything cleanImportTemaData needs to turn a raw TEMA header into cleaned data: which raw columns to keep and in what order, their standardized names and their unit scale factors. Plans are cached by header, so files sharing a tracker layout share a plan.
+
+    :param columns: The raw TEMA column names, as returned by readTemaHeader.
+    :type columns: list
+    :Returns: A CleanImportPlan named tuple of the ordered raw column positions, the cleaned column names and the scale factor for each cleaned column.
+    :rtype: CleanImportPlan
+    '''
+    return _getCleanImportPlan(tuple(columns))
+
+@_profiledStage
+def applyCleanImportPlan(dataframe,plan):
+    '''
+    Builds the cleaned DataFrame from raw TEMA data in a single pass: one selection of the ordered columns and one multiply by the per-column scale vector, with no intermediate DataFrames.
+
+    :param dataframe: Pandas DataFrame of raw TEMA data with the columns the plan was built from.
+    :param plan: The plan returned by getCleanImportPlan for the raw columns.
+    :type dataframe: DataFrame
+    :type plan: CleanImportPlan
+    :Returns: newDataFrame, a pandas DataFrame with standardized units, names and column order.
+    :rtype: DataFrame
+    '''
+    #fill one (columns, rows) block, scaling each raw column straight into its final slot
+    dtype = np.result_type('float32',*[dataframe.dtypes.iloc[position] for position in plan.positions[1:]])
+    newValues = np.empty((len(plan.positions),len(dataframe)),dtype=dtype)
+    for newValue,position,scale in zip(newValues,plan.positions,plan.scale):
+        np.multiply(dataframe.iloc[:,position].to_numpy(),scale,out=newValue,casting='same_kind')
+    #the transposed block is handed to pandas as-is, so each column stays contiguous
+    if dtype == np.float64:
+        return pd.DataFrame(newValues.T,index=dataframe.index,columns=plan.columns,copy=False)
+    #data stored as float32 still keeps a float64 time column
+    newDataframe = pd.DataFrame(newValues[1:].T,index=dataframe.index,columns=plan.columns[1:],copy=False)
+    newDataframe.insert(0,plan.columns[0],dataframe.iloc[:,plan.positions[0]].to_numpy()*plan.scale[0])
+    return newDataframe
+
+def selectCleanImportPlan(plan,usecols):
+    '''
+    Returns the part of a clean import plan that covers some of the raw columns, for raw data parsed with only those columns (i.e. by readTemaBody with usecols).
+
+    :param plan: The plan returned by getCleanImportPlan for the whole header.
+    :param usecols: The positions in the header of the parsed raw columns, such as those returned by selectTemaColumns.
+    :type plan: CleanImportPlan
+    :type usecols: list
+    :Returns: A CleanImportPlan of the selected columns, with positions into a DataFrame of only those columns.
+    :rtype: CleanImportPlan
+    '''
+    usecols = sorted(usecols)
+    selected = [i for i,position in enumerate(plan.positions) if position in usecols]
+    return CleanImportPlan([usecols.index(plan.positions[i]) for i in selected],[plan.columns[i] for i in selected],plan.scale[selected])
+
+@_profiledStage
+def cleanImportTemaData(filename,dtype='float64',columns=None,points=None):
     '''
     Returns the cleaned, more intuitively labeled TEMA data file as a Pandas dataframe using default parameters. This file has standardized units.
 
+    The result is the same as running standardizeUnits, standardizeColFormat and standardizeColOrder on the output of importTemaData, but the final names, scale factors and order are worked out from the header alone and the cleaned frame is built once from the parsed data.
+
     :param filename: The name of the TEMA .txt file you wish to import. Note that the imported file should be a tab delineated text file.
+    :param dtype: The float type the data is stored as, 'float64' or 'float32'. float32 halves the memory used, and still holds the 6 or so significant figures TEMA exports. The time column is always float64, and velocities and other derivatives are computed in float64 before being stored. Default is 'float64'.
+    :param columns: If given, only these columns (and time) are parsed and cleaned, the rest are skipped by the parser. Columns can be named as cleaned (i.e. xPosition1[m]) or raw (see selectTemaColumns). Default is None.
+    :param points: If given, only the columns of these tracked point numbers (and time, and any columns) are parsed and cleaned. Default is None.
     :type filename: str
+    :type dtype: str
+    :type columns: list
+    :type points: list
     :Returns: newDataFrame, a pandas Data Frame that contains the cleaned content of the input.
     :rtype: DataFrame
     '''
-    return standardizeColOrder(
-        standardizeColFormat(
-            standardizeUnits(
-                importTemaData(filename)
-            )
-        )
-    )
+    with open(filename, 'rb') as csvfile:
+        headers = readTemaHeader(csvfile)
+        plan = getCleanImportPlan(headers)
+        usecols = None
+        if columns is not None or points is not None:
+            usecols = selectTemaColumns(headers,columns,points)
+            plan = selectCleanImportPlan(plan,usecols)
+        rawDataframe = readTemaBody(csvfile,headers,usecols=usecols,dtype=dtype)
+    newDataframe = applyCleanImportPlan(rawDataframe,plan)
+    buildSegmentIndex(newDataframe)
+    return newDataframe
 
-    
+def _cleanImportTemaFile(filename,dtype='float64'):
+    #worker for cleanImportTemaDirectory - report failures instead of raising so one bad file doesn't stop the batch
+    try:
+        return (cleanImportTemaData(filename,dtype),None)
+    except Exception as error:
+        return (None,type(error).__name__+': '+str(error))
+
+@_profiledStage
+def cleanImportTemaDirectory(path,workers=None,concat=False,pattern='*.txt',dtype='float64'):
+    '''
+    Imports and cleans every TEMA file in a directory (or matching a glob) with cleanImportTemaData, spreading the files across a pool of worker processes. Files that fail to import are reported rather than stopping the batch.
+
+    :param path: A directory containing TEMA .txt files, or a glob pattern matching them (i.e. campaign/shot*.txt).
+    :param workers: The number of worker processes. Default is None, which uses one process per CPU. If 1, the files are imported in the current process.
+    :param concat: Determines whether the cleaned files are returned as a single DataFrame. If true, the files are stacked with their file name as an extra 'file' level on the row index. If false, a dictionary of DataFrames keyed by file name is returned. Default is false.
+    :param pattern: The glob pattern used to find TEMA files when path is a directory. Default is '*.txt'.
+    :param dtype: The float type the data is stored as, 'float64' or 'float32' (see cleanImportTemaData). Default is 'float64'.
+    :type path: str
+    :type workers: int
+    :type concat: bool
+    :type pattern: str
+    :type dtype: str
+    :Returns: A tuple of the cleaned data and a dictionary mapping the name of each file that could not be imported to its error message.
+    :rtype: (dict or DataFrame,dict)
+    '''
+    if os.path.isdir(path):
+        filenames = sorted(glob.glob(os.path.join(path,pattern)))
+    else:
+        filenames = sorted(glob.glob(path))
+
+    if workers == 1 or len(filenames) < 2:
+        results = list(map(partial(_cleanImportTemaFile,dtype=dtype),filenames))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(partial(_cleanImportTemaFile,dtype=dtype),filenames))
+
+    dataframes = {}
+    failures = {}
+    for filename,(dataframe,error) in zip(filenames,results):
+        if error is None:
+            dataframes[filename] = dataframe
+        else:
+            failures[filename] = error
+
+    if concat:
+        if not dataframes:
+            return (pd.DataFrame(),failures)
+        return (pd.concat(dataframes,names=['file',None]),failures)
+    return (dataframes,failures)
+
+def cleanImportTemaDataChunks(filename,chunksize=100000,dtype='float64'):
+    '''
+    Yields the cleaned, more intuitively labeled TEMA data file as a series of Pandas dataframes of at most chunksize rows. Each chunk goes through the same unit, format and order standardization as cleanImportTemaData, so memory use is bounded by the chunk size rather than the file size. Pass the result to exportTemaData to clean and write out a file in a single streaming pass.
+
+    :param filename: The name of the TEMA .txt file you wish to import. Note that the imported file should be a tab delineated text file.
+    :param chunksize: The maximum number of rows in each chunk. Default is 100000.
+    :param dtype: The float type the data is stored as, 'float64' or 'float32' (see cleanImportTemaData). Default is 'float64'.
+    :type filename: str
+    :type chunksize: int
+    :type dtype: str
+    :Returns: An iterator of pandas Data Frames that contain the cleaned content of the input.
+    :rtype: iterator
+    '''
+    with open(filename, 'rb') as csvfile:
+        headers = readTemaHeader(csvfile)
+        plan = getCleanImportPlan(headers)
+        with readTemaBody(csvfile,headers,chunksize=chunksize,dtype=dtype) as chunks:
+            for chunk in chunks:
+                yield applyCleanImportPlan(chunk,plan)
+
+@_profiledStage
+def resampleTemaData(dataframe,time,method='linear',maxGap=None,offset=0):
+    '''
+    Returns the TEMA data interpolated onto a new time base, i.e. to bring a camera recorded at a different frame rate onto the time base of another. Every column is interpolated at once with vectorized weights. Values are only interpolated between two valid samples, so NaN gaps (tracker dropouts) stay NaN rather than being bridged, and new times outside the data are NaN.
+
+    :param dataframe: Pandas DataFrame of cleaned TEMA data. The first column is assumed to be time, in increasing order.
+    :param time: The new time of each sample, in the units of the time column.
+    :param method: The interpolation method, 'linear' or 'nearest'. Default is 'linear'.
+    :param maxGap: If given, new times that fall in a step of the time column longer than this (i.e. dropped frames) are NaN. Default is None.
+    :param offset: Added to the time column before resampling, to correct the synchronization between cameras or runs. Default is 0.
+    :type dataframe: DataFrame
+    :type time: array
+    :type method: str
+    :type maxGap: float
+    :type offset: float
+    :Returns: newDataFrame, a pandas DataFrame with the new time as its first column and the interpolated data in the other columns.
+    :rtype: DataFrame
+    '''
+    if not method in ['linear','nearest']:
+        raise ValueError('Unknown interpolation method: '+str(method))
+    newTime = np.asarray(time,dtype='float64')
+    oldTime = dataframe.iloc[:,0].to_numpy(dtype='float64')+offset
+    #rows without a time cannot be placed
+    hasTime = ~np.isnan(oldTime)
+    oldTime = oldTime[hasTime]
+    values = dataframe.iloc[hasTime,1:].to_numpy(dtype='float64') if not hasTime.all() else dataframe.iloc[:,1:].to_numpy(dtype='float64')
+    storageType = getStorageType(dataframe,dataframe.columns[1:])
+
+    #the sample before each new time, and how far along the step to the next sample the new time is
+    newValues = np.full((len(newTime),values.shape[1]),np.nan)
+    if len(oldTime) > 1:
+        before = np.clip(np.searchsorted(oldTime,newTime,side='right')-1,0,len(oldTime)-2)
+        step = oldTime[before+1]-oldTime[before]
+        with np.errstate(divide='ignore',invalid='ignore'):
+            weight = (newTime-oldTime[before])/step
+        inside = (weight >= 0) & (weight <= 1)
+        if maxGap is not None:
+            inside &= step <= maxGap
+        before, weight = before[inside], weight[inside]
+        if method == 'nearest':
+            newValues[inside] = values[before+(weight > 0.5)]
+        else:
+            #new times that land on a sample take its value, even when the next sample is NaN
+            beforeValues = values[before]
+            interpolated = beforeValues+weight[:,np.newaxis]*(values[before+1]-beforeValues)
+            newValues[inside] = np.where(weight[:,np.newaxis] == 0,beforeValues,interpolated)
+            onNext = weight == 1
+            newValues[np.flatnonzero(inside)[onNext]] = values[before[onNext]+1]
+    elif len(oldTime) == 1:
+        newValues[newTime == oldTime[0]] = values[0]
+
+    newDataframe = pd.DataFrame(newValues.astype(storageType,copy=False),columns=dataframe.columns[1:])
+    newDataframe.insert(0,dataframe.columns[0],newTime)
+    return newDataframe
+
+@_profiledStage
+def alignTemaData(dataframes,time=None,rate=None,offsets=None,method='linear',maxGap=None,concat=False):
+    '''
+    Puts several cleaned TEMA DataFrames, such as the exports of synchronized cameras with different frame rates, onto a shared time base with resampleTemaData.
+
+    :param dataframes: A dictionary of Pandas DataFrames of cleaned TEMA data (such as the one returned by cleanImportTemaDirectory), or a list of them.
+    :param time: The shared time of each sample. Default is None, which spans the time the DataFrames overlap at the highest frame rate among them (or at rate).
+    :param rate: The sample rate of the shared time base, in samples per unit of time, used when time is None. Default is None, which uses the highest frame rate among the DataFrames.
+    :param offsets: The time added to each DataFrame's time column to synchronize them, as a dictionary with the same keys as dataframes or a list. Default is None, which uses no offsets.
+    :param method: The interpolation method, 'linear' or 'nearest'. Default is 'linear'.
+    :param maxGap: If given, shared times that fall in a step of a DataFrame's time column longer than this are NaN for that DataFrame. Default is None.
+    :param concat: Determines whether the aligned DataFrames are returned as a single DataFrame. If true, their columns are placed side by side with their key as an extra 'file' level on the column index. Default is false.
+    :type dataframes: dict
+    :type time: array
+    :type rate: float
+    :type offsets: dict
+    :type method: str
+    :type maxGap: float
+    :type concat: bool
+    :Returns: A dictionary (or list) of the aligned DataFrames, which all share the same time column, or a single DataFrame if concat is true.
+    :rtype: dict or DataFrame
+    '''
+    keys = list(dataframes.keys()) if isinstance(dataframes,dict) else list(range(len(dataframes)))
+    frames = [dataframes[key] for key in keys]
+    if offsets is None:
+        offsets = [0]*len(frames)
+    else:
+        offsets = [offsets[key] for key in keys]
+    if time is None:
+        times = [frame.iloc[:,0].to_numpy(dtype='float64')+offset for frame,offset in zip(frames,offsets)]
+        start = max(np.nanmin(frameTime) for frameTime in times)
+        stop = min(np.nanmax(frameTime) for frameTime in times)
+        if rate is None:
+            #the smallest typical step, so no camera is undersampled
+            rate = 1/min(np.nanmedian(np.diff(frameTime)) for frameTime in times)
+        #whole steps from the start, so the time base does not pick up rounding error from repeated addition
+        time = np.minimum(start+np.arange(int(np.floor((stop-start)*rate+1e-9))+1)/rate,stop)
+    aligned = [resampleTemaData(frame,time,method,maxGap,offset) for frame,offset in zip(frames,offsets)]
+    if concat:
+        return pd.concat(aligned,axis='columns',keys=keys,names=['file',None])
+    if isinstance(dataframes,dict):
+        return dict(zip(keys,aligned))
+    return aligned
@@ -0,0 +1,106 @@
+import io
+import mmap
+import numpy as np
+import pandas as pd
+from temaanalyzer import temafunctions
+
+
+class TemaIndex:
+    '''
+    Random access to time windows of a long TEMA file, i.e. the few milliseconds around an impact in a recording of minutes. The file is memory-mapped and scanned once for the byte offset and time of every stride-th row. After that a query only parses the rows between the two indexed rows either side of the window, and returns them cleaned as cleanImportTemaData would, with the same names, units and row numbers, i.e.
+
+        with TemaIndex('run.txt') as index:
+            impact = index.query(1.250,1.255)
+
+    The scan only looks for line endings (skipping blank lines, as the parser does), so it is much faster than parsing the file. For the same reason, the order of the time column is only checked at the indexed rows when the index is built; rows between them are checked by each query, which raises a ValueError if the rows it parses are out of order. Cleaned data cached with cleanImportTemaDataCached is already memory-mapped; see cleanImportTemaWindowCached to query it instead.
+
+    :param filename: The name of the TEMA .txt file. The time column must be in increasing order.
+    :param stride: The number of rows between indexed rows. Queries parse up to about two strides of rows outside the window. Default is 1000.
+    :param dtype: The float type the data is stored as, 'float64' or 'float32' (see cleanImportTemaData). Default is 'float64'.
+    :type filename: str
+    :type stride: int
+    :type dtype: str
+    '''
+    def __init__(self,filename,stride=1000,dtype='float64'):
+        self.filename = filename
+        self.stride = stride
+        self.dtype = dtype
+        with open(filename,'rb') as temaFile:
+            self._map = mmap.mmap(temaFile.fileno(),0,access=mmap.ACCESS_READ)
+        self.headers = temafunctions.readTemaHeader(self._map)
+        self.plan = temafunctions.getCleanImportPlan(self.headers)
+        self.offsets, self.rows = self._scanRows(self._map.tell())
+        #the time of each indexed row, in the units of the cleaned time column
+        self.times = np.array([float(self._map[offset:self._map.find(b'\t',offset)]) for offset in self.offsets])*self.plan.scale[0]
+        if np.any(np.diff(self.times) < 0):
+            raise ValueError('The time column of '+str(filename)+' is not in increasing order')
+
+    def _scanRows(self,dataStart,blockSize=1<<26):
+        #the offset of every stride-th row, found from the line endings a block of the file at a time
+        size = len(self._map)
+        data = np.frombuffer(self._map,dtype='uint8')
+        offsets = []
+        rows = 0
+        for blockStart in range(dataStart,size,blockSize):
+            block = data[blockStart:min(blockStart+blockSize,size)]
+            rowStarts = np.flatnonzero(block == ord('\n'))+blockStart+1
+            if blockStart == dataStart:
+                rowStarts = np.concatenate(([dataStart],rowStarts))
+            #a line ending at the very end of the file doesn't start a row, and neither do blank lines, which the parser skips
+            rowStarts = rowStarts[rowStarts < size]
+            firstBytes = data[rowStarts]
+            blank = (firstBytes == ord('\n')) | ((firstBytes == ord('\r')) & (data[np.minimum(rowStarts+1,size-1)] == ord('\n')))
+            rowStarts = rowStarts[~blank]
+            rowNumbers = np.arange(rows,rows+len(rowStarts))
+            offsets.append(rowStarts[rowNumbers % self.stride == 0])
+            rows += len(rowStarts)
+            del block, firstBytes
+        del data
+        return (np.concatenate(offsets) if offsets else np.array([],dtype='int64')), rows
+
+    def query(self,start,stop,columns=None,points=None):
+        '''
+        Returns the cleaned rows whose time is in a window.
+
+        :param start: The start of the window, in the units of the cleaned time column (seconds).
+        :param stop: The end of the window, included, in the same units.
+        :param columns: If given, only these columns (and time) are parsed (see selectTemaColumns). Default is None.
+        :param points: If given, only the columns of these tracked point numbers (and time, and any columns) are parsed. Default is None.
+        :type start: float
+        :type stop: float
+        :type columns: list
+        :type points: list
+        :Returns: newDataFrame, a pandas DataFrame of the cleaned rows in the window, numbered by their row in the file.
+        :rtype: DataFrame
+        '''
+        #the indexed rows either side of the window, one further out so rounding of the time units cannot miss a row
+        first = max(np.searchsorted(self.times,start,side='right')-2,0)
+        last = np.searchsorted(self.times,stop,side='right')+1
+        end = self.offsets[last] if last < len(self.offsets) else len(self._map)
+        plan = self.plan
+        usecols = None
+        if columns is not None or points is not None:
+            usecols = temafunctions.selectTemaColumns(self.headers,columns,points)
+            plan = temafunctions.selectCleanImportPlan(plan,usecols)
+        rawDataframe = temafunctions.readTemaBody(io.BytesIO(self._map[self.offsets[first]:end]),self.headers,usecols=usecols,dtype=self.dtype)
+        rawDataframe.index = pd.RangeIndex(first*self.stride,first*self.stride+len(rawDataframe))
+        newDataframe = temafunctions.applyCleanImportPlan(rawDataframe,plan)
+        time = newDataframe.iloc[:,0]
+        #only the indexed rows were checked at construction, so the rows parsed around the window are checked here
+        if np.any(np.diff(time.to_numpy()) < 0):
+            raise ValueError('The time column of '+str(self.filename)+' is not in increasing order around the window')
+        newDataframe = newDataframe[(time >= start) & (time <= stop)]
+        temafunctions.buildSegmentIndex(newDataframe)
+        return newDataframe
+
+    def close(self):
+        '''
+        Closes the memory map of the file.
+        '''
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exception):
+        self.close()
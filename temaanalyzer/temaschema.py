@@ -0,0 +1,203 @@
+import csv
+import os
+import re
+from collections import namedtuple
+from functools import lru_cache
+from temaanalyzer.temaunits import getUnitConversion, unitCaches
+
+
+#the order of keys in these dictionaries determines the order in which columns appear
+positionStrings = ['xPosition','yPosition','absPosition']
+angleStrings = ['Angle']
+distanceStrings = ['xInterPointDistance','yInterPointDistance','absInterPointDistance']
+velocityStrings = ['xVelocity','yVelocity','absVelocity']
+angularVelocityStrings = ['AngularVelocity']
+interPointVelocityStrings = ['xInterPointVelocity','yInterPointVelocity','absInterPointVelocity']
+accelerationStrings = ['xAcceleration','yAcceleration','absAcceleration']
+angularAccelerationStrings = ['AngularAcceleration']
+jerkStrings = ['xJerk','yJerk','absJerk']
+angularJerkStrings = ['AngularJerk']
+measurementDict = {'Position':positionStrings, 'Angle':angleStrings, 'InterPointDistance':distanceStrings, 'Velocity':velocityStrings, 'AngularVelocity':angularVelocityStrings, 'InterPointVelocity':interPointVelocityStrings, 'Acceleration':accelerationStrings, 'AngularAcceleration':angularAccelerationStrings, 'Jerk':jerkStrings, 'AngularJerk':angularJerkStrings}
+#the place of each measurement and of each of its variants in the column order
+measurementRanks = {measurement:rank for rank,measurement in enumerate(measurementDict)}
+variantRanks = {string:rank for strings in measurementDict.values() for rank,string in enumerate(strings)}
+#the time derivative of each measurement
+derivativeDict = dict(zip(positionStrings+velocityStrings+accelerationStrings+angleStrings+angularVelocityStrings+angularAccelerationStrings+distanceStrings,velocityStrings+accelerationStrings+jerkStrings+angularVelocityStrings+angularAccelerationStrings+angularJerkStrings+interPointVelocityStrings))
+
+#construct dictionaries to match substrings in the original TEMA name to substrings in the new name
+componentPatterns = {' y':'y', ' x':'x', ' abs':'abs'}
+expressionPatterns = {'angular speed':'AngularVelocity', 'Angle':'Angle', 'Velocity':'Velocity', 'Point':'Position', 'Time':'Time', 'Distance':'InterPointDistance'}
+
+#compiled column name patterns, shared by every stage
+unitPattern = re.compile('\\[.+\\]')
+colNumPattern = re.compile('#[0-9]+')
+ratePattern = re.compile('[^(\\[.*\\])]*')
+standardNamePattern = re.compile('(x|y|abs)?(AngularVelocity|AngularAcceleration|AngularJerk|InterPointDistance|InterPointVelocity|Position|Velocity|Acceleration|Jerk|Angle|Time)([0-9]*)(\\[.+\\])?')
+
+#the measurements that belong to a tracked point, so a point selection picks them up
+pointExpressions = ['Position','Velocity','Acceleration','Jerk']
+
+#the parsed form of a single column name
+TemaColumn = namedtuple('TemaColumn', ['name','unitString','unit','numeratorUnit','denominatorUnit','component','expression','index','isStandard','formattedName'])
+#what scanTemaFile finds out about a file from its header
+TemaFileInfo = namedtuple('TemaFileInfo', ['filename','headers','schema','points','measurements','units','fileSize','rows','exactRows'])
+
+@lru_cache(maxsize=None)
+def parseColumnName(column):
+    '''
+    Parses a single column name, either as exported by TEMA (i.e. Default/Point#1 x[mm]) or in the standardized format (i.e. xPosition1[m]). Results are cached, so each distinct name is only parsed once.
+
+    :param column: The column name to parse.
+    :type column: str
+    :Returns: A TemaColumn named tuple with the name, unit string (including brackets), unit, numerator and denominator units, component (x, y, abs), expression (Position, Velocity, etc), point number, whether the name is already in the standardized format and the name in the standardized format.
+    :rtype: TemaColumn
+    '''
+    #extract the unit strings
+    unitString = unitPattern.findall(column)
+    unitString = unitString[-1] if unitString else ''
+    unit = unitString.strip('[]')
+    if '/' in unit:
+        #if the unit is a rate, split it into the units on either side of the rate
+        numeratorUnit = unit.rpartition('/')[0].strip('/')
+        denominatorUnit = unit.partition('/')[2].strip('/')
+    else:
+        numeratorUnit = unit
+        denominatorUnit = ''
+
+    standardName = standardNamePattern.fullmatch(column)
+    if standardName:
+        #the name is already standardized, so just split it into its parts
+        component = standardName.group(1) or ''
+        expression = standardName.group(2)
+        index = standardName.group(3)
+        isStandard = True
+    else:
+        colNum = colNumPattern.findall(column)
+        index = colNum[-1].strip('#') if colNum else ''
+
+        component = ''
+        for componentString in componentPatterns.keys():
+            if componentString in column:
+                component = componentPatterns[componentString]
+                break
+
+        expression = 'Unknown'
+        for expressionString in expressionPatterns.keys():
+            if expressionString in column:
+                expression = expressionPatterns[expressionString]
+                break
+        isStandard = False
+
+    return TemaColumn(column,unitString,unit,numeratorUnit,denominatorUnit,component,expression,index,isStandard,component+expression+index+unitString)
+
+@lru_cache(maxsize=256)
+def _getColumnSchema(columns):
+    return tuple(parseColumnName(col) for col in columns)
+
+def getColumnSchema(columns):
+    '''
+    Returns the parsed schema of a list of column names. Schemas are cached by the full list of names, so a second file with the same tracker layout as an earlier one skips header parsing entirely.
+
+    :param columns: The column names to parse, i.e. the columns of a DataFrame.
+    :type columns: list
+    :Returns: A tuple of TemaColumn named tuples, one per column and in the same order.
+    :rtype: tuple
+    '''
+    return _getColumnSchema(tuple(columns))
+
+@lru_cache(maxsize=None)
+def getColumnUnitConversion(column):
+    '''
+    Returns the name a column will have once its units have been standardized and the factor that converts its data to those units.
+
+    :param column: The column name, including its unit string.
+    :type column: str
+    :Returns: A tuple of the new column name and the scalar multiplier for the column data.
+    :rtype: (str,float)
+    '''
+    info = parseColumnName(column)
+    if not info.unitString:
+        return (column,1)
+    standardUnit, unitConversion = getUnitConversion(info.unit)
+    return (column.replace(info.unitString,'['+standardUnit+']'),unitConversion)
+
+def readTemaHeader(csvfile):
+    '''
+    Reads the three header rows of a TEMA file from an open binary file handle and stitches them into a list of column names. The handle is left positioned at the first data row.
+
+    :param csvfile: A TEMA .txt file opened in binary mode and positioned at the start of the file.
+    :type csvfile: file
+    :Returns: headers, a list of the raw TEMA column names, including the empty trailing column.
+    :rtype: list
+    '''
+    #grab the first three rows
+    rows = csv.reader((csvfile.readline().decode('latin-1') for i in range(3)), delimiter='\t')
+    firstRow = next(rows)
+    secondRow = next(rows)
+    thirdRow = next(rows)
+    #and stitch them together in a single string
+    return [firstRow[0] + ' ' + thirdRow[0]] + list(map(lambda x,y: x + ' ' + y,firstRow[1:],secondRow[1:]))
+
+def scanTemaFile(filename,sampleBytes=65536):
+    '''
+    Inspects a TEMA file without parsing its data: the header is parsed into its schema, and the number of rows is estimated from the length of the rows at the start of the file. Only the header and sampleBytes of data are read, however long the file is, and pandas is not needed.
+
+    :param filename: The name of the TEMA .txt file.
+    :param sampleBytes: How much of the data to read for the row estimate. Files whose data fits in this are counted exactly. Default is 65536.
+    :type filename: str
+    :type sampleBytes: int
+    :Returns: A TemaFileInfo named tuple of the file name, the raw headers (without the empty trailing column), their schema (see getColumnSchema), the tracked point numbers, a dictionary mapping each measurement (i.e. xPosition, absVelocity, Angle) to its numbers, a dictionary mapping each column to its unit, the file size in bytes, the number of rows and whether that number is exact rather than estimated.
+    :rtype: TemaFileInfo
+    '''
+    with open(filename,'rb') as csvfile:
+        headers = [col for col in readTemaHeader(csvfile) if col != ' ']
+        dataStart = csvfile.tell()
+        sample = csvfile.read(sampleBytes)
+    fileSize = os.path.getsize(filename)
+    exactRows = dataStart+len(sample) >= fileSize
+    if exactRows:
+        rows = sample.count(b'\n')+(1 if sample and not sample.endswith(b'\n') else 0)
+    else:
+        #the average length of the complete rows in the sample, over the rest of the file
+        sampleRows = sample.count(b'\n')
+        rows = round((fileSize-dataStart)*sampleRows/(sample.rfind(b'\n')+1)) if sampleRows else 0
+    schema = getColumnSchema(headers)
+    measurements = {}
+    for info in schema[1:]:
+        if info.index:
+            measurements.setdefault(info.component+info.expression,set()).add(int(info.index))
+    points = sorted({int(info.index) for info in schema[1:] if info.index and info.expression in pointExpressions})
+    units = {info.name:info.unit for info in schema}
+    return TemaFileInfo(filename,headers,schema,points,{measurement:sorted(indices) for measurement,indices in measurements.items()},units,fileSize,rows,exactRows)
+
+def selectTemaColumns(headers,columns=None,points=None):
+    '''
+    Returns the positions of the raw columns of a TEMA file that a selection of columns and points needs, i.e. to pass to readTemaBody as usecols so the rest are never parsed. The time column is always selected.
+
+    :param headers: The raw TEMA column names, as returned by readTemaHeader.
+    :param columns: The names of the columns to select, either raw (i.e. Default/Point#1 x[mm]) or as cleanImportTemaData names them (i.e. xPosition1[m]). Default is None, which selects no columns by name.
+    :param points: The numbers of the tracked points to select, with all of their position, velocity, acceleration and jerk columns. Default is None, which selects no points.
+    :type headers: list
+    :type columns: list
+    :type points: list
+    :Returns: The selected positions in headers, in order.
+    :rtype: list
+    '''
+    columns = set(columns or [])
+    points = {str(point) for point in points or []}
+    positions = [0]
+    found = set()
+    for position,col in enumerate(headers[1:],1):
+        if col == ' ':
+            continue
+        info = parseColumnName(col)
+        cleanName = parseColumnName(getColumnUnitConversion(col)[0]).formattedName
+        names = columns & {col,cleanName}
+        if names or (info.index in points and info.expression in pointExpressions):
+            positions.append(position)
+            found |= names
+    if columns-found:
+        raise KeyError('Columns not found: '+', '.join(sorted(columns-found)))
+    return positions
+
+unitCaches.append(getColumnUnitConversion)
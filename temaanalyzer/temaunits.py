@@ -0,0 +1,66 @@
+import math
+import re
+from functools import lru_cache
+
+
+#the standard unit and scale factor of each unit TEMA exports - use registerUnit to add units
+unitRegistry = {'s':('s',1), 'ms':('s',.001), 'us':('s',.000001), 'm':('m',1), 'mm':('m',.001), 'cm':('m',.01), 'rad':('rad',1), chr(176):('rad',math.pi/180), 'degrees':('rad',math.pi/180), 'pixels':('px',1), 'px':('px',1)}
+#a single term of a compound unit, i.e. mm, s^2 or s²
+unitTermPattern = re.compile('(.*?)(?:\\^(-?[0-9]+)|(['+chr(178)+chr(179)+']))?')
+
+#other caches of results worked out from the registry, cleared along with getUnitConversion's when a unit is registered
+unitCaches = []
+
+def getConversion(unit):
+    '''
+    Returns the standard unit a single unit converts to, and the factor that converts data to it. Units that are not in the unit registry are left as they are.
+
+    :param unit: The unit prefix for a particular column extracted from the input file.
+    :type unit: str
+
+    :return: A tuple containing the string abbreviation of the standard unit we are converting to and a scalar multiplier that will convert the data in the DataFrame from the original unit to the standard unit.
+    :rtype: (unit,float)
+    '''
+    return unitRegistry.get(unit,(unit,1))
+
+def registerUnit(unit,standardUnit,scaleFactor):
+    '''
+    Adds a unit to the unit registry, or replaces one that is already there, so that standardizeUnits and cleanImportTemaData convert it - for example a camera calibration, registerUnit('cam1px','m',0.00042). Compound units made from registered units, such as cam1px/s, are converted too.
+
+    :param unit: The unit as it appears in the square brackets of the TEMA column name.
+    :param standardUnit: The unit the data is converted to.
+    :param scaleFactor: The number the data is multiplied by to convert it to standardUnit.
+    :type unit: str
+    :type standardUnit: str
+    :type scaleFactor: float
+    :returns: None.
+    '''
+    unitRegistry[unit] = (standardUnit,scaleFactor)
+    #conversions worked out with the old registry are stale
+    getUnitConversion.cache_clear()
+    for cache in unitCaches:
+        cache.cache_clear()
+
+@lru_cache(maxsize=None)
+def getUnitConversion(unit):
+    '''
+    Returns the standard unit a unit converts to, and the factor that converts data to it. Handles compound units made of registered units, divided by /, raised to powers with ^ or ², i.e. mm/ms, px/s/s, °/s or mm/s^2. Results are cached per unit string.
+
+    :param unit: The unit, without the square brackets.
+    :type unit: str
+    :return: A tuple containing the standard unit and the scalar multiplier that converts data to it.
+    :rtype: (str,float)
+    '''
+    standardTerms = []
+    unitConversion = 1
+    for position,term in enumerate(unit.split('/')):
+        base, power, superscript = unitTermPattern.fullmatch(term).groups()
+        exponent = int(power) if power else {chr(178):2, chr(179):3}.get(superscript,1)
+        standardBase, termConversion = getConversion(base)
+        standardTerms.append(term.replace(base,standardBase,1) if base else term)
+        #the first term is the numerator, every other term divides it
+        if position == 0:
+            unitConversion *= termConversion**exponent
+        else:
+            unitConversion /= termConversion**exponent
+    return ('/'.join(standardTerms),unitConversion)
@@ -0,0 +1,49 @@
+from temaanalyzer import cli, temafunctions
+import json
+import pytest
+import shutil
+import pandas as pd
+
+testDir = "notebook/temaanalyzer/tests"
+
+
+#tests for main(argv=None)
+def test_main(tmp_path):
+    outputDir = tmp_path / 'out'
+    status = cli.main([testDir+'/velocity*.txt','-o',str(outputDir),'-d','1','-c','xVelocity1[m/s]','-j','2'])
+    assert status == 0
+    newdf = pd.read_csv(outputDir / 'velocityTest1.csv')
+    expected = temafunctions.calculateVelocities(temafunctions.cleanImportTemaData(testDir+'/velocityTest1.txt'))
+    assert list(newdf.columns) == ['Time[s]','xVelocity1[m/s]']
+    assert len(newdf) == len(expected[['Time[s]','xVelocity1[m/s]']].dropna())
+    assert (outputDir / 'velocityTest3.csv').exists()
+
+def test_main_failures(tmp_path,capsys):
+    shutil.copy(testDir+'/pxScaleTest1.txt',tmp_path)
+    (tmp_path / 'broken.txt').write_text('not a TEMA file')
+    status = cli.main([str(tmp_path),'-f','parquet','--scale','1000','-j','1','--report',str(tmp_path / 'report.json')])
+    assert status == 1
+    assert 'FAILED '+str(tmp_path / 'broken.txt') in capsys.readouterr().out
+    report = json.load(open(tmp_path / 'report.json'))
+    assert [result['ok'] for result in report] == [False,True]
+    assert not any('[px]' in column for column in pd.read_parquet(tmp_path / 'pxScaleTest1.parquet').columns)
+
+def test_main_outputCollision(tmp_path,capsys):
+    for directory in ['a','b']:
+        (tmp_path / directory).mkdir()
+        shutil.copy(testDir+'/velocityTest1.txt',tmp_path / directory / 'run.txt')
+    with pytest.raises(SystemExit) as exit:
+        cli.main([str(tmp_path / 'a' / 'run.txt'),str(tmp_path / 'b' / 'run.txt'),'-o',str(tmp_path / 'out')])
+    assert exit.value.code == 2
+    assert 'same file' in capsys.readouterr().err
+    assert not (tmp_path / 'out').exists()
+
+def test_main_invalidArguments(tmp_path,capsys):
+    shutil.copy(testDir+'/velocityTest1.txt',tmp_path / 'run.csv')
+    for argv in [[str(tmp_path / 'run.csv')],[str(tmp_path / 'run.csv'),'-o',str(tmp_path / 'out'),'--meters-per-pixel']]:
+        with pytest.raises(SystemExit) as exit:
+            cli.main(argv)
+        assert exit.value.code == 2
+    errors = capsys.readouterr().err
+    assert 'overwritten' in errors and '--meters-per-pixel needs --scale' in errors
+    assert (tmp_path / 'run.csv').read_bytes() == open(testDir+'/velocityTest1.txt','rb').read()
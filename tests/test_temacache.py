@@ -0,0 +1,86 @@
+from temaanalyzer import temafunctions, temacache
+import os
+import shutil
+import pytest
+
+velocityTest1File = "notebook/temaanalyzer/tests/velocityTest1.txt"
+velocityTest3File = "notebook/temaanalyzer/tests/velocityTest3.txt"
+totalHeaderFile = "notebook/temaanalyzer/tests/TEMATotalHeader.txt"
+
+
+#tests for cleanImportTemaDataCached(filename,useCache=True,cacheDir=None,cacheFormat='npy',maxCacheSize=2**31,hashContents=False)
+def test_cleanImportTemaDataCached(tmp_path):
+    cacheDir = str(tmp_path / 'cache')
+    firstLoad = temacache.cleanImportTemaDataCached(velocityTest1File,cacheDir=cacheDir)
+    secondLoad = temacache.cleanImportTemaDataCached(velocityTest1File,cacheDir=cacheDir)
+    assert sorted(os.listdir(cacheDir)) == sorted([temacache.getCacheKey(velocityTest1File)+extension for extension in ['.npy','.json']])
+    assert secondLoad.equals(firstLoad)
+    assert list(secondLoad.columns) == list(firstLoad.columns)
+    assert secondLoad.attrs['temaSegments'] == firstLoad.attrs['temaSegments']
+
+#npy entries are mapped copy-on-write, so loaded data can be modified without changing the entry
+def test_cleanImportTemaDataCached_writable(tmp_path):
+    cacheDir = str(tmp_path / 'cache')
+    firstLoad = temacache.cleanImportTemaDataCached(velocityTest1File,cacheDir=cacheDir)
+    secondLoad = temacache.cleanImportTemaDataCached(velocityTest1File,cacheDir=cacheDir)
+    secondLoad.iloc[0,1] = 5.0
+    secondLoad.loc[1,'Time[s]'] = 7.0
+    assert secondLoad.iloc[0,1] == 5.0 and secondLoad.loc[1,'Time[s]'] == 7.0
+    assert temacache.cleanImportTemaDataCached(velocityTest1File,cacheDir=cacheDir).equals(firstLoad)
+
+def test_cleanImportTemaDataCached_invalidate(tmp_path):
+    cacheDir = str(tmp_path / 'cache')
+    temaFile = str(tmp_path / 'run.txt')
+    shutil.copy(velocityTest1File,temaFile)
+    temacache.cleanImportTemaDataCached(temaFile,cacheDir=cacheDir)
+    shutil.copy(velocityTest3File,temaFile)
+    os.utime(temaFile,ns=(0,0))
+    dataframe = temacache.cleanImportTemaDataCached(temaFile,cacheDir=cacheDir)
+    assert dataframe.equals(temafunctions.cleanImportTemaData(velocityTest3File))
+    assert len(os.listdir(cacheDir)) == 2
+
+#entries of the same version of a file in other types are kept, so alternating between them keeps hitting the cache
+def test_cleanImportTemaDataCached_dtypes(tmp_path):
+    cacheDir = str(tmp_path / 'cache')
+    temacache.cleanImportTemaDataCached(velocityTest1File,cacheDir=cacheDir)
+    temacache.cleanImportTemaDataCached(velocityTest1File,cacheDir=cacheDir,dtype='float32')
+    assert len(os.listdir(cacheDir)) == 4
+    for dtype in ['float64','float32']:
+        dataframe = temacache.cleanImportTemaDataCached(velocityTest1File,cacheDir=cacheDir,dtype=dtype)
+        assert dataframe.equals(temafunctions.cleanImportTemaData(velocityTest1File,dtype))
+    assert sorted(os.listdir(cacheDir)) == sorted([temacache.getCacheKey(velocityTest1File,dtype=dtype)+extension for dtype in ['float64','float32'] for extension in ['.npy','.json']])
+
+def test_cleanImportTemaDataCached_bypass(tmp_path):
+    cacheDir = str(tmp_path / 'cache')
+    temacache.cleanImportTemaDataCached(velocityTest1File,useCache=False,cacheDir=cacheDir)
+    assert not os.path.exists(cacheDir)
+
+def test_evictTemaCache(tmp_path):
+    cacheDir = str(tmp_path / 'cache')
+    temacache.cleanImportTemaDataCached(velocityTest1File,cacheDir=cacheDir)
+    os.utime(os.path.join(cacheDir,temacache.getCacheKey(velocityTest1File)+'.json'),(0,0))
+    temacache.cleanImportTemaDataCached(velocityTest3File,cacheDir=cacheDir,maxCacheSize=temacache.getCacheSize(cacheDir))
+    assert sorted(os.listdir(cacheDir)) == sorted([temacache.getCacheKey(velocityTest3File)+extension for extension in ['.npy','.json']])
+
+def test_cleanImportTemaDataCached_parquet(tmp_path):
+    pytest.importorskip('pyarrow')
+    cacheDir = str(tmp_path / 'cache')
+    firstLoad = temacache.cleanImportTemaDataCached(velocityTest1File,cacheDir=cacheDir,cacheFormat='parquet')
+    assert temacache.cleanImportTemaDataCached(velocityTest1File,cacheDir=cacheDir,cacheFormat='parquet').equals(firstLoad)
+
+def test_cleanImportTemaDataCached_float32(tmp_path):
+    cacheDir = str(tmp_path / 'cache')
+    firstLoad = temacache.cleanImportTemaDataCached(velocityTest1File,cacheDir=cacheDir,dtype='float32')
+    secondLoad = temacache.cleanImportTemaDataCached(velocityTest1File,cacheDir=cacheDir,dtype='float32')
+    assert secondLoad.equals(firstLoad)
+    assert secondLoad.equals(temafunctions.cleanImportTemaData(velocityTest1File,dtype='float32'))
+    assert temacache.getCacheKey(velocityTest1File,dtype='float32') != temacache.getCacheKey(velocityTest1File)
+
+#tests for cleanImportTemaWindowCached(filename,start,stop,cacheDir=None,maxCacheSize=2**31,hashContents=False,dtype='float64')
+def test_cleanImportTemaWindowCached(tmp_path):
+    dataframe = temafunctions.cleanImportTemaData(totalHeaderFile)
+    time = dataframe['Time[s]']
+    for repeat in range(2):
+        window = temacache.cleanImportTemaWindowCached(totalHeaderFile,time[300],time[400],cacheDir=str(tmp_path))
+        assert window.equals(dataframe.loc[300:400])
+        assert temafunctions.getSegmentIndex(window) == temafunctions.getSegmentIndex(dataframe.loc[300:400].copy())
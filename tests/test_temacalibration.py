@@ -0,0 +1,65 @@
+from temaanalyzer import temafunctions
+from temaanalyzer.temacalibration import PxCalibration, calibratePxToDist, loadCalibration
+import numpy as np
+import pandas as pd
+import os
+import pytest
+
+matrix = np.array([[0.001,0.0002,0.1],[0.00005,0.0012,-0.2],[1e-5,2e-5,1]])
+pixelPoints = np.random.default_rng(0).uniform(0,1000,(20,2))
+
+
+#tests for PxCalibration(model,coefficients,unit='m')
+def test_PxCalibration_fromPoints():
+    worldPoints = np.column_stack(PxCalibration('homography',matrix).transform(pixelPoints[:,0],pixelPoints[:,1]))
+    assert np.allclose(PxCalibration.fromPoints(pixelPoints,worldPoints).coefficients,matrix,rtol=1e-6,atol=1e-12)
+    polynomial = PxCalibration.fromPoints(pixelPoints,worldPoints,model='polynomial',degree=3)
+    assert np.allclose(np.column_stack(polynomial.transform(pixelPoints[:,0],pixelPoints[:,1])),worldPoints,atol=1e-5)
+    with pytest.raises(ValueError):
+        PxCalibration.fromPoints(pixelPoints[:3],worldPoints[:3])
+
+def test_PxCalibration_jacobian():
+    x, y, step = np.array([300.0,700.0]), np.array([400.0,100.0]), 1e-4
+    for calibration in [PxCalibration('homography',matrix),PxCalibration('polynomial',[[0.1,0.001,0.0002,1e-7,0,2e-7],[-0.2,0.00005,0.0012,0,3e-7,0]])]:
+        dXdx, dXdy, dYdx, dYdy = calibration.jacobian(x,y)
+        (xForward,yForward), (xBackward,yBackward) = calibration.transform(x+step,y), calibration.transform(x-step,y)
+        assert np.allclose(dXdx,(xForward-xBackward)/(2*step)) and np.allclose(dYdx,(yForward-yBackward)/(2*step))
+        (xForward,yForward), (xBackward,yBackward) = calibration.transform(x,y+step), calibration.transform(x,y-step)
+        assert np.allclose(dXdy,(xForward-xBackward)/(2*step)) and np.allclose(dYdy,(yForward-yBackward)/(2*step))
+
+def test_loadCalibration(tmp_path):
+    filename = str(tmp_path / 'camera.json')
+    PxCalibration('homography',matrix,unit='mm').save(filename)
+    calibration = loadCalibration(filename)
+    assert calibration is loadCalibration(filename)
+    assert np.allclose(calibration.coefficients,matrix) and calibration.unit == 'mm'
+    PxCalibration('homography',np.eye(3)).save(filename)
+    os.utime(filename,ns=(0,0))
+    assert np.allclose(loadCalibration(filename).coefficients,np.eye(3))
+
+
+#tests for calibratePxToDist(dataframe,calibration,points=None)
+def test_calibratePxToDist():
+    time = np.linspace(0,1,2001)
+    dataframe = pd.DataFrame({'Time[s]':time,'xPosition1[px]':500+200*np.sin(3*time),'yPosition1[px]':400+100*time**2,'absPosition1[px]':0.0,'xPosition2[m]':time,
+        'xVelocity1[px/s]':600*np.cos(3*time),'yVelocity1[px/s]':200*time,'absVelocity1[px/s]':0.0})
+    calibration = PxCalibration('homography',matrix)
+    calibrated = calibratePxToDist(dataframe,calibration)
+    assert list(calibrated.columns) == ['Time[s]','xPosition1[m]','yPosition1[m]','absPosition1[m]','xPosition2[m]','xVelocity1[m/s]','yVelocity1[m/s]','absVelocity1[m/s]']
+    assert np.allclose(calibrated['xPosition1[m]'],calibration.transform(dataframe['xPosition1[px]'],dataframe['yPosition1[px]'])[0])
+    assert np.allclose(calibrated['absPosition1[m]'],np.hypot(calibrated['xPosition1[m]'],calibrated['yPosition1[m]']))
+    #the mapped velocities are the velocities of the mapped positions
+    velocities = temafunctions.calculateVelocities(calibrated[['Time[s]','xPosition1[m]','yPosition1[m]']])
+    assert np.allclose(velocities['xVelocity1[m/s]'][5:-5],calibrated['xVelocity1[m/s]'][5:-5],rtol=1e-4)
+    assert np.allclose(velocities['yVelocity1[m/s]'][5:-5],calibrated['yVelocity1[m/s]'][5:-5],rtol=1e-4)
+    #one calibration per point, and float32 stays float32
+    dataframe = dataframe.astype({column:'float32' for column in dataframe.columns[1:]})
+    calibrated = calibratePxToDist(dataframe,{1:PxCalibration('homography',np.eye(3),unit='mm')})
+    assert calibrated['xPosition1[mm]'].dtype == 'float32' and np.allclose(calibrated['xPosition1[mm]'],dataframe['xPosition1[px]'])
+    with pytest.raises(ValueError):
+        calibratePxToDist(dataframe,calibration,points=[2])
+    #each velocity keeps its own time unit
+    dataframe = dataframe.rename(columns={'xPosition2[m]':'xPosition2[px]'}).assign(**{'yPosition2[px]':1.0,'xVelocity2[px/ms]':1.0,'yVelocity2[px/ms]':1.0})
+    calibrated = calibratePxToDist(dataframe,PxCalibration('homography',np.eye(3)))
+    assert 'xVelocity1[m/s]' in calibrated.columns and 'xVelocity2[m/ms]' in calibrated.columns
+    assert calibrated['xPosition1[m]'].dtype == 'float32' and calibrated['yPosition2[m]'].dtype == 'float64'
@@ -0,0 +1,42 @@
+from temaanalyzer import temafunctions
+from temaanalyzer.temadataset import TemaDataset
+import numpy as np
+import pytest
+
+filename = "notebook/temaanalyzer/tests/TEMATotalHeader.txt"
+
+
+#tests for TemaDataset(source,clean=True)
+def test_TemaDataset_collect():
+    assert TemaDataset(filename).collect().equals(temafunctions.cleanImportTemaData(filename))
+
+def test_TemaDataset_raw():
+    dataset = TemaDataset(filename,clean=False).standardizeUnits().standardizeColFormat().standardizeColOrder()
+    chained = temafunctions.standardizeColOrder(temafunctions.standardizeColFormat(temafunctions.standardizeUnits(temafunctions.importTemaData(filename))))
+    assert dataset.columns == list(chained.columns)
+    assert np.array_equal(dataset.collect().to_numpy(),chained.to_numpy(),equal_nan=True)
+
+def test_TemaDataset_duplicateNames(tmp_path):
+    duplicateFile = tmp_path / 'duplicates.txt'
+    duplicateFile.write_text('Time\tNote A\tNote B\t\n\t\t\t\n[ms]\t1\t1\t\n0\t1\t10\t\n1\t2\t20\t\n')
+    dataset = TemaDataset(str(duplicateFile),clean=False).standardizeUnits().standardizeColFormat().standardizeColOrder()
+    assert dataset.collect().to_numpy().tolist() == [[0,1,10],[0.001,2,20]]
+    assert TemaDataset(str(duplicateFile)).collect().equals(temafunctions.cleanImportTemaData(duplicateFile))
+
+def test_TemaDataset_chain():
+    dataframe = temafunctions.cleanImportTemaData(filename)
+    dataframe = temafunctions.scalePxToDist(dataframe,1000,inPlace=False)
+    dataframe = temafunctions.calculateVelocities(dataframe)
+    dataframe = temafunctions.changeColUnit(dataframe,'mm/s',['xVelocity2[m/s]'],1000)
+    dataframe = temafunctions.stripColUnit(dataframe)
+    dataset = TemaDataset(filename).scalePxToDist(1000,inPlace=False).calculateVelocities().changeColUnit('mm/s',['xVelocity2[m/s]'],1000).stripColUnit()
+    assert dataset.columns == list(dataframe.columns)
+    assert np.allclose(dataset.collect().to_numpy(),dataframe.to_numpy(),equal_nan=True)
+
+def test_TemaDataset_select():
+    dataset = TemaDataset(filename).calculateVelocities()
+    dataframe = dataset.collect(['xVelocity2[m/s]'])
+    assert list(dataframe.columns) == ['Time[s]','xVelocity2[m/s]']
+    assert np.allclose(dataframe['xVelocity2[m/s]'],temafunctions.calculateVelocities(temafunctions.cleanImportTemaData(filename))['xVelocity2[m/s]'],equal_nan=True)
+    with pytest.raises(KeyError):
+        dataset.select(['xVelocity99[m/s]'])
@@ -0,0 +1,43 @@
+from temaanalyzer import temafunctions
+from temaanalyzer.temafollow import TemaFollower
+import asyncio
+import numpy as np
+import pandas as pd
+
+filename = "notebook/temaanalyzer/tests/TEMATotalHeader.txt"
+
+
+def writeInPieces(follower,target,pieces):
+    #append the file a few bytes at a time, polling after each piece
+    data = open(filename,'rb').read()
+    rows = []
+    for start in range(0,len(data),len(data)//pieces+1):
+        with open(target,'ab') as temaFile:
+            temaFile.write(data[start:start+len(data)//pieces+1])
+        rows.append(follower.poll())
+    rows.append(follower.flush())
+    return pd.concat([row for row in rows if row is not None])
+
+#tests for TemaFollower(filename,clean=True,velocities=False,columns=None,scheme='central',dtype='float64')
+def test_TemaFollower_poll(tmp_path):
+    target = tmp_path / 'growing.txt'
+    target.touch()
+    follower = TemaFollower(str(target))
+    assert follower.poll() is None
+    assert writeInPieces(follower,target,7).equals(temafunctions.cleanImportTemaData(filename))
+
+def test_TemaFollower_velocities(tmp_path):
+    target = tmp_path / 'growing.txt'
+    target.touch()
+    newdf = writeInPieces(TemaFollower(str(target),velocities=True),target,13)
+    expected = temafunctions.calculateVelocities(temafunctions.cleanImportTemaData(filename))
+    assert list(newdf.columns) == list(expected.columns)
+    assert np.array_equal(newdf.to_numpy(),expected.to_numpy(),equal_nan=True)
+
+def test_TemaFollower_followAsync(tmp_path):
+    target = tmp_path / 'finished.txt'
+    target.write_bytes(open(filename,'rb').read())
+    async def collect():
+        return [rows async for rows in TemaFollower(str(target)).followAsync(interval=0.01,timeout=0.05)]
+    assert pd.concat(asyncio.run(collect())).equals(temafunctions.cleanImportTemaData(filename))
+    assert pd.concat(TemaFollower(str(target)).follow(interval=0.01,timeout=0.05)).equals(temafunctions.cleanImportTemaData(filename))
@@ -1,7 +1,11 @@
 from temaanalyzer import temafunctions
 import os
+import shutil
+import gzip
 import pandas as pd
 import numpy as np
+import pytest
+import math
 
 filename = "notebook/temaanalyzer/tests/TEMATotalHeader.txt"
 #filename2 = 
@@ -16,6 +20,22 @@ def test_import():
     temaData = temafunctions.importTemaData(filename)
     assert not temaData.empty
 
+def test_import_singlePass():
+    temaData = temafunctions.importTemaData(filename)
+    with open(filename,'rb') as temaFile:
+        headers = temafunctions.readTemaHeader(temaFile)
+    twoPassData = pd.read_csv(filename,sep='\t',header=0,names=headers,skiprows=range(2),encoding_errors='ignore',dtype='float64',na_values=['X']).drop(columns=' ',errors='ignore')
+    assert temaData.equals(twoPassData)
+    assert temaData['Velocity (/Angle#1) angular speed[\xb0/s]'].isna().all()
+
+#the pyarrow parser cannot pad rows that leave off the empty trailing column, unlike the c parser
+def test_import_pyarrow():
+    pytest.importorskip('pyarrow')
+    for temaFile in [filename,pxScaleTest1File]:
+        assert temafunctions.importTemaData(temaFile,engine='pyarrow').equals(temafunctions.importTemaData(temaFile))
+        assert temafunctions.importTemaData(temaFile,engine='pyarrow',dtype='float32').equals(temafunctions.importTemaData(temaFile,dtype='float32'))
+        assert temafunctions.importTemaData(temaFile,engine='pyarrow',points=[1]).equals(temafunctions.importTemaData(temaFile,points=[1]))
+
 #tests for getConversion(unit)
 #Check we are getting the correct prefix and conversion from input unit to s, m, radians
 def test_getConversion_s():
@@ -23,6 +43,41 @@ def test_getConversion_s():
 def test_getConversion_us():
     assert temafunctions.getConversion('us') == ('s',.000001)
 
+#tests for getUnitConversion(unit) and registerUnit(unit,standardUnit,scaleFactor)
+def test_getUnitConversion_compound():
+    assert temafunctions.getUnitConversion('mm/ms') == ('m/s',1)
+    assert temafunctions.getUnitConversion('px/s/s') == ('px/s/s',1)
+    assert temafunctions.getUnitConversion(chr(176)+'/s') == ('rad/s',math.pi/180)
+    assert temafunctions.getUnitConversion('mm/ms^2')[0] == 'm/s^2'
+    assert math.isclose(temafunctions.getUnitConversion('mm/ms^2')[1],1000)
+
+def test_registerUnit():
+    temafunctions.registerUnit('testCamPx','m',0.002)
+    dataframe = pd.DataFrame({'Time [ms]':[0.0,1.0],'Default/Point#1 x[testCamPx/ms]':[1.0,2.0]})
+    newdf = temafunctions.standardizeUnits(dataframe)
+    assert list(newdf.columns) == ['Time [s]','Default/Point#1 x[m/s]']
+    assert np.allclose(newdf['Default/Point#1 x[m/s]'],[2.0,4.0])
+
+#tests for parseColumnName(column) and getColumnSchema(columns)
+def test_parseColumnName_raw():
+    info = temafunctions.parseColumnName('Velocity (Default/Point#12) x[mm/ms]')
+    assert (info.component,info.expression,info.index) == ('x','Velocity','12')
+    assert (info.numeratorUnit,info.denominatorUnit) == ('mm','ms')
+    assert not info.isStandard
+    assert info.formattedName == 'xVelocity12[mm/ms]'
+
+def test_parseColumnName_standard():
+    info = temafunctions.parseColumnName('AngularVelocity3[rad/s]')
+    assert (info.component,info.expression,info.index,info.unit) == ('','AngularVelocity','3','rad/s')
+    assert info.isStandard
+    assert info.formattedName == 'AngularVelocity3[rad/s]'
+
+def test_getColumnSchema_cached():
+    columns = list(temafunctions.importTemaData(filename).columns)
+    schema = temafunctions.getColumnSchema(columns)
+    assert [info.name for info in schema] == columns
+    assert temafunctions.getColumnSchema(list(columns)) is schema
+
 #tests for standardizeunits(dataframe)
 def test_standardizeUnits_time():
     importData = temafunctions.importTemaData(filename)
@@ -72,6 +127,144 @@ def test_standardizeColOrder():
     expectedhead = ['Time[s]','xPosition1[m]','yPosition1[m]','absPosition1[m]','Angle1[rad]','xVelocity1[m/s]','yVelocity1[m/s]','absVelocity1[m/s]','AngularVelocity1[rad/s]']
     assert list(standardOrderDF.columns) == expectedhead
 
+def test_standardizeColOrder_renumber():
+    dataframe = pd.DataFrame(0.0,index=range(3),columns=['Time[s]','xPosition10[m]','AngularVelocity81[rad/s]','xPosition1[m]','xVelocity10[m/s]','Angle81[rad]','yPosition10[m]','Notes'])
+    newdf = temafunctions.standardizeColOrder(dataframe,renumber=True)
+    assert list(newdf.columns) == ['Time[s]','xPosition1[m]','xPosition2[m]','yPosition2[m]','Angle1[rad]','xVelocity1[m/s]','AngularVelocity1[rad/s]','Notes']
+
+def test_getColumnOrder_wide():
+    columns = ['Time[s]']+[variant+str(index)+'[m]' for index in range(2000,0,-1) for variant in ['absPosition','xPosition','yPosition']]
+    orderedColumns, renameDict = temafunctions.getColumnOrder(columns)
+    assert orderedColumns == ['Time[s]']+[variant+str(index)+'[m]' for index in range(1,2001) for variant in ['xPosition','yPosition','absPosition']]
+
+def test_getColumnOrder_positions():
+    columns = ['Time[s]','Unknown','xPosition2[m]','Unknown','xPosition1[m]']
+    assert temafunctions.getColumnOrder(columns,positions=True) == ([0,4,2,1,3],{})
+    assert temafunctions.getColumnOrder(columns)[0] == ['Time[s]','xPosition1[m]','xPosition2[m]','Unknown','Unknown']
+
+
+#tests for cleanImportTemaData(filename)
+def test_cleanImportTemaData_fused():
+    dataframe = temafunctions.cleanImportTemaData(filename)
+    chained = temafunctions.standardizeColOrder(temafunctions.standardizeColFormat(temafunctions.standardizeUnits(temafunctions.importTemaData(filename))))
+    assert list(dataframe.columns) == list(chained.columns)
+    assert dataframe.equals(chained)
+
+#raw columns that format to the same name each keep their own data
+def test_cleanImportTemaData_duplicateNames(tmp_path):
+    duplicateFile = tmp_path / 'duplicates.txt'
+    duplicateFile.write_text('Time\tNote A\tNote B\tDistance (Point#1 - Point#2)\tDistance (Point#3 - Point#2)\t\n\t\t\tx[mm]\tx[mm]\t\n[ms]\t1\t1\t1\t1\t\n0\t1\t10\t5\t50\t\n1\t2\t20\t6\t60\t\n')
+    dataframe = temafunctions.cleanImportTemaData(duplicateFile)
+    chained = temafunctions.standardizeColOrder(temafunctions.standardizeColFormat(temafunctions.standardizeUnits(temafunctions.importTemaData(duplicateFile))))
+    assert list(dataframe.columns) == ['Time[s]','xPosition2[m]','Unknown','Unknown','xPosition2[m]']
+    assert dataframe.to_numpy().tolist() == [[0,0.005,1,10,0.05],[0.001,0.006,2,20,0.06]]
+    assert dataframe.equals(chained)
+    temafunctions.exportTemaData(tmp_path / 'duplicates.csv',dataframe,nanRows='all')
+    assert pd.read_csv(tmp_path / 'duplicates.csv').to_numpy().tolist() == dataframe.to_numpy().tolist()
+
+#float32 storage rounds each value twice (parsing, then unit scaling), so the relative error of the cleaned data is at most 2**-23
+def test_cleanImportTemaData_float32():
+    exact = temafunctions.cleanImportTemaData(filename)
+    rounded = temafunctions.cleanImportTemaData(filename,dtype='float32')
+    assert list(rounded.columns) == list(exact.columns)
+    assert rounded.dtypes.iloc[0] == np.float64 and (rounded.dtypes.iloc[1:] == np.float32).all()
+    assert rounded.iloc[:,0].equals(exact.iloc[:,0])
+    assert np.allclose(rounded.to_numpy(dtype='float64'),exact.to_numpy(),rtol=2**-23,atol=0,equal_nan=True)
+
+#velocities of float32 data are computed in float64, so their error is the position error carried through the difference quotient: 2**-23 of the largest position over the shortest double time step, plus the float32 rounding of the velocity itself
+def test_calculateVelocities_float32():
+    exact = temafunctions.calculateVelocities(temafunctions.cleanImportTemaData(filename))
+    rounded = temafunctions.calculateVelocities(temafunctions.cleanImportTemaData(filename,dtype='float32'))
+    assert (rounded.dtypes.iloc[1:] == np.float32).all()
+    time = exact.iloc[:,0].to_numpy()
+    for position,velocity in [('xPosition1[m]','xVelocity2[m/s]'),('absPosition1[m]','absVelocity2[m/s]')]:
+        bound = 2*2**-23*np.nanmax(np.abs(exact[position]))/np.min(time[2:]-time[:-2])+2**-24*np.abs(exact[velocity])
+        error = np.abs(rounded[velocity].to_numpy(dtype='float64')-exact[velocity].to_numpy())
+        assert np.all((error <= bound) | np.isnan(error))
+
+#tests for cleanImportTemaDataChunks(filename,chunksize=100000)
+def test_cleanImportTemaDataChunks():
+    chunks = list(temafunctions.cleanImportTemaDataChunks(velocityTest3File,chunksize=4))
+    assert [len(chunk) for chunk in chunks] == [4,4,3]
+    assert pd.concat(chunks).equals(temafunctions.cleanImportTemaData(velocityTest3File))
+
+def test_exportTemaData_chunks(tmp_path):
+    temafunctions.exportTemaData(tmp_path / 'streamed.csv',temafunctions.cleanImportTemaDataChunks(filename,chunksize=2),includeNaN=True)
+    temafunctions.exportTemaData(tmp_path / 'whole.csv',temafunctions.cleanImportTemaData(filename),includeNaN=True)
+    assert (tmp_path / 'streamed.csv').read_bytes() == (tmp_path / 'whole.csv').read_bytes()
+
+#streamed data cannot drop its NaN-only columns first, so by default only rows without any data are stripped from it
+def test_exportTemaData_chunksDefault(tmp_path):
+    temafunctions.exportTemaData(tmp_path / 'streamed.csv',temafunctions.cleanImportTemaDataChunks(filename,chunksize=500))
+    temafunctions.exportTemaData(tmp_path / 'whole.csv',temafunctions.cleanImportTemaData(filename),nanRows='all',includeNaN=False)
+    streamed = pd.read_csv(tmp_path / 'streamed.csv')
+    assert len(streamed) == len(pd.read_csv(tmp_path / 'whole.csv')) > 2000
+    assert streamed['AngularVelocity1[rad/s]'].isna().all()
+
+def test_exportTemaData_goodExport(tmp_path):
+    exampleFile = 'notebook/temaanalyzer/temaanalyzer/interactive/TEMAExampleFile.txt'
+    temafunctions.exportTemaData(tmp_path / 'export.csv',temafunctions.cleanImportTemaData(exampleFile),includeNaN=True)
+    assert (tmp_path / 'export.csv').read_bytes() == open('notebook/temaanalyzer/temaanalyzer/interactive/goodExport.csv','rb').read()
+
+def test_exportTemaData_workers(tmp_path):
+    dataframe = temafunctions.cleanImportTemaData(filename)
+    temafunctions.exportTemaData(tmp_path / 'serial.csv',dataframe,includeNaN=True)
+    temafunctions.exportTemaData(tmp_path / 'parallel.csv.gz',dataframe,includeNaN=True,workers=2)
+    assert gzip.open(tmp_path / 'parallel.csv.gz').read() == (tmp_path / 'serial.csv').read_bytes()
+
+def test_exportTemaData_floatFormat(tmp_path):
+    dataframe = pd.DataFrame({'Time[s]':[0.0,0.125],'xPosition1[m]':[1/3,2/3]})
+    temafunctions.exportTemaData(tmp_path / 'rounded.csv',dataframe,floatFormat='%.3g')
+    assert (tmp_path / 'rounded.csv').read_text().splitlines() == ['Time[s],xPosition1[m]','0,0.333','0.125,0.667']
+
+def test_exportTemaData_nanRows(tmp_path):
+    dataframe = pd.DataFrame({'Time[s]':[0.0,0.1,0.2,0.3],'xPosition1[m]':[1.0,np.nan,np.nan,4.0],'xPosition2[m]':[1.0,2.0,np.nan,4.0],'xPosition3[m]':np.nan})
+    temafunctions.exportTemaData(tmp_path / 'all.csv',dataframe,nanRows='all')
+    exported = pd.read_csv(tmp_path / 'all.csv')
+    assert list(exported.columns) == ['Time[s]','xPosition1[m]','xPosition2[m]']
+    assert exported['Time[s]'].tolist() == [0.0,0.1,0.3]
+
+#tests for buildSegmentIndex(dataframe) and getSegmentIndex(dataframe,columns=None)
+def test_buildSegmentIndex():
+    dataframe = temafunctions.cleanImportTemaData(filename)
+    segments = temafunctions.getSegmentIndex(dataframe)
+    assert dataframe.attrs['temaSegments'][:2] == (len(dataframe),segments)
+    for column in dataframe.columns:
+        assert segments[column] == temafunctions.getValidSegments(dataframe[column].notna().to_numpy())
+
+def test_getSegmentIndex_newColumns():
+    dataframe = pd.DataFrame({'Time[s]':[0.0,0.1,0.2,0.3,0.4],'Angle1[rad]':[np.nan,1.0,2.0,np.nan,5.0]})
+    temafunctions.buildSegmentIndex(dataframe)
+    dataframe['Angle2[rad]'] = 1.0
+    assert temafunctions.getSegmentIndex(dataframe) == {'Time[s]':((0,5),),'Angle1[rad]':((1,3),(4,5)),'Angle2[rad]':((0,5),)}
+
+#pandas carries attrs through operations that fill NaNs in, so the stored index must not be trusted for them
+def test_getSegmentIndex_changedData(tmp_path):
+    dataframe = pd.DataFrame({'Time[s]':[0.0,0.1,0.2,0.3,0.4],'xPosition1[m]':[0.0,np.nan,2.0,np.nan,4.0],'xPosition2[m]':[0.0,np.nan,np.nan,np.nan,4.0]})
+    temafunctions.buildSegmentIndex(dataframe)
+    filled = dataframe.interpolate()
+    assert 'temaSegments' in filled.attrs
+    assert temafunctions.getSegmentIndex(filled) == {'Time[s]':((0,5),),'xPosition1[m]':((0,5),),'xPosition2[m]':((0,5),)}
+    temafunctions.exportTemaData(tmp_path / 'filled.csv',filled,nanRows='all')
+    assert len(pd.read_csv(tmp_path / 'filled.csv')) == 5
+    velocities = temafunctions.calculateVelocities(dataframe.fillna(0),fillEnds=True)
+    assert np.allclose(velocities['xVelocity1[m/s]'][1:4],[10.0,0.0,10.0])
+
+#tests for cleanImportTemaDirectory(path,workers=None,concat=False,pattern='*.txt')
+def test_cleanImportTemaDirectory(tmp_path):
+    shutil.copy(velocityTest1File,tmp_path / 'run1.txt')
+    shutil.copy(velocityTest3File,tmp_path / 'run2.txt')
+    (tmp_path / 'corrupt.txt').write_text('Time\n')
+    dataframes, failures = temafunctions.cleanImportTemaDirectory(str(tmp_path),workers=2)
+    assert sorted(map(os.path.basename,dataframes)) == ['run1.txt','run2.txt']
+    assert list(map(os.path.basename,failures)) == ['corrupt.txt']
+    assert dataframes[str(tmp_path / 'run2.txt')].equals(temafunctions.cleanImportTemaData(velocityTest3File))
+
+def test_cleanImportTemaDirectory_concat():
+    dataframe, failures = temafunctions.cleanImportTemaDirectory(os.path.dirname(velocityTest1File)+'/velocityTest*.txt',workers=1,concat=True)
+    assert not failures
+    assert list(dataframe.index.names) == ['file',None]
+    assert len(dataframe) == 22
 
 #tests for scalePxToDist(dataframe,scaleFactor,columns=None,metersPerPixel=False,inPlace=True)
 #this makes sense to do here
@@ -83,6 +276,13 @@ def test_scalePxToDist():
     #assert
 
 
+def test_scalePxToDist_mixedTypes():
+    dataframe = pd.DataFrame({'Time[s]':[0.0,1.0],'xPosition1[px]':np.array([1,2],dtype='float32'),'yPosition1[px]':[1.0,2.0]})
+    for inPlace in [True,False]:
+        scaleddf = temafunctions.scalePxToDist(dataframe,100,inPlace=inPlace)
+        assert scaleddf['xPosition1[m]'].dtype == np.float32 and scaleddf['yPosition1[m]'].dtype == np.float64
+        assert np.allclose(scaleddf['yPosition1[m]'],[0.01,0.02])
+
 #tests for calculateVelocity(dataframe,column)
 #make fake file to calculate velocity with
 def test_calculateVelocity_file1():
@@ -112,4 +312,160 @@ def test_calculateVelocity_nonLinear():
     expectedV = [0.0,0.176,0.008,0.052,0.008,-0.18,0.008,-0.02,0.004,0.012,0.0]
     assert listofVelocities == expectedV
 
-#test average velocity function
\ No newline at end of file
+#test average velocity function
+#tests for calculateVelocities(dataframe,columns=None,scheme='central')
+def test_calculateVelocities():
+    dataframe = temafunctions.cleanImportTemaData(filename)
+    newdf = temafunctions.calculateVelocities(dataframe)
+    assert list(newdf.columns[-4:]) == ['xVelocity2[m/s]','yVelocity2[m/s]','absVelocity2[m/s]','AngularVelocity2[rad/s]']
+    for column,newColumn in zip(['xPosition1[m]','yPosition1[m]','absPosition1[m]','Angle1[rad]'],newdf.columns[-4:]):
+        singledf = temafunctions.calculateVelocity(dataframe,column)
+        assert singledf[singledf.columns[-1]].equals(newdf[newColumn])
+
+#raw TEMA names are recognized as positions or angles by substring, as calculateVelocity always has
+def test_calculateVelocities_rawNames():
+    dataframe = temafunctions.importTemaData(filename)
+    newdf = temafunctions.calculateVelocities(dataframe,['/Angle#1 angle[degrees]','Default/Point#1 x[mm]'])
+    assert list(newdf.columns[-2:]) == ['AngularVelocity1[degrees/ms]','Default/Point#1 xRate[mm/ms]']
+
+def test_calculateVelocities_nonuniform():
+    time = np.array([0,0.1,0.3,0.35,0.6,0.9,1.0])
+    dataframe = pd.DataFrame({'Time[s]':time,'xPosition1[m]':time**2})
+    newdf = temafunctions.calculateVelocities(dataframe,scheme='nonuniform')
+    assert np.allclose(newdf['xVelocity1[m/s]'][1:-1],2*time[1:-1])
+    assert newdf['xVelocity1[m/s]'][[0,6]].isna().all()
+
+def test_calculateVelocities_fillEnds():
+    time = np.linspace(0,1,11)
+    position = 2*time
+    position[5] = np.nan
+    dataframe = pd.DataFrame({'Time[s]':time,'xPosition1[m]':position})
+    for scheme in ['central','fivepoint']:
+        newdf = temafunctions.calculateVelocities(dataframe,scheme=scheme,fillEnds=True)
+        assert np.allclose(newdf['xVelocity1[m/s]'].drop(5),2)
+
+def test_calculateVelocities_fivepoint():
+    time = np.linspace(0,1,11)
+    dataframe = pd.DataFrame({'Time[s]':time,'Angle1[rad]':time**4})
+    newdf = temafunctions.calculateVelocities(dataframe,scheme='fivepoint')
+    assert np.allclose(newdf['AngularVelocity1[rad/s]'][2:-2],4*time[2:-2]**3)
+    assert newdf['AngularVelocity1[rad/s]'][[0,1,9,10]].isna().all()
+
+#tests for calculateDerivatives(dataframe,columns=None,order=3,scheme='central')
+def test_calculateDerivatives():
+    dataframe = temafunctions.cleanImportTemaData(velocityTest1File)
+    newdf = temafunctions.standardizeColOrder(temafunctions.calculateDerivatives(dataframe))
+    expectedhead = ['Time[s]','xPosition1[m]','yPosition1[px]','xVelocity1[m/s]','yVelocity1[px/s]','xAcceleration1[m/s/s]','yAcceleration1[px/s/s]','xJerk1[m/s/s/s]','yJerk1[px/s/s/s]']
+    assert list(newdf.columns) == expectedhead
+    assert np.allclose(newdf['xVelocity1[m/s]'][1:-1],0.008)
+    assert np.allclose(newdf['xAcceleration1[m/s/s]'][2:-2],0)
+    assert newdf['xJerk1[m/s/s/s]'][[0,1,2,8,9,10]].isna().all()
+
+def test_calculateDerivatives_nonuniform():
+    time = np.array([0,0.1,0.3,0.35,0.6,0.9,1.0,1.2])
+    dataframe = pd.DataFrame({'Time[s]':time,'Angle1[rad]':time**2})
+    newdf = temafunctions.calculateDerivatives(dataframe,order=2,scheme='nonuniform')
+    assert list(newdf.columns) == ['Time[s]','Angle1[rad]','AngularVelocity1[rad/s]','AngularAcceleration1[rad/s/s]']
+    assert np.allclose(newdf['AngularAcceleration1[rad/s/s]'][2:-2],2)
+
+#tests for calculateSmoothedDerivatives(dataframe,columns=None,order=2,method='savgol',window=11,polyorder=3,cutoff=None,smoothing=None)
+def test_calculateSmoothedDerivatives_savgol():
+    time = np.linspace(0,1,41)
+    position = time**3-time
+    position[20:22] = np.nan
+    dataframe = pd.DataFrame({'Time[s]':time,'xPosition1[m]':position,'yPosition1[m]':position})
+    newdf = temafunctions.calculateSmoothedDerivatives(dataframe,window=7,polyorder=3)
+    assert list(newdf.columns[3:]) == ['xVelocity1[m/s]','yVelocity1[m/s]','xAcceleration1[m/s/s]','yAcceleration1[m/s/s]']
+    valid = ~np.isnan(position)
+    assert np.allclose(newdf['xVelocity1[m/s]'][valid],(3*time**2-1)[valid])
+    assert np.allclose(newdf['yAcceleration1[m/s/s]'][valid],(6*time)[valid])
+    assert newdf['xVelocity1[m/s]'][~valid].isna().all()
+
+def test_calculateSmoothedDerivatives_lowpass():
+    time = np.linspace(0,1,101)
+    dataframe = pd.DataFrame({'Time[s]':time,'Angle1[rad]':2*time+1})
+    newdf = temafunctions.calculateSmoothedDerivatives(dataframe,order=1,method='lowpass',cutoff=10)
+    assert np.allclose(newdf['AngularVelocity1[rad/s]'][1:-1],2)
+
+def test_calculateSmoothedDerivatives_spline():
+    pytest.importorskip('scipy')
+    time = np.linspace(0,1,41)
+    dataframe = pd.DataFrame({'Time[s]':time,'xPosition1[m]':time**2})
+    newdf = temafunctions.calculateSmoothedDerivatives(dataframe,order=1,method='spline')
+    assert np.allclose(newdf['xVelocity1[m/s]'][5:-5],2*time[5:-5],atol=1e-2)
+
+#tests for profileStages(callback=None,memory=False)
+def test_profileStages():
+    called = []
+    with temafunctions.profileStages(callback=called.append,memory=True) as records:
+        dataframe = temafunctions.cleanImportTemaData(filename)
+    assert records == called
+    assert [record.stage for record in records if record.depth == 0] == ['cleanImportTemaData']
+    body = next(record for record in records if record.stage == 'readTemaBody')
+    assert body.depth == 1 and body.rows == len(dataframe)
+    assert records[-1].bytesRead == os.path.getsize(filename)
+    assert records[-1].columns == len(dataframe.columns)
+    assert all(record.peakMemory >= 0 for record in records)
+    temafunctions.standardizeUnits(temafunctions.importTemaData(filename))
+    assert len(records) == len(called)
+
+#tests for resampleTemaData(dataframe,time,method='linear',maxGap=None,offset=0)
+def test_resampleTemaData():
+    time = np.arange(10)*0.1
+    position = 2*time+1
+    position[4] = np.nan
+    dataframe = pd.DataFrame({'Time[s]':time,'xPosition1[m]':position})
+    newdf = temafunctions.resampleTemaData(dataframe,[0.05,0.3,0.35,0.5,0.95])
+    assert list(newdf.columns) == ['Time[s]','xPosition1[m]']
+    assert np.allclose(newdf['xPosition1[m]'][[0,1,3]],[1.1,1.6,2])
+    #not bridged across the dropout or past the end
+    assert newdf['xPosition1[m]'][[2,4]].isna().all()
+    newdf = temafunctions.resampleTemaData(dataframe,[0.04,0.16],method='nearest',offset=0.1)
+    assert newdf['xPosition1[m]'].isna().tolist() == [True,False]
+    assert newdf['xPosition1[m]'][1] == position[1]
+
+def test_resampleTemaData_maxGap():
+    dataframe = pd.DataFrame({'Time[s]':[0,0.1,0.5,0.6],'Angle1[rad]':[0,1,5,6]})
+    newdf = temafunctions.resampleTemaData(dataframe,[0.05,0.3,0.55],maxGap=0.2)
+    assert newdf['Angle1[rad]'].isna().tolist() == [False,True,False]
+
+#tests for alignTemaData(dataframes,time=None,rate=None,offsets=None,method='linear',maxGap=None,concat=False)
+def test_alignTemaData():
+    fast = pd.DataFrame({'Time[s]':np.arange(101)*0.01,'Angle1[rad]':np.arange(101)*0.01})
+    #a slower camera whose clock runs 0.1 s ahead
+    slow = pd.DataFrame({'Time[s]':np.arange(41)*0.025+0.1,'Angle1[rad]':np.arange(41)*0.025})
+    aligned = temafunctions.alignTemaData({'fast':fast,'slow':slow},offsets={'fast':0,'slow':-0.1})
+    assert len(aligned['fast']) == len(aligned['slow']) == 101
+    assert np.allclose(aligned['fast']['Time[s]'],aligned['slow']['Time[s]'])
+    assert np.allclose(aligned['fast']['Angle1[rad]'],aligned['slow']['Angle1[rad]'])
+    newdf = temafunctions.alignTemaData([fast,slow],rate=20,concat=True)
+    assert newdf.columns.names[0] == 'file'
+    assert np.allclose(newdf[(0,'Time[s]')],np.arange(19)*0.05+0.1)
+
+#tests for calculatePointGeometry(dataframe,pairs=None,angles=False,velocities=False)
+def test_calculatePointGeometry():
+    time = np.linspace(0,1,11)
+    dataframe = pd.DataFrame({'Time[s]':time,'xPosition1[m]':time,'yPosition1[m]':0*time,'Angle1[rad]':0*time,
+                              'xPosition2[m]':time+3,'yPosition2[m]':4+time,'xPosition3[px]':time,'yPosition3[px]':time})
+    newdf = temafunctions.calculatePointGeometry(dataframe,angles=True,velocities=True)
+    #point 3 is in other units, so it is not paired by default
+    assert list(newdf.columns[len(dataframe.columns):]) == ['xInterPointDistance1[m]','yInterPointDistance1[m]','absInterPointDistance1[m]','Angle2[rad]',
+                                                             'xInterPointVelocity1[m/s]','yInterPointVelocity1[m/s]','absInterPointVelocity1[m/s]','AngularVelocity1[rad/s]']
+    assert np.allclose(newdf['xInterPointDistance1[m]'],3)
+    assert np.allclose(newdf['absInterPointDistance1[m]'],np.hypot(3,4+time))
+    assert np.allclose(newdf['Angle2[rad]'],np.arctan2(4+time,3))
+    assert np.allclose(newdf['yInterPointVelocity1[m/s]'][1:-1],1)
+    ordered = list(temafunctions.standardizeColOrder(newdf).columns)
+    assert ordered[7:10] == ['Angle1[rad]','Angle2[rad]','xInterPointDistance1[m]']
+    assert ordered[-3:] == ['xInterPointVelocity1[m/s]','yInterPointVelocity1[m/s]','absInterPointVelocity1[m/s]']
+    with pytest.raises(ValueError):
+        temafunctions.calculatePointGeometry(dataframe,[(1,3)])
+
+#tests for cleanImportTemaData(filename,dtype='float64',columns=None,points=None)
+def test_cleanImportTemaData_columns():
+    dataframe = temafunctions.cleanImportTemaData(filename)
+    newdf = temafunctions.cleanImportTemaData(filename,columns=['Angle1[rad]','Default/Point#1 y[mm]'])
+    assert list(newdf.columns) == ['Time[s]','yPosition1[m]','Angle1[rad]']
+    assert newdf.equals(dataframe[newdf.columns])
+    newdf = temafunctions.importTemaData(filename,points=[1])
+    assert list(newdf.columns) == list(temafunctions.importTemaData(filename).columns[:7])
@@ -0,0 +1,46 @@
+from temaanalyzer import temafunctions
+from temaanalyzer.temaindex import TemaIndex
+import pytest
+
+filename = "notebook/temaanalyzer/tests/TEMATotalHeader.txt"
+
+
+#tests for TemaIndex(filename,stride=1000,dtype='float64')
+def test_TemaIndex_query():
+    dataframe = temafunctions.cleanImportTemaData(filename)
+    time = dataframe['Time[s]']
+    with TemaIndex(filename,stride=50) as index:
+        assert index.rows == len(dataframe)
+        for start,stop in [(time[0],time[10]),(time[497],time[1203]),(time[2230],time[2242]+1),(time[2242]+1,time[2242]+2)]:
+            window = index.query(start,stop)
+            assert window.equals(dataframe[(time >= start) & (time <= stop)])
+            assert list(window.index) == list(dataframe.index[(time >= start) & (time <= stop)])
+        window = index.query(time[100],time[200],columns=['Angle1[rad]'])
+        assert window.equals(dataframe.loc[100:200,['Time[s]','Angle1[rad]']])
+
+def test_TemaIndex_unordered(tmp_path):
+    lines = open(filename,'rb').read().split(b'\n')
+    unordered = tmp_path / 'unordered.txt'
+    unordered.write_bytes(b'\n'.join(lines[:3]+lines[1000:1010]+lines[3:1000]))
+    with pytest.raises(ValueError):
+        TemaIndex(str(unordered),stride=5)
+
+def test_TemaIndex_blankLines(tmp_path):
+    lines = open(filename,'rb').read().split(b'\n')
+    blanks = tmp_path / 'blanks.txt'
+    blanks.write_bytes(b'\n'.join(lines[:3]+[b'\r']+lines[3:500]+[b'',b'\r']+lines[500:]))
+    dataframe = temafunctions.cleanImportTemaData(filename)
+    time = dataframe['Time[s]']
+    with TemaIndex(str(blanks),stride=50) as index:
+        assert index.rows == len(dataframe)
+        assert index.query(time[480],time[620]).equals(dataframe.loc[480:620])
+
+def test_TemaIndex_unorderedBetweenIndexRows(tmp_path):
+    lines = open(filename,'rb').read().split(b'\n')
+    unordered = tmp_path / 'unordered.txt'
+    unordered.write_bytes(b'\n'.join(lines[:3]+lines[3:120]+[lines[125],lines[120]]+lines[126:]))
+    time = temafunctions.cleanImportTemaData(filename)['Time[s]']
+    with TemaIndex(str(unordered),stride=50) as index:
+        with pytest.raises(ValueError):
+            index.query(time[110],time[130])
+        assert len(index.query(time[1000],time[1010])) == 11
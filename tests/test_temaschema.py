@@ -0,0 +1,43 @@
+from temaanalyzer import temaschema, temaunits
+import os
+import pytest
+import subprocess
+import sys
+import temaanalyzer
+
+packageRoot = os.path.dirname(os.path.dirname(temaanalyzer.__file__))
+
+
+#tests for the import cost of temaunits and temaschema (the timing is in benchmarks/bench_package_import.py)
+def test_import_withoutPandas():
+    #a fresh interpreter, since this one has already loaded pandas
+    script = 'import sys; import temaanalyzer.temaunits, temaanalyzer.temaschema; print(sorted({"pandas","numpy"} & set(sys.modules)))'
+    loaded = subprocess.run([sys.executable,'-c',script],cwd=packageRoot,capture_output=True,text=True,check=True).stdout.strip()
+    assert loaded == '[]'
+
+#tests for readTemaHeader(csvfile) and getColumnSchema(columns)
+def test_readTemaHeader():
+    with open("notebook/temaanalyzer/tests/TEMATotalHeader.txt",'rb') as csvfile:
+        headers = temaschema.readTemaHeader(csvfile)
+    schema = temaschema.getColumnSchema(headers)
+    assert schema[0].expression == 'Time'
+    assert temaunits.getUnitConversion(schema[0].unit) == ('s',0.001)
+
+#tests for scanTemaFile(filename,sampleBytes=65536)
+def test_scanTemaFile():
+    info = temaschema.scanTemaFile("notebook/temaanalyzer/tests/velocityTest1.txt")
+    assert info.exactRows and info.rows == 11
+    assert info.points == [1]
+    assert info.measurements['xPosition'] == [1]
+    info = temaschema.scanTemaFile("notebook/temaanalyzer/tests/TEMATotalHeader.txt",sampleBytes=4096)
+    assert not info.exactRows and abs(info.rows-2243)/2243 < 0.1
+    assert info.units['/Angle#1 angle[degrees]'] == 'degrees'
+    assert info.measurements['Angle'] == [1]
+
+#tests for selectTemaColumns(headers,columns=None,points=None)
+def test_selectTemaColumns():
+    headers = ['Time [ms]','Default/Point#1 x[mm]','Default/Point#2 x[mm]','Velocity (Default/Point#2) x[m/s]','/Angle#2 angle[degrees]',' ']
+    assert temaschema.selectTemaColumns(headers,points=[2]) == [0,2,3]
+    assert temaschema.selectTemaColumns(headers,['Angle2[rad]','Default/Point#1 x[mm]']) == [0,1,4]
+    with pytest.raises(KeyError):
+        temaschema.selectTemaColumns(headers,['xPosition3[m]'])